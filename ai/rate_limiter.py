@@ -1,36 +1,11 @@
-import time
-
-import redis
-from django.conf import settings
+from datetime import timedelta
 
 from ai.config import RATE_LIMIT_REQUESTS, RATE_LIMIT_SLIDING_WINDOW_SECONDS
+from common.rate_limits import SlidingWindowCounter
 
-redis_client = redis.StrictRedis(
-    host=settings.REDIS_HOST,
-    port=settings.REDIS_PORT,
-    db=0,
-    decode_responses=True
-)
+ai_requests_counter = SlidingWindowCounter("ai", timedelta(seconds=RATE_LIMIT_SLIDING_WINDOW_SECONDS))
 
 
 def is_rate_limited(key: str) -> bool:
-    now = time.time()
-    window_start = now - RATE_LIMIT_SLIDING_WINDOW_SECONDS
-
-    redis_key = f"rate_limit:{key}"
-
-    # Remove expired entries
-    redis_client.zremrangebyscore(redis_key, 0, window_start)
-
-    # Check current count
-    current_count = redis_client.zcard(redis_key)
-    if current_count >= RATE_LIMIT_REQUESTS:
-        return True
-
-    # Add current timestamp
-    redis_client.zadd(redis_key, {str(now): now})
-
-    # Set expiry for key to allow Redis cleanup
-    redis_client.expire(redis_key, RATE_LIMIT_SLIDING_WINDOW_SECONDS)
-
-    return False
+    # counting and recording the request is one atomic script, so parallel requests can't overshoot the limit
+    return not ai_requests_counter.hit(key, limit=RATE_LIMIT_REQUESTS)
@@ -1,17 +1,36 @@
 from django.db.models import Q
 
 from ai.config import TRIM_LONG_CONTENT_TO_LEN, CLUB_INFO_POST_SLUGS, CLUB_INFO_POST_LABEL, CLUB_EXTRA_INFO_POST_SLUGS
+from club import features
 from posts.models.post import Post
 from rooms.models import Room
+from search.cache import search_result_ids, load_results
 from search.models import SearchIndex
 from search.views import ALLOWED_ORDERING
 from users.models.user import User
 
 
+def cached_search(query, queryset, limit, content_type=None, order_by="-rank", post_type=None):
+    # popular questions are asked again and again, ranking is cached until the index changes
+    ids, _ = search_result_ids(query, content_type, order_by or "-rank", post_type)
+
+    # the queryset can filter some rows out, so ids are loaded in small windows until there are enough
+    results = []
+    window = limit * 2
+    for start in range(0, len(ids), window):
+        results += load_results(ids[start:start + window], queryset)
+        if len(results) >= limit:
+            break
+    return results[:limit]
+
+
 def generic_search(query, limit=5):
-    search_results = SearchIndex.search(query) \
-        .select_related("post", "user", "comment") \
-        .order_by("-rank")[:limit]
+    if features.SEARCH_RESULT_CACHE:
+        search_results = cached_search(query, SearchIndex.objects.select_related("post", "user", "comment"), limit)
+    else:
+        search_results = SearchIndex.search(query) \
+            .select_related("post", "user", "comment") \
+            .order_by("-rank")[:limit]
 
     results = []
     for result in search_results:
@@ -27,6 +46,13 @@ def generic_search(query, limit=5):
 
 
 def search_posts(query, post_type=None, order_by="-rank", limit=5):
+    if features.SEARCH_RESULT_CACHE:
+        search_results = cached_search(
+            query, SearchIndex.objects.select_related("post"), limit,
+            content_type=SearchIndex.TYPE_POST, order_by=order_by, post_type=post_type,
+        )
+        return [shorten_content_text(r.post.to_dict(including_private=True)) for r in search_results]
+
     search_results = SearchIndex\
         .search(query) \
         .filter(type=SearchIndex.TYPE_POST)
@@ -42,6 +68,13 @@ def search_posts(query, post_type=None, order_by="-rank", limit=5):
 
 
 def search_comments(query, order_by="-rank", limit=7):
+    if features.SEARCH_RESULT_CACHE:
+        search_results = cached_search(
+            query, SearchIndex.objects.select_related("comment"), limit,
+            content_type=SearchIndex.TYPE_COMMENT, order_by=order_by,
+        )
+        return [shorten_content_text(r.comment.to_dict()) for r in search_results]
+
     search_results = SearchIndex\
         .search(query) \
         .filter(type=SearchIndex.TYPE_COMMENT) \
@@ -53,14 +86,25 @@ def search_comments(query, order_by="-rank", limit=7):
 
 
 def search_users(query, order_by="-rank", limit=7):
-    search_results = SearchIndex\
-        .search(query) \
-        .filter(type=SearchIndex.TYPE_USER) \
+    if features.SEARCH_RESULT_CACHE:
+        search_results = SearchIndex.objects
+    else:
+        search_results = SearchIndex\
+            .search(query) \
+            .filter(type=SearchIndex.TYPE_USER)
+
+    search_results = search_results \
         .exclude(user__isnull=True, user__deleted_at__isnull=True) \
         .exclude(user__profile_publicity_level=User.PUBLICITY_LEVEL_PRIVATE) \
         .filter(user__moderation_status=User.MODERATION_STATUS_APPROVED) \
-        .select_related("user") \
-        .order_by(order_by)[:limit]
+        .select_related("user")
+
+    if features.SEARCH_RESULT_CACHE:
+        search_results = cached_search(
+            query, search_results, limit, content_type=SearchIndex.TYPE_USER, order_by=order_by,
+        )
+    else:
+        search_results = search_results.order_by(order_by)[:limit]
 
     intros = {}
     if search_results:
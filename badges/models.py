@@ -136,23 +136,26 @@ class UserBadge(models.Model):
         return UserBadge.objects.filter(to_user=user).select_related("badge").order_by("-created_at")
 
     @classmethod
-    def user_badges_grouped(cls, user):
+    def user_badges_grouped(cls, user, counts=None):
         badges = {
             badge.code: badge for badge in Badge.visible_objects()
         }
 
-        badge_groups = UserBadge.objects\
-            .filter(to_user=user)\
-            .order_by("badge_id")\
-            .values("badge_id")\
-            .annotate(count=Count("badge_id"))
+        if counts is None:
+            badge_groups = UserBadge.objects\
+                .filter(to_user=user)\
+                .order_by("badge_id")\
+                .values("badge_id")\
+                .annotate(count=Count("badge_id"))
+            counts = {badge_group["badge_id"]: badge_group["count"] for badge_group in badge_groups}
 
+        # precomputed counts (see posts/counters.py) can mention hidden badges or zeros
         return {
-            badge_group["badge_id"]: {
-                "title": badges[badge_group["badge_id"]].title,
-                "description": badges[badge_group["badge_id"]].description,
-                "count": badge_group["count"],
-            } for badge_group in badge_groups
+            badge_id: {
+                "title": badges[badge_id].title,
+                "description": badges[badge_id].description,
+                "count": count,
+            } for badge_id, count in sorted(counts.items()) if count > 0 and badge_id in badges
         }
 
     def to_dict(self):
@@ -10,6 +10,8 @@ from club.exceptions import BadRequest
 from comments.models import Comment
 from notifications.email.badges import send_new_badge_email
 from notifications.telegram.badges import send_new_badge_message
+from posts import materialized_feed
+from posts.helpers import ORDERING_ACTIVITY
 from posts.models.post import Post
 
 
@@ -58,7 +60,9 @@ def create_badge_for_post(request, post_slug):
     async_task(send_new_badge_message, user_badge)
 
     # bump post on home page by updating its last_activity_at
-    Post.objects.filter(id=post.id).update(last_activity_at=datetime.utcnow())
+    now = datetime.utcnow()
+    Post.objects.filter(id=post.id).update(last_activity_at=now)
+    materialized_feed.update_scores(ORDERING_ACTIVITY, {post.id: materialized_feed.datetime_score(now)})
 
     # show insufficient funds warning if < 3 months
     membership_days_remaining = request.me.membership_days_left() - user_badge.badge.price_days
@@ -122,7 +126,9 @@ def create_badge_for_comment(request, comment_id):
     async_task(send_new_badge_message, user_badge)
 
     # bump post on home page by updating its last_activity_at
-    Post.objects.filter(id=comment.post_id).update(last_activity_at=datetime.utcnow())
+    now = datetime.utcnow()
+    Post.objects.filter(id=comment.post_id).update(last_activity_at=now)
+    materialized_feed.update_scores(ORDERING_ACTIVITY, {comment.post_id: materialized_feed.datetime_score(now)})
 
     # show insufficient funds warning if < 3 months
     membership_days_remaining = request.me.membership_days_left() - user_badge.badge.price_days
@@ -1,8 +1,10 @@
+from django.db.models import F
 from django.shortcuts import render
 
 from authn.decorators.auth import require_auth
-from common.pagination import paginate
+from common.pagination import paginate_by_cursor
 from posts.models.post import Post
+from posts.viewer_state import attach_post_viewer_state
 
 
 @require_auth
@@ -11,9 +13,12 @@ def bookmarks(request):
 
     posts = Post.objects_for_user(user)\
         .filter(bookmarks__user=user, deleted_at__isnull=True)\
-        .order_by('-bookmarks__created_at')\
-        .all()
+        .annotate(bookmarked_at=F("bookmarks__created_at"))\
+        .order_by("-bookmarked_at")
+
+    posts_page = paginate_by_cursor(request, posts)
+    attach_post_viewer_state(posts_page, user)
 
     return render(request, "bookmarks.html", {
-        "posts": paginate(request, posts),
+        "posts": posts_page,
     })
@@ -10,13 +10,11 @@ from bot.config import MIN_COMMENT_LEN, SKIP_COMMANDS, COMMENT_EMOJI_RE, POST_EM
 from bot.handlers.common import get_club_user, get_club_comment, get_club_post
 from bot.decorators import is_club_member, ensure_fresh_db_connection
 from club import settings
-from comments.models import Comment
+from comments.models import Comment, CommentOutboxEvent
+from comments.outbox import record_comment_event
 from comments.rate_limits import is_comment_rate_limit_exceeded
 from notifications.telegram.comments import notify_on_comment_created
 from posts.models.post import Post
-from posts.models.linked import LinkedPost
-from posts.models.views import PostView
-from search.models import SearchIndex
 
 log = logging.getLogger(__name__)
 
@@ -98,15 +96,7 @@ async def reply_to_comment(update: Update, context: CallbackContext) -> None:
             "telegram": update.to_dict()
         }
     )
-    Comment.update_post_counters(reply.post)
-    PostView.increment_unread_comments(reply)
-    PostView.register_view(
-        request=None,
-        user=user,
-        post=reply.post,
-    )
-    SearchIndex.update_comment_index(reply)
-    LinkedPost.create_links_from_text(reply.post, text)
+    record_comment_event(reply, CommentOutboxEvent.TYPE_CREATED, user=user)
 
     async_task(notify_on_comment_created, reply)
 
@@ -169,15 +159,7 @@ async def comment_to_post(update: Update, context: CallbackContext) -> None:
             "telegram": update.to_dict()
         }
     )
-    Comment.update_post_counters(post)
-    PostView.increment_unread_comments(reply)
-    PostView.register_view(
-        request=None,
-        user=user,
-        post=post,
-    )
-    SearchIndex.update_comment_index(reply)
-    LinkedPost.create_links_from_text(post, text)
+    record_comment_event(reply, CommentOutboxEvent.TYPE_CREATED, user=user)
 
     async_task(notify_on_comment_created, reply)
 
@@ -9,14 +9,18 @@ from telegram.ext import CallbackContext
 
 from bot.handlers.common import UserRejectReason, PostRejectReason
 from bot.decorators import is_moderator, ensure_fresh_db_connection
+from club import features
 from notifications.email.users import send_welcome_drink, send_user_rejected_email
 from notifications.telegram.posts import notify_post_approved, announce_in_club_chats, \
     notify_post_rejected, notify_post_collectible_tag_owners, notify_post_room_subscribers
 from notifications.telegram.users import notify_user_profile_approved, notify_user_profile_rejected
 from posts.models.post import Post
 from posts.models.subscriptions import PostSubscription
+from search.indexing import index_later
 from search.models import SearchIndex
+from users.directory import invalidate_member_snapshot
 from users.models.user import User
+from users.people_map import schedule_people_map_rebuild
 
 log = logging.getLogger(__name__)
 
@@ -68,7 +72,7 @@ async def approve_post(update: Update, context: CallbackContext) -> None:
     if post.room_id:
         async_task(notify_post_room_subscribers, post)
 
-    SearchIndex.update_post_index(post)
+    index_later(SearchIndex.TYPE_POST, post.id)
 
     return None
 
@@ -105,7 +109,7 @@ async def forgive_post(update: Update, context: CallbackContext) -> None:
 
     await update.callback_query.edit_message_reply_markup(reply_markup=None)
 
-    SearchIndex.update_post_index(post)
+    index_later(SearchIndex.TYPE_POST, post.id)
 
     return None
 
@@ -143,7 +147,7 @@ async def reject_post(update: Update, context: CallbackContext) -> None:
     post.moderation_status = Post.MODERATION_REJECTED
     post.unpublish()
 
-    SearchIndex.update_post_index(post)
+    index_later(SearchIndex.TYPE_POST, post.id)
 
     async_task(notify_post_rejected, post, reason)
 
@@ -188,7 +192,10 @@ async def approve_user_profile(update: Update, context: CallbackContext) -> None
 
     PostSubscription.subscribe(user, intro, type=PostSubscription.TYPE_ALL_COMMENTS)
 
-    SearchIndex.update_user_index(user)
+    index_later(SearchIndex.TYPE_USER, user.id)
+    invalidate_member_snapshot()
+    if features.PEOPLE_MAP_ENDPOINT:
+        schedule_people_map_rebuild()
 
     async_task(notify_user_profile_approved, user)
     send_welcome_drink(user)
@@ -11,3 +11,73 @@ PRIVATE_FEED = True
 # Enable auth and payment via Patreon
 #   See settings.py for more configs (PATREON_ - prefixed)
 PATREON_AUTH_ENABLED = True
+
+# Keep ranked feed post ids in redis and serve feed pages from there (see posts/materialized_feed.py)
+#   True — feed is read from redis sorted sets, run `manage.py rebuild_feed_index` once after enabling
+#   False — feed is always sorted by Postgres
+MATERIALIZED_FEED = False
+
+# Cache feed, RSS, JSON feed and public post pages for logged out users (see posts/cache.py)
+#   True — anonymous responses are rendered once and served from redis with ETag/Last-Modified
+#   False — every request is rendered from scratch
+ANONYMOUS_RESPONSE_CACHE = False
+
+# Buffer post views in redis and write them to postgres in bulk once a minute (see posts/view_buffer.py)
+#   True — opening a post doesn't write to postgres, `manage.py flush_post_views` runs from cron every minute
+#   False — every view is written to post_views and posts.view_count right away
+BUFFERED_POST_VIEWS = False
+
+# Cache rendered comment threads of posts and personalize them on the frontend (see posts/comment_tree.py)
+#   True — thread HTML is rendered once per comment change, votes/mutes/notes are applied from a small JSON
+#   False — the thread is rendered for every viewer
+COMMENT_TREE_CACHE = False
+
+# Count recent comments and posts for rate limits in redis instead of COUNT queries (see common/rate_limits.py)
+#   True — counters are seeded from postgres on first use, run `manage.py reconcile_rate_limits` from cron
+#   False — every check counts the last 24 hours in postgres
+REDIS_RATE_LIMITS = False
+
+# Apply comment side effects (counters, search index, links, views) in django-q (see comments/outbox.py)
+#   True — creating a comment only writes the comment and an outbox event, bursts on a post are applied at once
+#   False — everything is done right in the request
+COMMENT_OUTBOX = False
+
+# Show profile stats from denormalized counters instead of counting on every view (see posts/counters.py)
+#   True — posts, comments and badges are read from user_counters, run `manage.py verify_counters` to find drift
+#   False — profile counts posts, comments and badges with COUNT queries
+DENORMALIZED_COUNTERS = False
+
+# Index edited posts, comments and profiles in the background instead of the request (see search/indexing.py)
+#   True — changes are queued in redis and upserted in batches once a minute, `manage.py search_index_stats`
+#   False — every save updates search_index right away
+SEARCH_INDEX_QUEUE = False
+
+# Let postgres maintain search_index with generated columns and triggers (see search/triggers.py)
+#   True — the app doesn't index anything, run `manage.py search_index_triggers install` before turning it on
+#   False — search_index is updated by the app (right away or through SEARCH_INDEX_QUEUE)
+SEARCH_INDEX_TRIGGERS = False
+
+# Cache ranked ids of search results and serve next pages from them (see search/cache.py)
+#   True — a query is ranked once per index change, pages and bot tools load rows by cached ids
+#   False — every page of results ranks all matching rows again
+SEARCH_RESULT_CACHE = False
+
+# Rank only the best candidates of search matches instead of all of them (see SearchIndex.search)
+#   True — SEARCH_CANDIDATE_LIMIT most upvoted and recent matches are ranked, `manage.py benchmark_search` to compare
+#   False — every matching row is ranked, which is slow for common words
+SEARCH_TWO_PHASE = False
+
+# Serve @-mention autocomplete from an in-process prefix index of members (see search/mentions.py)
+#   True — every worker keeps sorted slugs and names in memory, refreshed every MENTION_INDEX_REFRESH_SECONDS
+#   False — every keystroke queries users by slug prefix
+MENTION_PREFIX_INDEX = False
+
+# Count people directory facets over an in-process snapshot of members (see users/directory.py)
+#   True — filters are bitsets over columns in memory, facets of the whole directory are precomputed
+#   False — every request runs a count and GROUP BY queries for the facets and dumps the map
+PEOPLE_FACETS = False
+
+# Load the people map from a cached endpoint clustered on the server (see users/people_map.py)
+#   True — the page fetches /people/map.json for every zoom level, revalidated with ETags
+#   False — every member with a location is inlined into the people page and clustered by mapbox
+PEOPLE_MAP_ENDPOINT = False
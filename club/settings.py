@@ -202,6 +202,11 @@ CACHES = {
 }
 
 LANDING_CACHE_TIMEOUT = 60 * 60 * 24  # 24 hours
+RESPONSE_CACHE_TIMEOUT = 10 * 60  # 10 minutes, for anonymous pages (see features.ANONYMOUS_RESPONSE_CACHE)
+COMMENT_TREE_CACHE_TIMEOUT = 60 * 60  # 1 hour, rendered comment threads (see features.COMMENT_TREE_CACHE)
+SEARCH_CACHE_TIMEOUT = 5 * 60  # 5 minutes, ranked search results (see features.SEARCH_RESULT_CACHE)
+MARKDOWN_CACHE_TIMEOUT = 7 * 24 * 60 * 60  # 7 days, rendered texts are keyed by content (see common/markdown/cache.py)
+MARKDOWN_LRU_CACHE_SIZE = 5000  # rendered texts kept in memory of every worker
 
 # Email
 
@@ -226,7 +231,14 @@ AUTH_MAX_CODE_ATTEMPTS = 3
 
 DEFAULT_PAGE_SIZE = 70
 SEARCH_PAGE_SIZE = 25
+SEARCH_CACHE_MAX_RESULTS = 1000  # ranked ids cached per query (40 pages), see features.SEARCH_RESULT_CACHE
+SEARCH_CANDIDATE_LIMIT = 2000  # matches ranked by relevance, most upvoted first (see features.SEARCH_TWO_PHASE)
+SEARCH_APPROXIMATE_COUNT = True  # "≈N results" by the planner estimate when search hits don't fit into the cache
 PEOPLE_PAGE_SIZE = 18
+PEOPLE_SNAPSHOT_MIN_AGE = 30  # seconds between rebuilds of the people directory snapshot after profile edits
+PEOPLE_SNAPSHOT_MAX_AGE = 10 * 60  # the snapshot is rebuilt that often anyway (see users/directory.py)
+PEOPLE_MAP_CACHE_TIMEOUT = 60 * 60  # the clustered map is rebuilt on location changes and after that
+MENTION_INDEX_REFRESH_SECONDS = 5 * 60  # new members appear in @-autocomplete after that (see search/mentions.py)
 PROFILE_COMMENTS_PAGE_SIZE = 100
 PROFILE_POSTS_PAGE_SIZE = 30
 FRIENDS_PAGE_SIZE = 30
@@ -336,8 +348,12 @@ RETRACT_VOTE_TIMEDELTA = timedelta(hours=RETRACT_VOTE_IN_HOURS)
 RATE_LIMIT_POSTS_PER_DAY = 3
 RATE_LIMIT_COMMENTS_PER_DAY = 100
 RATE_LIMIT_COMMENT_PER_DAY_CUSTOM_KEY = "comments_per_day"
+COMMENT_OUTBOX_COALESCE_SECONDS = 3  # side effects of new comments are applied in batches (see comments/outbox.py)
+COMMENT_OUTBOX_SYNC = TESTS_RUN  # tests drain the outbox in place, right after the event is written
+SEARCH_INDEX_DEBOUNCE_SECONDS = 5  # queued objects are indexed when they stop changing (see search/indexing.py)
 POST_VIEW_COOLDOWN_PERIOD = timedelta(days=1)  # how much time must pass before a repeat viewing of a post counts
-POST_HOTNESS_PERIOD = timedelta(days=5)  # time window for hotness recalculation script
+POST_HOTNESS_PERIOD = timedelta(days=5)  # only comments from this period make posts hot
+POST_HOTNESS_HALF_LIFE = timedelta(hours=48)  # every comment loses half of its hotness weight in this time
 MAX_COMMENTS_FOR_DELETE_VS_CLEAR = 10  # number of comments after which the post cannot be deleted
 MIN_DAYS_TO_GIVE_BADGES = 50  # minimum "days" balance to buy and gift any badge
 MAX_MUTE_COUNT = 25  # maximum number of users allowed to mute
@@ -49,7 +49,7 @@ from search.views import search
 from tickets.views import stripe_ticket_sale_webhook
 
 from users.api import api_profile, api_profile_by_telegram_id, api_profile_tags, api_profile_achievements, \
-    api_profile_badges, api_profile_badge
+    api_profile_badges, api_profile_badge, api_people_map
 from users.views.delete_account import request_delete_account, confirm_delete_account
 from users.views.friends import api_friend, friends
 from users.views.messages import on_review, rejected, banned
@@ -131,6 +131,7 @@ urlpatterns = [
 
     path("intro/", intro, name="intro"),
     path("people/", people, name="people"),
+    path("people/map.json", api_people_map, name="api_people_map"),
     path("achievements/", RedirectView.as_view(url="/stats", permanent=True), name="achievements"),
     path("achievements/<slug:achievement_code>/", show_achievement, name="show_achievement"),
     path("stats/", stats, name="stats"),
@@ -0,0 +1,20 @@
+from django.core.management import BaseCommand
+
+from comments.outbox import outbox_stats, drain_comment_outbox
+
+
+class Command(BaseCommand):
+    help = "Shows the comment outbox queue: pending side effects and the lag of the oldest one"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--drain", action="store_true", help="Drain everything older than the coalesce window")
+
+    def handle(self, *args, **options):
+        stats = outbox_stats()
+        self.stdout.write(f"Pending events: {stats['pending']}, lag: {stats['lag_seconds']:.1f}s")
+
+        if options["drain"]:
+            drained, _ = drain_comment_outbox()
+            self.stdout.write(f"Drained: {drained}")
+
+        self.stdout.write("Done 🥙")
@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from club import features
+from comments.outbox import drain_comment_outbox
+
+
+class Command(BaseCommand):
+    help = "Applies comment side effects missed by django-q (see features.COMMENT_OUTBOX), runs every minute"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Drain leftovers after the outbox was turned off")
+
+    def handle(self, *args, **options):
+        if not features.COMMENT_OUTBOX and not options["force"]:
+            self.stdout.write("Comment outbox is disabled, nothing to do")
+            return
+
+        drained, stats = drain_comment_outbox()
+        self.stdout.write(f"Done 🥙 Drained: {drained} of {stats['pending']} events")
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0011_alter_comment_created_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(
+                condition=models.Q(('is_deleted', True)),
+                fields=['post', 'created_at'],
+                name='comments_deleted_post_idx',
+            ),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0013_comment_html_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commentvote',
+            index=models.Index(fields=['user', 'post'], name='comment_votes_user_post_idx'),
+        ),
+    ]
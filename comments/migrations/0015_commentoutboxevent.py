@@ -0,0 +1,29 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0014_commentvote_comment_votes_user_post_idx'),
+        ('posts', '0041_post_html_version'),
+        ('users', '0035_user_referer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentOutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('type', models.CharField(choices=[('created', 'created'), ('edited', 'edited'), ('deleted', 'deleted'), ('restored', 'restored')], max_length=16)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('comment', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='comments.comment')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.post')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='users.user')),
+            ],
+            options={
+                'db_table': 'comment_outbox',
+                'indexes': [models.Index(fields=['post', 'id'], name='comment_outbox_post_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def delete_schedule(apps, schema_editor):
+    # the outbox is drained by `manage.py drain_comment_outbox` from etc/crontab now
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(name="drain_comment_outbox").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0016_schedule_drain_comment_outbox'),
+        ('django_q', '0019_alter_task_options_alter_ormq_key_alter_ormq_lock_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_schedule, migrations.RunPython.noop),
+    ]
@@ -3,12 +3,11 @@ from uuid import uuid4
 
 from django.conf import settings
 from django.db import models
-from django.db.models import BigIntegerField, F, OuterRef, Subquery
-from django.db.models.functions import Extract, Round
+from django.db.models import F, Q
 from django.urls import reverse
-from simple_history.models import HistoricalRecords
 
 from club.exceptions import NotFound, BadRequest
+from common.history import ChangeAwareHistoricalRecords
 from common.request import parse_ip_address
 from posts.models.post import Post
 from users.models.user import User
@@ -24,6 +23,7 @@ class Comment(models.Model):
     title = models.CharField(max_length=128, null=True)
     text = models.TextField(null=False)
     html = models.TextField(null=True)
+    html_version = models.IntegerField(null=True)  # RENDERER_VERSION of html, see posts/prerender.py
     url = models.URLField(max_length=1024, null=True)
 
     metadata = models.JSONField(null=True)
@@ -42,12 +42,13 @@ class Comment(models.Model):
 
     deleted_by = models.UUIDField(null=True)
 
-    history = HistoricalRecords(
+    history = ChangeAwareHistoricalRecords(
         user_model=User,
         table_name="comments_history",
         excluded_fields=[
             "post",
             "html",
+            "html_version",
             "reply_to",
             "ipaddress",
             "useragent",
@@ -63,6 +64,14 @@ class Comment(models.Model):
     class Meta:
         db_table = "comments"
         ordering = ["-created_at"]
+        indexes = [
+            # deleted comments are subtracted from unread counters, see posts/viewer_state.py
+            models.Index(
+                fields=["post", "created_at"],
+                condition=Q(is_deleted=True),
+                name="comments_deleted_post_idx",
+            ),
+        ]
 
     def to_dict(self):
         return {
@@ -85,12 +94,12 @@ class Comment(models.Model):
     def delete(self, deleted_by=None, *args, **kwargs):
         self.is_deleted = True
         self.deleted_by = deleted_by.id
-        self.save()
+        self.save(update_fields=["is_deleted", "deleted_by", "updated_at"])
 
     def undelete(self, *args, **kwargs):
         self.is_deleted = False
         self.deleted_by = None
-        self.save()
+        self.save(update_fields=["is_deleted", "deleted_by", "updated_at"])
 
     def get_absolute_url(self):
         return reverse("show_post", kwargs={
@@ -147,23 +156,16 @@ class Comment(models.Model):
 
     @classmethod
     def objects_for_user(cls, user):
-        vote_qs = CommentVote.objects.filter(comment=OuterRef('pk'), user=user)
-
-        return cls.visible_objects(show_deleted=True).annotate(
-            upvoted_at=Subquery(
-                vote_qs.annotate(
-                    epoch_ms=Round(Extract('created_at', 'epoch') * 1000)
-                ).values('epoch_ms')[:1],
-                output_field=BigIntegerField(),
-            ),
-        )
+        # votes are attached to the loaded comments later, see posts.viewer_state.attach_comment_viewer_state
+        return cls.visible_objects(show_deleted=True)
 
     @classmethod
     def update_post_counters(cls, post, update_activity=True):
-        post.comment_count = Comment.visible_objects().filter(post=post, is_deleted=False).count()
+        # comment_count itself is incremented by signals with the comment, see posts/counters.py
         if update_activity:
             post.last_activity_at = datetime.utcnow()
-        post.save()
+        # only activity fields, so concurrent comment_count, comment_sequence and hotness updates are not overwritten
+        post.save(update_fields=["last_activity_at", "updated_at"])
 
     @classmethod
     def find_top_comment(cls, comment):
@@ -194,6 +196,10 @@ class CommentVote(models.Model):
     class Meta:
         db_table = "comment_votes"
         unique_together = [["user", "comment"]]
+        indexes = [
+            # viewer's votes on a post are loaded with the post page, see posts/viewer_context.py
+            models.Index(fields=["user", "post"], name="comment_votes_user_post_idx"),
+        ]
 
     @property
     def is_retractable(self):
@@ -242,3 +248,36 @@ class CommentVote(models.Model):
             return False
         except CommentVote.DoesNotExist:
             return False
+
+
+class CommentOutboxEvent(models.Model):
+    """
+    Side effects of a comment change, written in the same transaction as the comment
+    and drained by comments/outbox.py in batches per post
+    """
+    TYPE_CREATED = "created"
+    TYPE_EDITED = "edited"
+    TYPE_DELETED = "deleted"
+    TYPE_RESTORED = "restored"
+    TYPES = [
+        (TYPE_CREATED, TYPE_CREATED),
+        (TYPE_EDITED, TYPE_EDITED),
+        (TYPE_DELETED, TYPE_DELETED),
+        (TYPE_RESTORED, TYPE_RESTORED),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    type = models.CharField(max_length=16, choices=TYPES)
+
+    post = models.ForeignKey(Post, related_name="+", on_delete=models.CASCADE)
+    # no constraint: events of hard deleted comments still have to clean up the search index
+    comment = models.ForeignKey(Comment, related_name="+", db_constraint=False, on_delete=models.DO_NOTHING)
+    user = models.ForeignKey(User, related_name="+", null=True, on_delete=models.SET_NULL)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "comment_outbox"
+        indexes = [
+            models.Index(fields=["post", "id"], name="comment_outbox_post_idx"),
+        ]
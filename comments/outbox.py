@@ -0,0 +1,163 @@
+"""
+Transactional outbox for comment side effects. Saving a comment only inserts a CommentOutboxEvent
+in the same transaction, the rest is done later by a django-q task per post:
+
+- post last_activity_at — once per batch instead of once per comment (comment_count is kept by posts/counters.py)
+- search index of created, edited, deleted and restored comments
+- links to other posts mentioned in new comments
+- last activity and post view of comment authors
+
+Bursts are coalesced: the first event of a post enqueues drain_post() right away and takes a redis lock
+for the coalesce window, events written while it's held wait for drain_comment_outbox(). It runs every minute
+(`manage.py drain_comment_outbox` in etc/crontab) and picks them up with whatever was missed (redis or django-q
+was down) in one batch per post.
+
+Enabled by features.COMMENT_OUTBOX. Without it, or with settings.COMMENT_OUTBOX_SYNC (tests),
+events are applied right away in the same request and never written to the table.
+"""
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from django_q.tasks import async_task
+from django_redis import get_redis_connection
+
+from club import features
+from comments.models import Comment, CommentOutboxEvent
+from posts.models.linked import LinkedPost
+from posts.models.post import Post
+from posts.models.views import PostView
+from search.cache import bump_search_generation
+from search.indexing import index_objects
+from search.models import SearchIndex
+from users.models.user import User
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = "comment_outbox"
+DRAIN_BATCH_SIZE = 500
+LAG_WARNING_SECONDS = 60
+
+
+def drain_lock_key(post_id):
+    return f"{KEY_PREFIX}:scheduled:{post_id}"
+
+
+def is_sync():
+    return not features.COMMENT_OUTBOX or settings.COMMENT_OUTBOX_SYNC
+
+
+def record_comment_event(comment, type, user=None):
+    event = CommentOutboxEvent(type=type, post_id=comment.post_id, comment_id=comment.id, user=user)
+
+    if is_sync():
+        # nothing to coalesce, the event is applied without a trip through the table
+        _apply_events(comment.post, [event])
+        return
+
+    event.save()
+    post_id = comment.post_id
+    transaction.on_commit(lambda: schedule_drain(post_id))
+
+
+def schedule_drain(post_id):
+    try:
+        # one task per post and coalesce window, the lock is not released — the sweep drains the rest
+        is_locked = get_redis_connection("default").set(
+            drain_lock_key(post_id), 1, nx=True, ex=settings.COMMENT_OUTBOX_COALESCE_SECONDS
+        )
+        if is_locked:
+            async_task(drain_post, post_id)
+    except Exception as ex:
+        log.warning(f"Can't schedule comment outbox drain for post {post_id}, the sweep will do it: {ex}")
+
+
+def drain_post(post_id):
+    """
+    Applies all pending events of the post, returns how many
+    """
+    drained = 0
+    while True:
+        batch_size = _drain_batch(post_id)
+        drained += batch_size
+        if batch_size < DRAIN_BATCH_SIZE:
+            break
+    return drained
+
+
+def drain_comment_outbox():
+    """
+    Drains posts whose events are older than the coalesce window. Runs every minute from cron
+    """
+    stats = outbox_stats()
+    if stats["lag_seconds"] > LAG_WARNING_SECONDS:
+        log.warning(f"Comment outbox is behind: {stats['pending']} events, {stats['lag_seconds']:.0f}s lag")
+
+    post_ids = CommentOutboxEvent.objects\
+        .filter(created_at__lt=datetime.utcnow() - timedelta(seconds=settings.COMMENT_OUTBOX_COALESCE_SECONDS))\
+        .order_by()\
+        .values_list("post_id", flat=True)\
+        .distinct()
+
+    drained = sum(drain_post(post_id) for post_id in list(post_ids))
+    return drained, stats
+
+
+def outbox_stats():
+    """
+    Pending events and the age of the oldest one, the queue lag
+    """
+    stats = CommentOutboxEvent.objects.aggregate(pending=Count("id"), oldest=Min("created_at"))
+    return {
+        "pending": stats["pending"],
+        "lag_seconds": (datetime.utcnow() - stats["oldest"]).total_seconds() if stats["oldest"] else 0.0,
+    }
+
+
+def _drain_batch(post_id):
+    with transaction.atomic():
+        # concurrent drains of the same post skip each other's rows instead of waiting
+        events = list(
+            CommentOutboxEvent.objects
+            .select_for_update(skip_locked=True)
+            .filter(post_id=post_id)
+            .order_by("id")[:DRAIN_BATCH_SIZE]
+        )
+        if not events:
+            return 0
+
+        post = Post.objects.filter(id=post_id).first()
+        if post:
+            _apply_events(post, events)
+
+        CommentOutboxEvent.objects.filter(id__in=[event.id for event in events]).delete()
+
+    log.info(f"Drained {len(events)} comment events of post {post_id}, "
+             f"lag {(datetime.utcnow() - events[0].created_at).total_seconds():.1f}s")
+    return len(events)
+
+
+def _apply_events(post, events):
+    comments = Comment.objects.select_related("author", "post").in_bulk({event.comment_id for event in events})
+    created_events = [event for event in events if event.type == CommentOutboxEvent.TYPE_CREATED]
+
+    # the index follows the current state of the comments, no matter how many times they changed in the batch
+    if not features.SEARCH_INDEX_TRIGGERS:
+        index_objects(SearchIndex.TYPE_COMMENT, {event.comment_id for event in events})
+    else:
+        # postgres has already indexed them, cached results are stale now
+        transaction.on_commit(bump_search_generation)
+
+    for event in created_events:
+        if event.comment_id in comments:
+            LinkedPost.create_links_from_text(post, comments[event.comment_id].text)
+
+    Comment.update_post_counters(post, update_activity=bool(created_events))
+
+    # comment authors have seen the post with their own comments
+    authors = User.objects.in_bulk({event.user_id for event in created_events if event.user_id})
+    for author in authors.values():
+        author.update_last_activity()
+        PostView.register_view(request=None, user=author, post=post)
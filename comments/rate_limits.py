@@ -1,34 +1,97 @@
+import logging
 from datetime import datetime, timedelta
 
 from django.conf import settings
+from django.db import transaction
+from redis import RedisError
 
+from club import features
 from comments.models import Comment
+from common.rate_limits import SlidingWindowCounter
 
-def is_comment_rate_limit_exceeded(post, user):
+log = logging.getLogger(__name__)
+
+RATE_LIMIT_WINDOW = timedelta(hours=24)
+
+
+def _visible_comments_since(since, **filters):
+    return Comment.visible_objects() \
+        .filter(created_at__gte=since, **filters) \
+        .order_by() \
+        .values_list("id", "created_at")
+
+
+# recent comments of the user, in total and in one post (see features.REDIS_RATE_LIMITS)
+user_comments_counter = SlidingWindowCounter(
+    "comments:user",
+    RATE_LIMIT_WINDOW,
+    source=lambda user_id, since: _visible_comments_since(since, author_id=user_id),
+)
+post_comments_counter = SlidingWindowCounter(
+    "comments:post",
+    RATE_LIMIT_WINDOW,
+    source=lambda user_id, post_id, since: _visible_comments_since(since, author_id=user_id, post_id=post_id),
+)
+
+
+def is_comment_rate_limit_exceeded(post, user, post_comments_count=None, total_comments_count=None):
+    """
+    Counts can be passed if they were already loaded, see posts/viewer_context.py
+    """
     if user.is_moderator:
         return False
 
-    return check_post_rate_exceeded(post, user) or check_user_rate_exceeded(user)
+    return check_post_rate_exceeded(post, user, post_comments_count) \
+        or check_user_rate_exceeded(user, total_comments_count)
 
 
-def check_post_rate_exceeded(post, user):
+def check_post_rate_exceeded(post, user, post_comments_count=None):
     custom_rate_limit_for_post = post.get_custom_comment_limit()
     if custom_rate_limit_for_post is not None:
-        post_comments_count = Comment.visible_objects() \
-            .filter(author=user, post=post, created_at__gte=datetime.utcnow() - timedelta(hours=24)) \
-            .count()
+        if post_comments_count is None:
+            post_comments_count = count_recent_comments(post_comments_counter, user.id, post.id)
         return post_comments_count >= custom_rate_limit_for_post
     return False
 
 
-def check_user_rate_exceeded(user):
+def check_user_rate_exceeded(user, total_comments_count=None):
     comments_per_day_limit = settings.RATE_LIMIT_COMMENTS_PER_DAY
     custom_rate_limit_for_user = user.get_custom_comment_limit()
     if custom_rate_limit_for_user is not None:
         comments_per_day_limit = custom_rate_limit_for_user
 
-    total_comments_count = Comment.visible_objects() \
-        .filter(author=user, created_at__gte=datetime.utcnow() - timedelta(hours=24)) \
-        .count()
+    if total_comments_count is None:
+        total_comments_count = count_recent_comments(user_comments_counter, user.id)
 
     return total_comments_count >= comments_per_day_limit
+
+
+def count_recent_comments(counter, *parts):
+    if features.REDIS_RATE_LIMITS:
+        return counter.count(*parts)
+    return counter.source(*parts, since=datetime.utcnow() - RATE_LIMIT_WINDOW).count()
+
+
+def track_comment(comment, is_deleted=False):
+    """
+    Keeps counters in sync with a saved or deleted comment once the transaction is committed
+    """
+    if not features.REDIS_RATE_LIMITS:
+        return
+
+    is_counted = not is_deleted and comment.is_visible and comment.deleted_by is None
+    comment_id, author_id, post_id, created_at = comment.id, comment.author_id, comment.post_id, comment.created_at
+
+    def update_counters():
+        try:
+            if is_counted:
+                user_comments_counter.add(author_id, event_id=comment_id, at=created_at)
+                post_comments_counter.add(author_id, post_id, event_id=comment_id, at=created_at)
+            else:
+                user_comments_counter.remove(author_id, event_id=comment_id)
+                post_comments_counter.remove(author_id, post_id, event_id=comment_id)
+        except RedisError as ex:
+            # the counter will be fixed by the next reconcile_rate_limits
+            log.warning(f"Can't track comment {comment_id} in rate limits: {ex}")
+
+    transaction.on_commit(update_counters)
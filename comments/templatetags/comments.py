@@ -1,17 +1,30 @@
 from collections import defaultdict, namedtuple
 
 from django import template
+from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 
 from club import settings
 from common.markdown.markdown import markdown_text
 
 from comments.forms import BattleCommentForm
+from posts.templatetags.posts import can_upvote_comment
+from posts.viewer_state import epoch_ms
 
 register = template.Library()
 
 TreeComment = namedtuple("TreeComment", ["comment", "replies"])
 
+# who can see comment buttons, static conditions (is_commentable, deleted authors) stay in templates
+# keep in sync with applyCommentsViewerState() in frontend/static/js/common/comments.js
+VIEWER_ACTIONS = {
+    "pin": lambda me, comment: me.id == comment.post.author_id or me.is_moderator,
+    "delete": lambda me, comment: me.id in (comment.author_id, comment.post.author_id) or me.is_moderator,
+    "edit": lambda me, comment: me.id == comment.author_id or me.is_moderator,
+    "reply": lambda me, comment: me.is_active_membership,
+    "badge": lambda me, comment: me.id != comment.author_id,
+}
+
 
 @register.filter()
 def comment_tree(comments):
@@ -72,3 +85,69 @@ def selected_battle_side(context):
         return "selected" if context['comment'].battle_side == context['side']['name'] else ""
     except (KeyError, AttributeError, TypeError):
         return ""
+
+
+@register.tag
+def viewer_action(parser, token):
+    """
+    {% viewer_action "edit" comment %}<a>...</a>{% endviewer_action %}
+
+    Renders the content if `me` is allowed to do the action. In cached comment trees (viewer_overlay)
+    renders it hidden for everybody, the frontend shows it using the viewer state (see posts/comment_tree.py)
+    """
+    try:
+        _, action, comment = token.split_contents()
+    except ValueError:
+        raise template.TemplateSyntaxError('Usage: {% viewer_action "edit" comment %}...{% endviewer_action %}')
+
+    nodelist = parser.parse(("endviewer_action",))
+    parser.delete_first_token()
+    return ViewerActionNode(nodelist, parser.compile_filter(action), parser.compile_filter(comment))
+
+
+class ViewerActionNode(template.Node):
+    def __init__(self, nodelist, action, comment):
+        self.nodelist = nodelist
+        self.action = action
+        self.comment = comment
+
+    def render(self, context):
+        action = self.action.resolve(context)
+        if context.get("viewer_overlay"):
+            return format_html(
+                '<span class="viewer-action" data-viewer-action="{}" hidden>{}</span>',
+                action,
+                mark_safe(self.nodelist.render(context)),
+            )
+
+        me = context.get("me")
+        if me and VIEWER_ACTIONS[action](me, self.comment.resolve(context)):
+            return self.nodelist.render(context)
+
+        return ""
+
+
+@register.simple_tag(takes_context=True)
+def comment_viewer_attrs(context, comment):
+    # cached comment trees are personalized on the frontend by these
+    if not context.get("viewer_overlay"):
+        return ""
+    return format_html(
+        'data-viewer-comment data-author-id="{}" data-created-at="{}"',
+        comment.author_id,
+        epoch_ms(comment.created_at),
+    )
+
+
+@register.simple_tag(takes_context=True)
+def comment_upvote_attrs(context, comment):
+    if context.get("viewer_overlay"):
+        return mark_safe("data-viewer-upvote")
+
+    attrs = []
+    upvoted_at = getattr(comment, "upvoted_at", None)
+    if upvoted_at:
+        attrs.append(format_html('initial-is-voted initial-upvote-timestamp="{}"', upvoted_at))
+    if not can_upvote_comment(context.get("me"), comment) or context.get("upvote_disabled"):
+        attrs.append("is-disabled")
+    return mark_safe(" ".join(attrs))
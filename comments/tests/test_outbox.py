@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from comments import outbox
+from comments.models import Comment, CommentOutboxEvent
+from debug.utils_for_tests import create_approved_user
+from posts.models.post import Post
+from posts.models.views import PostView
+from search.models import SearchIndex
+
+
+class OutboxTestBase(TestCase):
+    def setUp(self):
+        self._cleanup_redis()
+        self.author = create_approved_user("outbox_author")
+        self.post = Post.objects.create(
+            slug="outbox-post",
+            title="Outbox",
+            text="text",
+            type=Post.TYPE_POST,
+            author=self.author,
+            visibility=Post.VISIBILITY_EVERYWHERE,
+        )
+
+    def tearDown(self):
+        self._cleanup_redis()
+
+    def _cleanup_redis(self):
+        redis = outbox.get_redis_connection("default")
+        keys = list(redis.scan_iter(match=f"{outbox.KEY_PREFIX}:*"))
+        if keys:
+            redis.delete(*keys)
+
+    def _comment(self, text="comment"):
+        comment = Comment.objects.create(post=self.post, author=self.author, text=text)
+        outbox.record_comment_event(comment, CommentOutboxEvent.TYPE_CREATED, user=self.author)
+        return comment
+
+    def _post(self):
+        return Post.objects.get(id=self.post.id)
+
+
+class TestSyncOutbox(OutboxTestBase):
+    def test_side_effects_are_applied_in_place(self):
+        comment = self._comment()
+
+        self.assertEqual(self._post().comment_count, 1)
+        self.assertTrue(SearchIndex.objects.filter(comment=comment).exists())
+        self.assertTrue(PostView.objects.filter(user=self.author, post=self.post).exists())
+        self.assertFalse(CommentOutboxEvent.objects.exists())
+
+    def test_events_are_not_written_to_the_table(self):
+        with patch.object(CommentOutboxEvent.objects, "create") as create, \
+                patch.object(CommentOutboxEvent, "save") as save:
+            self._comment()
+
+        create.assert_not_called()
+        save.assert_not_called()
+        self.assertEqual(self._post().comment_count, 1)
+
+    @patch("club.features.SEARCH_INDEX_TRIGGERS", True)
+    @patch("comments.outbox.bump_search_generation")
+    def test_cached_search_is_invalidated_when_triggers_index_comments(self, bump_search_generation):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._comment()
+
+        bump_search_generation.assert_called_once()
+
+
+@patch("club.features.COMMENT_OUTBOX", True)
+@override_settings(COMMENT_OUTBOX_SYNC=False)
+class TestAsyncOutbox(OutboxTestBase):
+    @patch("comments.outbox.async_task")
+    def test_burst_is_coalesced_into_one_drain(self, async_task):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                self._comment(f"comment {i}")
+
+        async_task.assert_called_once()
+        self.assertEqual(self._post().comment_count, 3)  # counters are written with the comments, see posts/counters.py
+        self.assertFalse(SearchIndex.objects.filter(post=self.post, type=SearchIndex.TYPE_COMMENT).exists())
+        self.assertEqual(outbox.outbox_stats()["pending"], 3)
+
+        self.assertEqual(outbox.drain_post(self.post.id), 3)
+
+        self.assertEqual(self._post().comment_count, 3)
+        self.assertEqual(SearchIndex.objects.filter(post=self.post, type=SearchIndex.TYPE_COMMENT).count(), 3)
+        self.assertEqual(outbox.outbox_stats(), {"pending": 0, "lag_seconds": 0.0})
+
+    @patch("comments.outbox.async_task")
+    def test_deleted_comment_leaves_index(self, async_task):
+        comment = self._comment()
+        outbox.drain_post(self.post.id)
+
+        comment.delete(deleted_by=self.author)
+        outbox.record_comment_event(comment, CommentOutboxEvent.TYPE_DELETED, user=self.author)
+        outbox.drain_post(self.post.id)
+
+        self.assertFalse(SearchIndex.objects.filter(comment=comment).exists())
+        self.assertEqual(self._post().comment_count, 0)
+
+    @patch("comments.outbox.async_task", side_effect=ConnectionError("queue is down"))
+    def test_sweep_drains_missed_events(self, async_task):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._comment()
+        CommentOutboxEvent.objects.update(created_at=datetime.utcnow() - timedelta(minutes=5))
+
+        self.assertGreaterEqual(outbox.outbox_stats()["lag_seconds"], 5 * 60)
+        drained, _ = outbox.drain_comment_outbox()
+
+        self.assertEqual(drained, 1)
+        self.assertEqual(self._post().comment_count, 1)
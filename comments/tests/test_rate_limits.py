@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from comments import rate_limits
+from comments.models import Comment
+from common.rate_limits import KEY_PREFIX, SlidingWindowCounter, redis_client
+from debug.utils_for_tests import create_approved_user
+from posts.models.post import Post
+
+
+def cleanup_redis():
+    redis = redis_client()
+    keys = list(redis.scan_iter(match=f"{KEY_PREFIX}:*"))
+    if keys:
+        redis.delete(*keys)
+
+
+class TestSlidingWindowCounter(TestCase):
+    def setUp(self):
+        cleanup_redis()
+
+    def tearDown(self):
+        cleanup_redis()
+
+    def test_hit_stops_at_limit(self):
+        counter = SlidingWindowCounter("test", timedelta(hours=1))
+
+        self.assertEqual([counter.hit("key", limit=2) for _ in range(3)], [True, True, False])
+        self.assertTrue(counter.hit("other_key", limit=2))
+        self.assertEqual(counter.count("key"), 2)
+
+    def test_old_events_leave_the_window(self):
+        counter = SlidingWindowCounter("test", timedelta(hours=1))
+        counter.add("key", event_id="old", at=datetime.utcnow() - timedelta(hours=2))
+        counter.add("key", event_id="new")
+
+        self.assertEqual(counter.count("key"), 1)
+
+
+@patch("club.features.REDIS_RATE_LIMITS", True)
+class TestCommentRateLimits(TestCase):
+    def setUp(self):
+        cleanup_redis()
+        self.user = create_approved_user("rate_limited")
+        self.post = Post.objects.create(
+            slug="rate-limits-post",
+            title="Rate limits",
+            text="text",
+            type=Post.TYPE_POST,
+            author=self.user,
+            visibility=Post.VISIBILITY_EVERYWHERE,
+        )
+
+    def tearDown(self):
+        cleanup_redis()
+
+    def _comment(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Comment.objects.create(post=self.post, author=self.user, text="comment", **kwargs)
+
+    def _count(self):
+        return rate_limits.user_comments_counter.count(self.user.id)
+
+    def test_cold_counter_is_seeded_from_db(self):
+        Comment.objects.create(post=self.post, author=self.user, text="before redis")
+
+        self.assertEqual(self._count(), 1)
+        self.assertEqual(rate_limits.post_comments_counter.count(self.user.id, self.post.id), 1)
+
+    def test_new_and_deleted_comments_are_tracked(self):
+        self.assertEqual(self._count(), 0)
+
+        comment = self._comment()
+        self._comment()
+        self.assertEqual(self._count(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            comment.delete(deleted_by=self.user)
+        self.assertEqual(self._count(), 1)
+
+    def test_reconcile_fixes_lost_events(self):
+        self.assertEqual(self._count(), 0)
+        Comment.objects.create(post=self.post, author=self.user, text="lost on the way to redis")
+        self.assertEqual(self._count(), 0)
+
+        rate_limits.user_comments_counter.reconcile()
+
+        self.assertEqual(self._count(), 1)
+
+    @override_settings(RATE_LIMIT_COMMENTS_PER_DAY=2)
+    def test_limit_is_exceeded(self):
+        self._comment()
+        self.assertFalse(rate_limits.is_comment_rate_limit_exceeded(self.post, self.user))
+
+        self._comment()
+        self.assertTrue(rate_limits.is_comment_rate_limit_exceeded(self.post, self.user))
+
+    def test_post_limits_use_the_same_counters(self):
+        self.assertTrue(Post.check_rate_limits(self.user))
+
+        with override_settings(RATE_LIMIT_POSTS_PER_DAY=1):
+            self.assertFalse(Post.check_rate_limits(self.user))
@@ -257,5 +257,5 @@ class TestWarmCommentHtmlCache(TestCase):
         with CaptureQueriesContext(connection) as queries:
             _warm_comment_html_cache(comments)
 
-        update_queries = [q for q in queries if q["sql"].startswith("UPDATE")]
+        update_queries = [q for q in queries if q["sql"].lstrip().upper().startswith("UPDATE")]
         self.assertEqual(len(update_queries), 1)
@@ -12,16 +12,14 @@ from django_q.tasks import async_task
 from authn.decorators.auth import require_auth
 from club.exceptions import AccessDenied, RateLimitException
 from comments.forms import CommentForm, ReplyForm, BattleCommentForm, edit_form_class_for_comment
-from comments.models import Comment, CommentVote
+from comments.models import Comment, CommentVote, CommentOutboxEvent
+from comments.outbox import record_comment_event
 from comments.rate_limits import is_comment_rate_limit_exceeded
 from common.request import parse_ip_address, parse_useragent
 from authn.decorators.api import api
 from notifications.telegram.comments import notify_on_comment_created
-from posts.models.linked import LinkedPost
 from posts.models.post import Post
 from posts.models.subscriptions import PostSubscription
-from posts.models.views import PostView
-from search.models import SearchIndex
 
 log = logging.getLogger(__name__)
 
@@ -74,17 +72,8 @@ def create_comment(request, post_slug):
                     else PostSubscription.TYPE_TOP_LEVEL_ONLY
                 )
 
-            # update the shitload of counters :)
-            request.me.update_last_activity()
-            Comment.update_post_counters(post)
-            PostView.increment_unread_comments(comment)
-            PostView.register_view(
-                request=request,
-                user=request.me,
-                post=post,
-            )
-            SearchIndex.update_comment_index(comment)
-            LinkedPost.create_links_from_text(post, comment.text)
+            # the shitload of counters, search index and links is updated from the outbox
+            record_comment_event(comment, CommentOutboxEvent.TYPE_CREATED, user=request.me)
 
             # send all kind of notifications
             async_task(notify_on_comment_created, comment)
@@ -147,7 +136,7 @@ def edit_comment(request, comment_id):
             comment.useragent = parse_useragent(request)
             comment.save()
 
-            SearchIndex.update_comment_index(comment)
+            record_comment_event(comment, CommentOutboxEvent.TYPE_EDITED, user=request.me)
 
             return redirect("show_comment", post.slug, comment.id)
     else:
@@ -201,14 +190,11 @@ def delete_comment(request, comment_id):
                     message="Только тот, кто удалил комментарий, может его восстановить"
                 )
 
-    if was_deleted:
-        PostView.decrement_unread_comments(comment)
-        SearchIndex.objects.filter(comment=comment).delete()
-    else:
-        PostView.increment_unread_comments(comment)
-        SearchIndex.update_comment_index(comment)
-
-    Comment.update_post_counters(comment.post, update_activity=False)
+    record_comment_event(
+        comment,
+        CommentOutboxEvent.TYPE_DELETED if was_deleted else CommentOutboxEvent.TYPE_RESTORED,
+        user=request.me,
+    )
 
     return redirect("show_comment", comment.post.slug, comment.id)
 
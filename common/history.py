@@ -0,0 +1,81 @@
+"""
+simple-history records a historical row on every save(), even when only excluded fields (html, counters,
+flags) were changed. ChangeAwareHistoricalRecords remembers tracked fields when the object is loaded and
+skips the insert when a save doesn't change any of them.
+
+Written and skipped rows are counted per model and day, see `manage.py history_stats`.
+"""
+import copy
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.db.models.signals import post_init
+from simple_history.models import HistoricalRecords
+
+STATS_KEY_PREFIX = "history:stats"
+STATS_DAYS = 14
+
+
+class ChangeAwareHistoricalRecords(HistoricalRecords):
+    def finalize(self, sender, **kwargs):
+        super().finalize(sender, **kwargs)
+        if sender is self.cls:
+            post_init.connect(self.remember_tracked_values, sender=sender, weak=False)
+
+    def remember_tracked_values(self, instance, **kwargs):
+        instance._history_tracked_values = self.tracked_values(instance)
+
+    def tracked_values(self, instance):
+        # read from __dict__, fields deferred with .only() are missing and make the comparison impossible
+        values = {}
+        for field in self.fields_included(instance):
+            if field.attname not in instance.__dict__:
+                return None
+            value = instance.__dict__[field.attname]
+            values[field.attname] = copy.deepcopy(value) if isinstance(value, (list, dict)) else value
+        return values
+
+    def has_tracked_changes(self, instance, update_fields=None):
+        if update_fields is not None:
+            tracked_names = {name for field in self.fields_included(instance) for name in (field.name, field.attname)}
+            return bool(tracked_names.intersection(update_fields))
+
+        previous_values = getattr(instance, "_history_tracked_values", None)
+        return previous_values is None or previous_values != self.tracked_values(instance)
+
+    def post_save(self, instance, created, using=None, **kwargs):
+        if not created and not self.has_tracked_changes(instance, kwargs.get("update_fields")):
+            count_history_record(instance, is_skipped=True)
+            return
+
+        if not hasattr(instance, "skip_history_when_saving"):
+            count_history_record(instance, is_skipped=False)
+        super().post_save(instance, created, using=using, **kwargs)
+        instance._history_tracked_values = self.tracked_values(instance)
+
+
+def count_history_record(instance, is_skipped):
+    key = _stats_key(instance._meta.db_table, datetime.utcnow().date(), "skipped" if is_skipped else "written")
+    try:
+        cache.incr(key)
+    except ValueError:  # no such key yet
+        cache.set(key, 1, timeout=STATS_DAYS * 24 * 60 * 60)
+
+
+def history_stats(table_names, days=7):
+    """
+    Returns [(date, table_name, written, skipped)] for the last days, newest first
+    """
+    today = datetime.utcnow().date()
+    rows = []
+    for day in range(days):
+        date = today - timedelta(days=day)
+        for table_name in table_names:
+            written = cache.get(_stats_key(table_name, date, "written")) or 0
+            skipped = cache.get(_stats_key(table_name, date, "skipped")) or 0
+            rows.append((date, table_name, written, skipped))
+    return rows
+
+
+def _stats_key(table_name, date, kind):
+    return f"{STATS_KEY_PREFIX}:{date.isoformat()}:{table_name}:{kind}"
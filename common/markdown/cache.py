@@ -0,0 +1,81 @@
+"""
+Rendered markdown cache. The same text is rendered many times: every comment for every subscriber
+notification, posts for digests, RSS and telegram. The result depends only on the text, the renderer
+and its options, so it's keyed by (renderer, options, sha1 of text):
+
+- in-process LRU for the hottest texts (free, but per worker)
+- redis (django cache) shared by all workers, only for texts long enough to be worth a round trip
+
+Bump RENDERER_VERSION after changing any renderer or plugin: old HTML won't be served from the cache,
+and `manage.py rerender_markdown` will re-render posts and comments stamped with older versions.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+RENDERER_VERSION = 1
+KEY_PREFIX = "markdown"
+REDIS_MIN_TEXT_LENGTH = 300  # shorter texts render faster than a redis round trip
+
+
+class LRUCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+local_cache = LRUCache(max_size=settings.MARKDOWN_LRU_CACHE_SIZE)
+
+
+def render_cache_key(renderer, options, text):
+    text_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    options_key = ",".join(f"{name}={value}" for name, value in sorted(options.items()))
+    return f"{KEY_PREFIX}:v{RENDERER_VERSION}:{renderer.__name__}:{options_key}:{text_hash}"
+
+
+def cached_render(renderer, options, text, render):
+    """
+    Returns rendered text from the LRU, then redis, then calls render() and stores the result in both
+    """
+    key = render_cache_key(renderer, options, text)
+
+    result = local_cache.get(key)
+    if result is not None:
+        return result
+
+    use_redis = len(text) >= REDIS_MIN_TEXT_LENGTH
+    if use_redis:
+        result = cache.get(key)  # None if redis is down (IGNORE_EXCEPTIONS)
+
+    if result is None:
+        result = render()
+        if use_redis:
+            cache.set(key, result, settings.MARKDOWN_CACHE_TIMEOUT)
+
+    local_cache.set(key, result)
+    return result
@@ -9,6 +9,8 @@ from common.regexp import IMAGE_RE, VIDEO_RE, YOUTUBE_RE, TWITTER_RE, USERNAME_R
 
 
 class ClubRenderer(mistune.HTMLRenderer):
+    OPTIONS = ("uniq_id", "disable_mentions")  # can be changed between renders, see markdown_text()
+
     def __init__(self, uniq_id=None, disable_mentions=False):
         super().__init__()
         self.uniq_id = uniq_id
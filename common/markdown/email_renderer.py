@@ -5,6 +5,8 @@ from common.regexp import YOUTUBE_RE
 
 
 class EmailRenderer(ClubRenderer):
+    OPTIONS = ()
+
     def __init__(self, *args, **kwargs):
         super().__init__()
 
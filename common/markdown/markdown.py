@@ -1,22 +1,56 @@
+import re
+import threading
+
 import mistune
 
+from common.markdown.cache import cached_render
 from common.markdown.club_renderer import ClubRenderer
 from common.markdown.email_renderer import EmailRenderer
 from common.markdown.plain_renderer import PlainRenderer
 from common.markdown.telegram_renderer import TelegramRenderer
 from common.markdown.plugins.clicker import clicker
 
+_parsers = threading.local()
+
+CLICKER_MARK_RE = re.compile(r"\[[ xX]\]")  # rough, it's only a cache key optimization
+
+
+def markdown_parser(renderer):
+    # mistune keeps parsing state per call, so a parser can be reused, but not shared between threads:
+    # renderer options are switched before every render
+    parsers = _parsers.__dict__.setdefault("by_renderer", {})
+    if renderer not in parsers:
+        parsers[renderer] = mistune.create_markdown(
+            escape=True,
+            renderer=renderer(),
+            plugins=["strikethrough", "url", "table", clicker]
+        )
+    return parsers[renderer]
+
 
 def markdown_text(text, renderer=ClubRenderer, uniq_id=None, disable_mentions=False):
-    markdown = mistune.create_markdown(
-        escape=True,
-        renderer=renderer(
-            uniq_id=uniq_id,
-            disable_mentions=disable_mentions
-        ),
-        plugins=["strikethrough", "url", "table", clicker]
-    )
-    return (markdown(text) or "").strip()
+    if not text:
+        return ""
+
+    # options the renderer doesn't support don't change the result, so they're not a part of the cache key
+    options = {
+        name: value
+        for name, value in {"uniq_id": uniq_id, "disable_mentions": disable_mentions}.items()
+        if name in getattr(renderer, "OPTIONS", ())
+    }
+
+    def render():
+        markdown = markdown_parser(renderer)
+        for name, value in options.items():
+            setattr(markdown.renderer, name, value)
+        return (markdown(text) or "").strip()
+
+    # uniq_id is only used for clicker ids, other texts of different posts and comments can share the cache
+    key_options = options
+    if "uniq_id" in options and not CLICKER_MARK_RE.search(text):
+        key_options = {name: value for name, value in options.items() if name != "uniq_id"}
+
+    return cached_render(renderer, key_options, text, render)
 
 
 def markdown_plain(text):
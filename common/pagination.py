@@ -1,8 +1,193 @@
+import base64
+import json
+from datetime import datetime
+
 from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
 from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+CURSOR_QUERY_PARAM = "cursor"
+CURSOR_FORWARD = "n"
+CURSOR_BACKWARD = "p"
 
 
 def paginate(request, items, page_size=settings.DEFAULT_PAGE_SIZE):
     paginator = Paginator(items, page_size)
     page_number = request.GET.get("page") or 1
     return paginator.get_page(page_number)
+
+
+def paginate_by_cursor(request, items, page_size=settings.DEFAULT_PAGE_SIZE):
+    """
+    Keyset pagination: instead of COUNT(*) + OFFSET it remembers the ordering values of the
+    last (or first) item on the page and asks the DB for rows "after" them. Works for any queryset
+    ordered by plain fields or annotations, pk is added as a tie-breaker.
+
+    Old ?page= links and unsupported orderings fall back to the classic paginate()
+    """
+    if request.GET.get("page") and not request.GET.get(CURSOR_QUERY_PARAM):
+        return paginate(request, items, page_size=page_size)
+
+    ordering = _cursor_ordering(items)
+    if not ordering:
+        return paginate(request, items, page_size=page_size)
+
+    direction, values = decode_cursor(request.GET.get(CURSOR_QUERY_PARAM), ordering)
+
+    page_items = items.order_by(*ordering)
+    if direction == CURSOR_BACKWARD:
+        page_items = page_items.reverse()
+
+    if values:
+        try:
+            page_items = page_items.filter(_keyset_filter(items, ordering, values, direction))
+        except (ValueError, TypeError, ValidationError):
+            # broken cursor — show the first page like Paginator.get_page does
+            direction, values = CURSOR_FORWARD, None
+            page_items = items.order_by(*ordering)
+
+    object_list = list(page_items[:page_size + 1])
+    has_more = len(object_list) > page_size
+    object_list = object_list[:page_size]
+
+    if direction == CURSOR_BACKWARD:
+        object_list.reverse()
+        return CursorPage(object_list, ordering, has_next=True, has_previous=has_more)
+
+    return CursorPage(object_list, ordering, has_next=has_more, has_previous=bool(values))
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder cuts microseconds, but keyset comparison needs the exact value
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorPage:
+    """
+    Duck-types the parts of django.core.paginator.Page that our templates use
+    """
+
+    def __init__(self, object_list, ordering, has_next, has_previous):
+        self.object_list = object_list
+        self.ordering = ordering
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f"<CursorPage: {len(self.object_list)} items>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return encode_cursor(CURSOR_FORWARD, self.object_list[-1], self.ordering)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return encode_cursor(CURSOR_BACKWARD, self.object_list[0], self.ordering)
+
+
+def encode_cursor(direction, item, ordering):
+    values = [getattr(item, field.lstrip("-")) for field in ordering]
+    payload = json.dumps([direction, values], cls=CursorJSONEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, ordering):
+    if not cursor:
+        return CURSOR_FORWARD, None
+
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        direction, values = json.loads(payload)
+    except (ValueError, TypeError):
+        return CURSOR_FORWARD, None
+
+    if direction not in (CURSOR_FORWARD, CURSOR_BACKWARD) \
+            or not isinstance(values, list) or len(values) != len(ordering):
+        return CURSOR_FORWARD, None
+
+    return direction, values
+
+
+def _cursor_ordering(items):
+    ordering = list(items.query.order_by or items.model._meta.ordering)
+    if not ordering:
+        return None
+
+    for field in ordering:
+        # only plain fields and annotations can be read back from the object to build a cursor
+        if not isinstance(field, str) or "__" in field or field.startswith("?"):
+            return None
+
+    field_names = {field.lstrip("-") for field in ordering}
+    if "pk" not in field_names and items.model._meta.pk.name not in field_names:
+        ordering.append("-pk" if ordering[-1].startswith("-") else "pk")
+
+    return ordering
+
+
+def _keyset_filter(items, ordering, values, direction):
+    condition = None
+    for field, value in reversed(list(zip(ordering, values))):
+        is_descending = field.startswith("-")
+        if direction == CURSOR_BACKWARD:
+            is_descending = not is_descending
+
+        name = field.lstrip("-")
+        after = _strictly_after(name, value, is_descending, _is_nullable(items, name))
+        if condition is None:
+            condition = after
+        else:
+            equal = Q(**{f"{name}__isnull": True}) if value is None else Q(**{name: value})
+            condition = after | (equal & condition)
+
+    return condition
+
+
+def _strictly_after(name, value, is_descending, is_nullable):
+    # postgres puts NULLs first for DESC and last for ASC
+    if is_descending:
+        if value is None:
+            return Q(**{f"{name}__isnull": False})
+        return Q(**{f"{name}__lt": value})
+    else:
+        if value is None:
+            return Q(pk__in=[])
+        if is_nullable:
+            return Q(**{f"{name}__gt": value}) | Q(**{f"{name}__isnull": True})
+        return Q(**{f"{name}__gt": value})
+
+
+def _is_nullable(items, name):
+    if name == "pk" or name in items.query.annotations:
+        return False
+    try:
+        return items.model._meta.get_field(name).null
+    except FieldDoesNotExist:
+        return False
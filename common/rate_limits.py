@@ -0,0 +1,160 @@
+"""
+Sliding-window counters in redis: how many comments, posts or AI requests somebody made in the last N hours.
+
+Every counter is a sorted set of event ids scored by their timestamps, plus a "~seeded" marker with +inf score
+which tells that the set is complete. Counters backed by the database are seeded from it on the first use
+(cold start or an expired key) and re-seeded by `manage.py reconcile_rate_limits`, so an event lost between
+the DB commit and redis is counted again within minutes. Every read and write is one atomic Lua script.
+"""
+import logging
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from django_redis import get_redis_connection
+from redis import RedisError
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = "rate_limits"
+
+# ARGV: window start. Returns -1 if the counter has to be seeded first
+COUNT_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return -1
+end
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", "(" .. ARGV[1])
+return redis.call("ZCARD", KEYS[1]) - 1
+"""
+
+# ARGV: score, event id, ttl, is the counter redis-only. Events for cold DB-backed counters are skipped,
+# they will be seeded from the database with everything else
+ADD_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    if ARGV[4] == "0" then
+        return 0
+    end
+    redis.call("ZADD", KEYS[1], "+inf", "~seeded")
+end
+redis.call("ZADD", KEYS[1], ARGV[1], ARGV[2])
+redis.call("EXPIRE", KEYS[1], ARGV[3])
+return 1
+"""
+
+# ARGV: window start, score, event id, limit, ttl, is the counter redis-only.
+# Returns 1 if the event was recorded, 0 if the limit is reached, -1 if the counter has to be seeded first
+HIT_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    if ARGV[6] == "0" then
+        return -1
+    end
+    redis.call("ZADD", KEYS[1], "+inf", "~seeded")
+end
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", "(" .. ARGV[1])
+if redis.call("ZCARD", KEYS[1]) - 1 >= tonumber(ARGV[4]) then
+    return 0
+end
+redis.call("ZADD", KEYS[1], ARGV[2], ARGV[3])
+redis.call("EXPIRE", KEYS[1], ARGV[5])
+return 1
+"""
+
+# ARGV: seeded at, ttl, then score/event id pairs from the database.
+# Events newer than the seed moment came after the DB read and are kept
+SEED_SCRIPT = """
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", "(" .. ARGV[1])
+redis.call("ZADD", KEYS[1], "+inf", "~seeded")
+for i = 3, #ARGV, 2 do
+    redis.call("ZADD", KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call("EXPIRE", KEYS[1], ARGV[2])
+return redis.call("ZCARD", KEYS[1]) - 1
+"""
+
+
+def redis_client():
+    return get_redis_connection("default")
+
+
+class SlidingWindowCounter:
+    """
+    Counts events of the last `window` by key parts, e.g. comments by (user_id, post_id).
+
+    `source(*parts, since)` returns a queryset of (id, created_at) to seed the counter from the database.
+    Counters without a source (AI requests) live only in redis
+    """
+
+    def __init__(self, name, window, source=None):
+        self.name = name
+        self.window = window
+        self.source = source
+
+    @property
+    def ttl(self):
+        return int(self.window.total_seconds()) + 60
+
+    def key(self, *parts):
+        return ":".join([KEY_PREFIX, self.name, *map(str, parts)])
+
+    def count(self, *parts):
+        since = datetime.utcnow() - self.window
+        try:
+            count = redis_client().register_script(COUNT_SCRIPT)(keys=[self.key(*parts)], args=[_score(since)])
+            if count < 0:
+                count = self.seed(*parts) if self.source else 0
+            return count
+        except RedisError as ex:
+            if not self.source:
+                raise
+            log.warning(f"Rate limit counter {self.name} is unavailable, counting in DB: {ex}")
+            return self.source(*parts, since=since).count()
+
+    def add(self, *parts, event_id, at=None):
+        redis_client().register_script(ADD_SCRIPT)(
+            keys=[self.key(*parts)],
+            args=[_score(at or datetime.utcnow()), str(event_id), self.ttl, int(not self.source)],
+        )
+
+    def remove(self, *parts, event_id):
+        redis_client().zrem(self.key(*parts), str(event_id))
+
+    def hit(self, *parts, limit):
+        """
+        Records a new event if there were less than `limit` of them in the window. Returns False if limited
+        """
+        now = datetime.utcnow()
+        script = redis_client().register_script(HIT_SCRIPT)
+        args = [_score(now - self.window), _score(now), uuid4().hex, limit, self.ttl, int(not self.source)]
+        result = script(keys=[self.key(*parts)], args=args)
+        if result < 0:
+            self.seed(*parts)
+            result = script(keys=[self.key(*parts)], args=args)
+        return result == 1
+
+    def seed(self, *parts):
+        """
+        Replaces the counter with events from the database, returns the count
+        """
+        seeded_at = datetime.utcnow()
+        args = [_score(seeded_at), self.ttl]
+        for event_id, created_at in self.source(*parts, since=seeded_at - self.window):
+            args += [_score(created_at), str(event_id)]
+        return redis_client().register_script(SEED_SCRIPT)(keys=[self.key(*parts)], args=args)
+
+    def reconcile(self):
+        """
+        Re-seeds all live counters from the database, returns how many there were
+        """
+        if not self.source:
+            return 0
+
+        prefix = self.key() + ":"
+        reconciled = 0
+        for key in redis_client().scan_iter(match=f"{prefix}*", count=1000):
+            self.seed(*key.decode()[len(prefix):].split(":"))
+            reconciled += 1
+        return reconciled
+
+
+def _score(value):
+    # all our datetimes are naive UTC
+    return value.replace(tzinfo=timezone.utc).timestamp()
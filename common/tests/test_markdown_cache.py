@@ -0,0 +1,99 @@
+from unittest.mock import patch
+
+import mistune
+from django.test import TestCase
+
+from common.markdown import cache as markdown_cache
+from common.markdown.club_renderer import ClubRenderer
+from common.markdown.markdown import markdown_text, markdown_plain, markdown_tg, markdown_email
+from common.markdown.plain_renderer import PlainRenderer
+from common.markdown.plugins.clicker import clicker
+
+TEXT = """## Привет, клуб
+
+Смотрите, что я нашел: https://vas3k.club и **жирный** текст для @vas3k
+
+- [ ] сделать раз
+- [x] сделать два
+
+| a | b |
+|---|---|
+| 1 | 2 |
+"""
+
+
+def render_without_cache(text, uniq_id=None, disable_mentions=False):
+    markdown = mistune.create_markdown(
+        escape=True,
+        renderer=ClubRenderer(uniq_id=uniq_id, disable_mentions=disable_mentions),
+        plugins=["strikethrough", "url", "table", clicker]
+    )
+    return (markdown(text) or "").strip()
+
+
+class TestMarkdownRenderCache(TestCase):
+    def setUp(self):
+        markdown_cache.local_cache.clear()
+
+    def test_same_html_as_fresh_parser(self):
+        for options in [{}, {"uniq_id": "post-1"}, {"disable_mentions": True}]:
+            self.assertEqual(markdown_text(TEXT, **options), render_without_cache(TEXT, **options))
+            self.assertEqual(markdown_text(TEXT, **options), render_without_cache(TEXT, **options))  # cached
+
+    def test_renderer_options_are_not_mixed(self):
+        first = markdown_text(TEXT, uniq_id="post-1")
+        second = markdown_text(TEXT, uniq_id="post-2")
+        without_mentions = markdown_text(TEXT, uniq_id="post-1", disable_mentions=True)
+
+        self.assertNotEqual(first, second)  # clicker ids depend on uniq_id
+        self.assertIn('href="/user/vas3k/"', first)
+        self.assertNotIn('href="/user/vas3k/"', without_mentions)
+
+    def test_texts_without_clickers_of_different_objects_share_cache(self):
+        text = "Просто **текст** без кликеров"
+        first = markdown_text(text, uniq_id="post-1")
+        size = len(markdown_cache.local_cache)
+
+        with patch("common.markdown.markdown.markdown_parser") as parser:
+            self.assertEqual(markdown_text(text, uniq_id="comment-2"), first)
+
+        parser.assert_not_called()
+        self.assertEqual(len(markdown_cache.local_cache), size)
+
+    def test_renderers_are_not_mixed(self):
+        results = {markdown_text(TEXT), markdown_plain(TEXT), markdown_tg(TEXT), markdown_email(TEXT)}
+
+        self.assertEqual(len(results), 4)
+
+    def test_repeated_render_is_cached(self):
+        markdown_tg(TEXT)
+
+        with patch("common.markdown.markdown.markdown_parser") as parser:
+            markdown_tg(TEXT)
+
+        parser.assert_not_called()
+
+    def test_unsupported_options_share_cache(self):
+        markdown_plain(TEXT)
+        size = len(markdown_cache.local_cache)
+
+        markdown_text(TEXT, renderer=PlainRenderer, uniq_id="ignored", disable_mentions=True)
+
+        self.assertEqual(len(markdown_cache.local_cache), size)
+
+    def test_empty_text(self):
+        self.assertEqual(markdown_text(""), "")
+        self.assertEqual(markdown_text(None), "")
+
+
+class TestLRUCache(TestCase):
+    def test_evicts_least_recently_used(self):
+        lru = markdown_cache.LRUCache(max_size=2)
+        lru.set("a", "1")
+        lru.set("b", "2")
+        lru.get("a")
+        lru.set("c", "3")
+
+        self.assertEqual(lru.get("a"), "1")
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(lru.get("c"), "3")
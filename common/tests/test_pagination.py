@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+from django.core.paginator import Page
+from django.test import TestCase, RequestFactory
+
+from common.pagination import paginate_by_cursor, CursorPage
+from debug.utils_for_tests import create_approved_user
+from posts.models.post import Post
+
+
+class TestCursorPagination(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.author = create_approved_user("cursor_author")
+        now = datetime.utcnow()
+        self.posts = [
+            Post.objects.create(
+                slug=f"cursor-post-{i}",
+                type=Post.TYPE_POST,
+                title=f"Cursor {i}",
+                text="text",
+                author=self.author,
+                visibility=Post.VISIBILITY_EVERYWHERE,
+                last_activity_at=now - timedelta(minutes=i // 2),  # pairs with equal timestamps
+                upvotes=i % 3,
+            ) for i in range(7)
+        ]
+
+    def _walk(self, queryset, page_size=2):
+        seen = []
+        page = paginate_by_cursor(self.factory.get("/"), queryset, page_size=page_size)
+        while True:
+            seen.extend(p.id for p in page)
+            if not page.has_next():
+                return seen, page
+            page = paginate_by_cursor(
+                self.factory.get("/", {"cursor": page.next_cursor}), queryset, page_size=page_size
+            )
+
+    def test_walks_all_rows_with_ties_in_same_order_as_sql(self):
+        for ordering in (["-last_activity_at"], ["-upvotes"], ["upvotes"]):
+            queryset = Post.objects.filter(author=self.author).order_by(*ordering)
+            seen, _ = self._walk(queryset)
+            tie_breaker = "-pk" if ordering[0].startswith("-") else "pk"
+            expected = list(queryset.order_by(*ordering, tie_breaker).values_list("id", flat=True))
+            self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        queryset = Post.objects.filter(author=self.author).order_by("-last_activity_at")
+        first = paginate_by_cursor(self.factory.get("/"), queryset, page_size=3)
+        second = paginate_by_cursor(self.factory.get("/", {"cursor": first.next_cursor}), queryset, page_size=3)
+        back = paginate_by_cursor(self.factory.get("/", {"cursor": second.previous_cursor}), queryset, page_size=3)
+
+        self.assertFalse(first.has_previous())
+        self.assertTrue(second.has_previous())
+        self.assertEqual([p.id for p in back], [p.id for p in first])
+        self.assertFalse(back.has_previous())
+
+    def test_page_param_falls_back_to_offset_paginator(self):
+        queryset = Post.objects.filter(author=self.author).order_by("-last_activity_at")
+        page = paginate_by_cursor(self.factory.get("/", {"page": "2"}), queryset, page_size=2)
+
+        self.assertIsInstance(page, Page)
+        self.assertEqual(page.number, 2)
+
+    def test_broken_cursor_shows_first_page(self):
+        queryset = Post.objects.filter(author=self.author).order_by("-last_activity_at")
+        first = paginate_by_cursor(self.factory.get("/"), queryset, page_size=2)
+        broken = paginate_by_cursor(self.factory.get("/", {"cursor": "definitely-not-a-cursor"}), queryset, page_size=2)
+
+        self.assertIsInstance(broken, CursorPage)
+        self.assertEqual([p.id for p in broken], [p.id for p in first])
+
+    def test_related_field_ordering_falls_back_to_offset_paginator(self):
+        queryset = Post.objects.filter(author=self.author).order_by("-author__created_at")
+        page = paginate_by_cursor(self.factory.get("/"), queryset, page_size=2)
+
+        self.assertIsInstance(page, Page)
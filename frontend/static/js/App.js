@@ -8,12 +8,13 @@ import {
     handleFormSubmissionShortcuts,
     imageUploadOptions,
 } from "./common/markdown-editor";
-import { getCollapsedCommentThreadsSet, collapseCommentThread } from "./common/comments";
+import { applyCommentsViewerState, getCollapsedCommentThreadsSet, collapseCommentThread } from "./common/comments";
 
 const INITIAL_SYNC_DELAY = 50;
 
 const App = {
     onCreate() {
+        applyCommentsViewerState();
         this.initializeThemeSwitcher();
         this.stylizeExternalLinks();
     },
@@ -11,6 +11,7 @@ const mockMap = {
     querySourceFeatures: jest.fn().mockReturnValue([]),
     project: jest.fn((coords) => ({ x: coords[0], y: coords[1] })),
     getZoom: jest.fn().mockReturnValue(5),
+    getSource: jest.fn(),
     flyTo: jest.fn(),
     on: jest.fn(),
     remove: jest.fn(),
@@ -341,6 +342,79 @@ describe("PeopleMap.vue", () => {
         });
     });
 
+    describe("server-side clustered map", () => {
+        var mockSource;
+
+        function mountUrlMap(url) {
+            wrapper = shallowMount(PeopleMap, {
+                propsData: { url: url },
+                stubs: { default: true },
+            });
+            var loadCall = mockMap.on.mock.calls.find(([e]) => e === "load");
+            if (loadCall) loadCall[1]();
+        }
+
+        function flushPromises() {
+            return new Promise((resolve) => setTimeout(resolve, 0));
+        }
+
+        beforeEach(() => {
+            mockSource = { setData: jest.fn() };
+            mockMap.getSource.mockReturnValue(mockSource);
+            mockMap.getZoom.mockReturnValue(5);
+            global.fetch = jest.fn(() => Promise.resolve({
+                json: () => Promise.resolve(makeGeojson([{ coords: [10, 20] }])),
+            }));
+        });
+
+        afterEach(() => {
+            delete global.fetch;
+        });
+
+        it("adds a source without client-side clustering", () => {
+            mountUrlMap("/people/map.json?");
+
+            var options = mockMap.addSource.mock.calls[0][1];
+            expect(options.cluster).toBeUndefined();
+        });
+
+        it("loads the current zoom level into the source", async () => {
+            mountUrlMap("/people/map.json?country=DE");
+            await flushPromises();
+
+            expect(global.fetch).toHaveBeenCalledWith("/people/map.json?country=DE&zoom=5", expect.anything());
+            expect(mockSource.setData).toHaveBeenCalledWith(expect.objectContaining({ type: "FeatureCollection" }));
+        });
+
+        it("loads another zoom level only when the integer zoom changes", () => {
+            mountUrlMap("/people/map.json");
+            var zoomend = getHandler("zoomend");
+
+            mockMap.getZoom.mockReturnValue(5.7);
+            zoomend();
+            mockMap.getZoom.mockReturnValue(7.2);
+            zoomend();
+
+            expect(global.fetch).toHaveBeenCalledTimes(2);
+            expect(global.fetch.mock.calls[1][0]).toBe("/people/map.json?zoom=7");
+        });
+
+        it("uses the avatar of a server cluster", () => {
+            var cluster = {
+                geometry: { coordinates: [10, 20] },
+                properties: { cluster: true, cluster_id: "5:1:2", point_count: 4, avatar: "https://example.com/c.jpg" },
+            };
+            mockMap.querySourceFeatures.mockReturnValue([cluster]);
+            mountUrlMap("/people/map.json");
+            fireDataEvent();
+
+            var MarkerCtor = require("mapbox-gl").default.Marker;
+            var el = MarkerCtor.mock.calls[0][0].element;
+            expect(el.innerText).toBe(4);
+            expect(el.style.backgroundImage).toContain("c.jpg");
+        });
+    });
+
     describe("cleanup", () => {
         it("calls map.remove() on destroy", () => {
             mountMap(makeGeojson([{ coords: [10, 20] }]));
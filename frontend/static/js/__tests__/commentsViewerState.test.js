@@ -0,0 +1,90 @@
+import { applyCommentsViewerState } from "../common/comments";
+
+const ME = "11111111-1111-1111-1111-111111111111";
+const AUTHOR = "22222222-2222-2222-2222-222222222222";
+const MUTED = "33333333-3333-3333-3333-333333333333";
+
+const comment = (id, authorId, createdAt, replies = "") => `
+    <div
+        class="comment"
+        id="comment-${id}"
+        data-viewer-comment
+        data-author-id="${authorId}"
+        data-created-at="${createdAt}"
+    >
+        <div class="comment-header">
+            <a class="comment-header-author-name">Name</a>
+            <span class="comment-header-author-position">Position</span>
+        </div>
+        <div class="comment-rating"><comment-upvote data-viewer-upvote></comment-upvote></div>
+        <div class="comment-footer">
+            <span class="viewer-action" data-viewer-action="edit" hidden><a>edit</a></span>
+            <span class="viewer-action" data-viewer-action="reply" hidden><a>reply</a></span>
+        </div>
+        <div class="comment-replies">${replies}</div>
+    </div>
+`;
+
+const render = (state, html) => {
+    document.body.innerHTML = `${html}<script id="comments-viewer-state" type="application/json">${JSON.stringify(
+        state
+    )}</script>`;
+    applyCommentsViewerState();
+};
+
+const state = (overrides = {}) => ({
+    me: { id: ME, is_moderator: false, is_active_member: true, is_post_author: false },
+    last_view_at: 1000,
+    upvotes: {},
+    muted_author_ids: [],
+    notes: {},
+    ...overrides,
+});
+
+describe("applyCommentsViewerState", () => {
+    afterEach(() => {
+        document.body.innerHTML = "";
+    });
+
+    it("does nothing without viewer state", () => {
+        document.body.innerHTML = comment("a", AUTHOR, 2000);
+        applyCommentsViewerState();
+        expect(document.querySelector(".comment-is-new")).toBeNull();
+    });
+
+    it("marks comments written after the last view as new", () => {
+        render(state(), comment("old", AUTHOR, 500) + comment("new", AUTHOR, 2000));
+        expect(document.getElementById("comment-old").classList.contains("comment-is-new")).toBe(false);
+        expect(document.getElementById("comment-new").classList.contains("comment-is-new")).toBe(true);
+    });
+
+    it("restores votes and disables upvotes of own comments", () => {
+        render(state({ upvotes: { a: 1234 } }), comment("a", AUTHOR, 0) + comment("own", ME, 0));
+        const voted = document.querySelector("#comment-a comment-upvote");
+        expect(voted.hasAttribute("initial-is-voted")).toBe(true);
+        expect(voted.getAttribute("initial-upvote-timestamp")).toBe("1234");
+        expect(voted.hasAttribute("is-disabled")).toBe(false);
+        expect(document.querySelector("#comment-own comment-upvote").hasAttribute("is-disabled")).toBe(true);
+    });
+
+    it("shows only allowed actions of the comment itself, not of its replies", () => {
+        render(state(), comment("own", ME, 0, comment("reply", AUTHOR, 0)));
+        const action = (id, name) =>
+            document.querySelector(`#comment-${id} > .comment-footer [data-viewer-action="${name}"]`);
+        expect(action("own", "edit").hidden).toBe(false);
+        expect(action("own", "reply").hidden).toBe(false);
+        expect(action("reply", "edit").hidden).toBe(true);
+    });
+
+    it("replaces comments of muted authors with a stub", () => {
+        render(state({ muted_author_ids: [MUTED] }), comment("muted", MUTED, 0, comment("reply", AUTHOR, 0)));
+        expect(document.querySelector(".comment-body-muted")).not.toBeNull();
+        expect(document.getElementById("comment-reply")).toBeNull();
+    });
+
+    it("shows notes instead of author position", () => {
+        render(state({ notes: { [AUTHOR]: "тот самый" } }), comment("a", AUTHOR, 0));
+        expect(document.querySelector(".comment-header-author-note").textContent).toBe("тот самый");
+        expect(document.querySelector(".comment-header-author-position")).toBeNull();
+    });
+});
@@ -47,3 +47,91 @@ export const handleCommentThreadCollapseToggle = (wasCollapsed, commentId) => {
         [lastWeek]: lastWeekSet ? Array.from(lastWeekSet) : lastWeekCollapsedComments,
     });
 };
+
+const MUTED_COMMENT_HTML = '<div class="comment-body-muted">🔇 Комментарий от замьюченного юзера...</div>';
+
+const truncate = (text, length) => (text.length > length ? text.slice(0, length - 1) + "…" : text);
+
+// Which buttons the viewer can see, keep in sync with VIEWER_ACTIONS in comments/templatetags/comments.py
+const VIEWER_ACTIONS = {
+    pin: (me) => me.is_post_author || me.is_moderator,
+    delete: (me, isOwn) => isOwn || me.is_post_author || me.is_moderator,
+    edit: (me, isOwn) => isOwn || me.is_moderator,
+    reply: (me) => me.is_active_member,
+    badge: (me, isOwn) => !isOwn,
+};
+
+// Cached comment threads (posts/comment_tree.py) have the same HTML for everybody,
+// this applies the personal state of the viewer. Must run before Vue compiles the page.
+export const applyCommentsViewerState = () => {
+    const stateElement = document.getElementById("comments-viewer-state");
+    if (!stateElement) {
+        return;
+    }
+
+    const state = JSON.parse(stateElement.textContent);
+    const me = state.me;
+    const mutedAuthorIds = new Set(state.muted_author_ids);
+    const ownComment = (element) => element.closest("[data-viewer-comment]");
+
+    document.querySelectorAll("[data-viewer-comment]").forEach((comment) => {
+        const authorId = comment.dataset.authorId;
+
+        if (mutedAuthorIds.has(authorId)) {
+            // the same stub as comments/types/muted.html, replies are hidden too
+            const wrapper = comment.parentElement.classList.contains("block-comments-list")
+                ? comment.parentElement
+                : comment;
+            const stub = document.createElement("div");
+            stub.className = "comment";
+            stub.id = comment.id;
+            stub.innerHTML = MUTED_COMMENT_HTML;
+            wrapper.replaceWith(stub);
+            return;
+        }
+
+        if (state.last_view_at && Number(comment.dataset.createdAt) > state.last_view_at) {
+            comment.classList.add("comment-is-new");
+        }
+
+        const note = state.notes[authorId];
+        const authorName = [...comment.querySelectorAll(".comment-header-author-name")].find(
+            (element) => ownComment(element) === comment
+        );
+        if (note && authorName) {
+            const position = authorName.parentElement.querySelector(".comment-header-author-position");
+            const noteElement = document.createElement("span");
+            noteElement.className = "comment-header-author-note";
+            noteElement.textContent = truncate(note, position ? 128 : 50);
+            if (position) {
+                position.replaceWith(noteElement);
+            } else {
+                authorName.after(noteElement);
+            }
+        }
+    });
+
+    document.querySelectorAll("[data-viewer-upvote]").forEach((upvote) => {
+        const comment = ownComment(upvote);
+        if (!comment) {
+            return;
+        }
+
+        const commentId = comment.id.replace("comment-", "");
+        if (state.upvotes[commentId]) {
+            upvote.setAttribute("initial-is-voted", "");
+            upvote.setAttribute("initial-upvote-timestamp", state.upvotes[commentId]);
+        }
+        if (!me.is_active_member || comment.dataset.authorId === me.id) {
+            upvote.setAttribute("is-disabled", "");
+        }
+    });
+
+    document.querySelectorAll("[data-viewer-action]").forEach((action) => {
+        const comment = ownComment(action);
+        const isAllowed = VIEWER_ACTIONS[action.dataset.viewerAction];
+        if (comment && isAllowed && isAllowed(me, comment.dataset.authorId === me.id)) {
+            action.hidden = false;
+        }
+    });
+};
@@ -6,7 +6,8 @@ from django.urls import reverse
 from authn.helpers import check_user_permissions
 from authn.decorators.api import api
 from club.exceptions import ApiAuthRequired
-from common.pagination import paginate
+from common.pagination import paginate_by_cursor, CursorPage
+from posts.cache import cache_anonymous_response, feed_cache_tags
 from posts.models.post import Post
 from posts.helpers import POST_TYPE_ALL, ORDERING_ACTIVITY, sort_feed
 
@@ -48,8 +49,8 @@ def api_show_post(request, post_type, post_slug):
 
 
 @api(require_auth=False)
+@cache_anonymous_response(tags=feed_cache_tags)
 def json_feed(request, post_type=POST_TYPE_ALL, ordering=ORDERING_ACTIVITY):
-    page_number = int(request.GET.get("page") or 1)
     posts = Post.visible_objects()
 
     # filter posts by type
@@ -60,14 +61,18 @@ def json_feed(request, post_type=POST_TYPE_ALL, ordering=ORDERING_ACTIVITY):
     posts = sort_feed(posts, ordering)
 
     # paginate
-    posts = paginate(request, posts)
+    posts = paginate_by_cursor(request, posts)
+    if isinstance(posts, CursorPage):
+        next_query = f"cursor={posts.next_cursor}" if posts.has_next() else None
+    else:
+        next_query = f"page={posts.number + 1}" if posts.has_next() else None
 
     return JsonResponse({
         "version": "https://jsonfeed.org/version/1.1",
         "title": "Вастрик Клуб — JSON Feed",
         "home_page_url": settings.APP_HOST,
         "feed_url": f"{settings.APP_HOST}{reverse('json_feed')}",
-        "next_url": f"{settings.APP_HOST}{reverse('json_feed')}?page={page_number + 1}",
+        "next_url": f"{settings.APP_HOST}{reverse('json_feed')}?{next_query}" if next_query else None,
         "items": [
             post.to_dict(including_private=bool(request.me)) for post in posts
         ]
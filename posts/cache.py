@@ -0,0 +1,214 @@
+"""
+Response cache for anonymous users: feed, RSS, JSON feed and public posts look the same for everybody
+who is not logged in, so we render them once and serve bytes from redis.
+
+Every cached response is tagged ("posts", "posts:room:<slug>", "post:<id>", ...). Tags are versioned:
+the version is a part of the cache key, so to invalidate everything with a tag we just bump its version
+(see flush_post_response_cache). Old entries are never read again and expire by themselves.
+
+Enabled by features.ANONYMOUS_RESPONSE_CACHE
+"""
+import functools
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from club import features
+from posts.helpers import POST_TYPE_ALL
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = "response_cache"
+HITS_KEY = f"{KEY_PREFIX}:stats:hits"
+MISSES_KEY = f"{KEY_PREFIX}:stats:misses"
+TAG_VERSION_TIMEOUT = settings.RESPONSE_CACHE_TIMEOUT * 2  # must outlive any entry created before a bump
+
+RENDER_LOCK_TIMEOUT = 30  # seconds, in case the renderer dies with the lock
+RENDER_WAIT_TIMEOUT = 2.0  # seconds to wait for somebody else's render before doing it ourselves
+RENDER_WAIT_STEP = 0.05
+
+
+def tag_version_key(tag: str) -> str:
+    return f"{KEY_PREFIX}:tag:{tag}"
+
+
+def response_cache_key(request, tags, key_parts=None):
+    versions = cache.get_many([tag_version_key(tag) for tag in tags])
+    raw_key = "|".join([
+        request.method if request.method != "HEAD" else "GET",
+        request.path,
+        repr(sorted((key_parts or {}).items())),
+        repr(sorted(request.GET.lists())),
+        repr([(tag, versions.get(tag_version_key(tag), 0)) for tag in tags]),
+    ])
+    return f"{KEY_PREFIX}:{hashlib.md5(raw_key.encode('utf-8')).hexdigest()}"
+
+
+def is_cacheable_request(request):
+    return features.ANONYMOUS_RESPONSE_CACHE \
+        and request.method in ("GET", "HEAD") \
+        and not request.me
+
+
+def cache_anonymous_response(tags):
+    """
+    Caches the view for anonymous users. `tags` is a function with the same arguments as the view
+    that returns the list of tags for the response
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_cacheable_request(request):
+                return view(request, *args, **kwargs)
+
+            return cached_anonymous_response(
+                request,
+                tags=tags(request, *args, **kwargs),
+                build_response=lambda: view(request, *args, **kwargs),
+                key_parts=kwargs,
+            )
+        return wrapper
+    return decorator
+
+
+def cached_anonymous_response(request, tags, build_response, key_parts=None):
+    if not is_cacheable_request(request):
+        return build_response()
+
+    key = response_cache_key(request, tags, key_parts)
+    entry = cache.get(key)
+    if entry:
+        _count(HITS_KEY)
+        response = None
+    else:
+        _count(MISSES_KEY)
+        entry, response = _render_once(key, build_response)
+        if not entry:
+            return response  # errors, redirects and other responses we don't cache
+
+    conditional_response = get_conditional_response(
+        request,
+        etag=entry["etag"],
+        last_modified=entry["last_modified"],
+    )
+    if conditional_response is not None:
+        return conditional_response
+
+    if response is None:
+        response = HttpResponse(entry["content"], status=entry["status"])
+        for header, value in entry["headers"]:
+            response[header] = value
+        response["X-Cache"] = "HIT"
+    else:
+        response["X-Cache"] = "MISS"
+
+    response["ETag"] = entry["etag"]
+    response["Last-Modified"] = http_date(entry["last_modified"])
+    return response
+
+
+def _render_once(key, build_response):
+    # only one process renders a missing page, others wait for it instead of hammering the DB
+    lock_key = f"{key}:lock"
+    is_locked = cache.add(lock_key, 1, RENDER_LOCK_TIMEOUT)
+    if is_locked is False:
+        deadline = time.monotonic() + RENDER_WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(RENDER_WAIT_STEP)
+            entry = cache.get(key)
+            if entry:
+                return entry, None
+        log.info(f"Gave up waiting for {key} to render")
+
+    # is_locked is None when redis is down (IGNORE_EXCEPTIONS), just render then
+    try:
+        response = build_response()
+        entry = _entry_from_response(response)
+        if entry:
+            cache.set(key, entry, settings.RESPONSE_CACHE_TIMEOUT)
+        return entry, response
+    finally:
+        if is_locked:
+            cache.delete(lock_key)
+
+
+def _entry_from_response(response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return None
+
+    if hasattr(response, "render") and callable(response.render):
+        response = response.render()
+
+    return {
+        "content": response.content,
+        "status": response.status_code,
+        "headers": list(response.items()),
+        "etag": f'"{hashlib.md5(response.content).hexdigest()}"',
+        "last_modified": int(time.time()),
+    }
+
+
+def post_cache_tags(post, old_values=None):
+    """
+    Everything that shows this post: its page, the whole feed, feeds of its type, room, label and author
+    """
+    tags = {"posts", f"post:{post.id}", f"posts:author:{post.author_id}"}
+    for values in (
+        {"type": post.type, "room": post.room_id, "label_code": post.label_code},
+        old_values or {},
+    ):
+        if values.get("type"):
+            tags.add(f"posts:type:{values['type']}")
+        if values.get("room"):
+            tags.add(f"posts:room:{values['room']}")
+        if values.get("label_code"):
+            tags.add(f"posts:label:{values['label_code']}")
+    return sorted(tags)
+
+
+def feed_cache_tags(request, post_type=None, room_slug=None, label_code=None, **kwargs):
+    # the most specific tag is enough: any post in this slice bumps it
+    if room_slug:
+        return [f"posts:room:{room_slug}"]
+    if label_code:
+        return [f"posts:label:{label_code}"]
+    if post_type and post_type != POST_TYPE_ALL:
+        return [f"posts:type:{post_type}"]
+    return ["posts"]
+
+
+def flush_response_cache(tags):
+    version = time.time_ns()
+    cache.set_many({tag_version_key(tag): version for tag in tags}, TAG_VERSION_TIMEOUT)
+
+
+def flush_post_response_cache(post, old_values=None):
+    if features.ANONYMOUS_RESPONSE_CACHE:
+        flush_response_cache(post_cache_tags(post, old_values))
+
+
+def response_cache_stats():
+    hits = cache.get(HITS_KEY) or 0
+    misses = cache.get(MISSES_KEY) or 0
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+    }
+
+
+def reset_response_cache_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:  # no such key yet
+        cache.set(key, 1, timeout=None)
@@ -0,0 +1,81 @@
+"""
+Cached comment threads. The rendered thread of a post is the same for everybody except the viewer's own state
+(votes, mutes, notes, new comments since the last visit, which buttons are shown), so we cache the HTML
+per (post, comment order, anonymous/member, last comment change) and send that state separately:
+
+- templates render viewer-specific bits through {% viewer_action %}, {% comment_upvote_attrs %}
+  and {% comment_viewer_attrs %} tags, which with `viewer_overlay` render them neutral and hidden
+- comment_tree_overlay() is a small JSON for the current viewer, the frontend applies it to the cached HTML
+  before Vue mounts (applyCommentsViewerState in frontend/static/js/common/comments.js)
+
+Any comment create/edit/delete/vote bumps the post version (see posts/signals.py), so old trees are
+never read again. Enabled by features.COMMENT_TREE_CACHE
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from club import features
+from posts.models.post import Post
+from posts.viewer_state import epoch_ms
+
+KEY_PREFIX = "comment_tree"
+VERSION_TIMEOUT = settings.COMMENT_TREE_CACHE_TIMEOUT * 2  # must outlive any tree cached before a bump
+
+
+def is_comment_tree_cacheable(post):
+    # battles need all comments loaded anyway for their stats
+    return features.COMMENT_TREE_CACHE and post.type != Post.TYPE_BATTLE
+
+
+def tree_version_key(post_id):
+    return f"{KEY_PREFIX}:version:{post_id}"
+
+
+def comment_tree_cache_key(post, comment_order, is_member):
+    version = cache.get(tree_version_key(post.id)) or 0
+    audience = "members" if is_member else "anonymous"
+    return f"{KEY_PREFIX}:{post.id}:{comment_order}:{audience}:{version}"
+
+
+def flush_comment_tree_cache(post_id):
+    if features.COMMENT_TREE_CACHE:
+        cache.set(tree_version_key(post_id), time.time_ns(), VERSION_TIMEOUT)
+
+
+def cached_comment_tree(request, post, comment_order, load_comments):
+    """
+    Returns the rendered thread HTML, load_comments() is only called on cache miss
+    """
+    key = comment_tree_cache_key(post, comment_order, is_member=bool(request.me))
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string("comments/list.html", {
+            "comments": load_comments(),
+            "post": post,
+            "type": "normal",
+            "viewer_overlay": bool(request.me),  # anonymous trees have nothing personal
+        }, request=request)
+        cache.set(key, html, settings.COMMENT_TREE_CACHE_TIMEOUT)
+    return mark_safe(html)
+
+
+def comment_tree_overlay(me, post, last_view_at, viewer):
+    """
+    Everything personal about the cached thread, taken from the already loaded ViewerContext
+    """
+    return {
+        "me": {
+            "id": str(me.id),
+            "is_moderator": me.is_moderator,
+            "is_active_member": me.is_active_membership,
+            "is_post_author": me.id == post.author_id,
+        },
+        "last_view_at": epoch_ms(last_view_at),
+        "upvotes": {str(comment_id): epoch_ms(created_at) for comment_id, created_at in viewer.comment_upvotes.items()},
+        "muted_author_ids": [str(user_id) for user_id in viewer.muted_user_ids],
+        "notes": {str(user_id): text for user_id, text in viewer.user_notes.items()},
+    }
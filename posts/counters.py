@@ -0,0 +1,300 @@
+"""
+Denormalized counters: posts.comment_count and profile stats in UserCounters (posts, comments, badges).
+
+Signals in posts/signals.py change them with single-row UPDATEs in the same transaction as the comment,
+post or badge itself, so profiles and feeds read ready numbers instead of running COUNTs on every view.
+
+UserCounters rows are calculated from scratch on first read. Bulk .update() calls bypass signals,
+`manage.py verify_counters` recounts everything, reports the drift and fixes it with --fix.
+"""
+from collections import Counter, defaultdict
+
+from django.db import connection
+from django.db.models import F, Count
+
+from comments.models import Comment
+from posts.models.post import Post
+from users.models.counters import UserCounters
+from users.models.user import User
+
+UNCOUNTED_POST_TYPES = [Post.TYPE_INTRO, Post.TYPE_WEEKLY_DIGEST]
+POST_COUNTED_FIELDS = {"visibility", "type", "author", "coauthors"}
+
+
+def remember_comment_state(comment):
+    comment._counted_state = _comment_state(comment)
+
+
+def comment_saved(comment, created=False):
+    old_state = (False, False) if created else getattr(comment, "_counted_state", None)
+    new_state = _comment_state(comment)
+    comment._counted_state = new_state
+    if old_state is None or new_state is None or old_state == new_state:
+        return
+
+    post_delta, profile_delta = (int(new) - int(old) for old, new in zip(old_state, new_state))
+    _apply_comment_delta(comment, post_delta, profile_delta)
+
+
+def comment_deleted(comment):
+    state = getattr(comment, "_counted_state", None) or _comment_state(comment)
+    if state:
+        _apply_comment_delta(comment, -int(state[0]), -int(state[1]))
+
+
+def post_saved(post, created=False, update_fields=None):
+    if not created and (update_fields is None or "comment_count" in update_fields):
+        # a full save writes back comment_count loaded with the post, comments added since then are lost
+        fix_post_drift([post.id])
+
+    if update_fields and not POST_COUNTED_FIELDS.intersection(update_fields):
+        return
+
+    new_values = _post_values(post)
+    if created:
+        old_values = None
+    elif hasattr(post, "_counted_values"):
+        # saved before in this process, the diff is still relative to the state loaded from the db
+        old_values = post._counted_values
+    else:
+        diff = post.diff
+        old_values = {**new_values, **{field: diff[field][0] for field in POST_COUNTED_FIELDS if field in diff}}
+    post._counted_values = new_values
+
+    if old_values == new_values:
+        return
+
+    _apply_post_delta(old_values, new_values)
+
+    # comments under drafts are not shown on profiles, so publishing or hiding a post moves all of them
+    was_draft = bool(old_values) and old_values["visibility"] == Post.VISIBILITY_DRAFT
+    is_draft = new_values["visibility"] == Post.VISIBILITY_DRAFT
+    if old_values and was_draft != is_draft:
+        sign = 1 if was_draft else -1
+        commenters = Comment.objects\
+            .filter(post_id=post.id, is_visible=True, deleted_by__isnull=True)\
+            .order_by()\
+            .values_list("author_id")\
+            .annotate(count=Count("id"))
+        for author_id, count in commenters:
+            UserCounters.increment(author_id, comments=sign * count)
+
+
+def post_deleted(post):
+    # comments are deleted by cascade and subtract themselves
+    _apply_post_delta(getattr(post, "_counted_values", None) or _post_values(post), None)
+
+
+def badge_saved(user_badge, created=False):
+    if created:
+        UserCounters.increment(user_badge.to_user_id, badge_code=user_badge.badge_id, badges=1)
+
+
+def badge_deleted(user_badge):
+    UserCounters.increment(user_badge.to_user_id, badge_code=user_badge.badge_id, badges=-1)
+
+
+def load_user_counters(user):
+    counters = UserCounters.objects.filter(user_id=user.id).first()
+    if not counters:
+        counters = recalculate_user_counters([user.id])[0]
+    return counters
+
+
+def recalculate_user_counters(user_ids):
+    counted = calculate_user_counters(user_ids)
+    return UserCounters.objects.bulk_create(
+        [UserCounters(user_id=user_id, **counted.get(user_id, _empty_counters())) for user_id in user_ids],
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["posts", "link_only_posts", "comments", "badges", "updated_at"],
+    )
+
+
+def calculate_user_counters(user_ids=None):
+    """
+    Counts everything from scratch for the given users (or everyone), users with nothing are omitted
+    """
+    params = {
+        "user_ids": list(user_ids) if user_ids is not None else None,
+        "draft": Post.VISIBILITY_DRAFT,
+        "link_only": Post.VISIBILITY_LINK_ONLY,
+        "uncounted_types": UNCOUNTED_POST_TYPES,
+    }
+    counted = defaultdict(_empty_counters)
+
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            select
+                author_id,
+                count(*) filter (where visibility not in (%(draft)s, %(link_only)s)),
+                count(*) filter (where visibility = %(link_only)s)
+            from posts
+            where type <> all(%(uncounted_types)s)
+                and (%(user_ids)s::uuid[] is null or author_id = any(%(user_ids)s::uuid[]))
+            group by author_id
+        """, params)
+        for user_id, posts, link_only_posts in cursor.fetchall():
+            counted[user_id]["posts"] += posts
+            counted[user_id]["link_only_posts"] += link_only_posts
+
+        cursor.execute("""
+            select users.id, count(distinct posts.id)
+            from posts
+                cross join lateral unnest(posts.coauthors) as coauthor_slug
+                join users on users.slug = coauthor_slug
+            where posts.visibility not in (%(draft)s, %(link_only)s)
+                and posts.type <> all(%(uncounted_types)s)
+                and posts.author_id <> users.id
+                and (%(user_ids)s::uuid[] is null or users.id = any(%(user_ids)s::uuid[]))
+            group by users.id
+        """, params)
+        for user_id, posts in cursor.fetchall():
+            counted[user_id]["posts"] += posts
+
+        cursor.execute("""
+            select comments.author_id, count(*)
+            from comments
+                join posts on posts.id = comments.post_id
+            where comments.is_visible and comments.deleted_by is null
+                and posts.visibility <> %(draft)s
+                and (%(user_ids)s::uuid[] is null or comments.author_id = any(%(user_ids)s::uuid[]))
+            group by comments.author_id
+        """, params)
+        for user_id, comments in cursor.fetchall():
+            if user_id:
+                counted[user_id]["comments"] = comments
+
+        cursor.execute("""
+            select to_user_id, badge_id, count(*)
+            from user_badges
+            where %(user_ids)s::uuid[] is null or to_user_id = any(%(user_ids)s::uuid[])
+            group by to_user_id, badge_id
+        """, params)
+        for user_id, badge_code, count in cursor.fetchall():
+            counted[user_id]["badges"][badge_code] = count
+
+    return dict(counted)
+
+
+def find_post_drift():
+    """
+    Returns [(post_id, stored comment_count, actual comment_count)]
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            select posts.id, posts.comment_count, coalesce(actual.comment_count, 0)
+            from posts
+                left join (
+                    select post_id, count(*) as comment_count
+                    from comments
+                    where is_visible and not is_deleted
+                    group by post_id
+                ) as actual on actual.post_id = posts.id
+            where posts.comment_count <> coalesce(actual.comment_count, 0)
+        """)
+        return cursor.fetchall()
+
+
+def fix_post_drift(post_ids):
+    # recounted in the same statement, so comments written since find_post_drift() aren't lost
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            update posts set comment_count = (
+                select count(*) from comments
+                where comments.post_id = posts.id and comments.is_visible and not comments.is_deleted
+            )
+            where posts.id = any(%s::uuid[])
+        """, [list(post_ids)])
+
+
+def find_user_drift():
+    """
+    Returns {user_id: {field: (stored, actual)}} for existing UserCounters rows
+    """
+    counted = calculate_user_counters()
+    drift = {}
+    for counters in UserCounters.objects.all().iterator():
+        actual = counted.get(counters.user_id, _empty_counters())
+        stored = {
+            "posts": counters.posts,
+            "link_only_posts": counters.link_only_posts,
+            "comments": counters.comments,
+            "badges": {code: count for code, count in (counters.badges or {}).items() if count},
+        }
+        fields = {field: (stored[field], actual[field]) for field in stored if stored[field] != actual[field]}
+        if fields:
+            drift[counters.user_id] = fields
+    return drift
+
+
+def _empty_counters():
+    return {"posts": 0, "link_only_posts": 0, "comments": 0, "badges": {}}
+
+
+def _comment_state(comment):
+    # read from __dict__, so comments loaded with .only() don't fetch deferred fields
+    values = comment.__dict__
+    if not {"is_visible", "is_deleted", "deleted_by"}.issubset(values):
+        return None
+
+    # (counted in posts.comment_count, counted on the author's profile)
+    return (
+        bool(values["is_visible"] and not values["is_deleted"]),
+        bool(values["is_visible"] and values["deleted_by"] is None),
+    )
+
+
+def _apply_comment_delta(comment, post_delta, profile_delta):
+    if post_delta:
+        Post.objects.filter(id=comment.post_id).update(comment_count=F("comment_count") + post_delta)
+
+    if profile_delta and comment.author_id and not _is_draft_comment(comment):
+        UserCounters.increment(comment.author_id, comments=profile_delta)
+
+
+def _is_draft_comment(comment):
+    if Comment.post.is_cached(comment):
+        return comment.post.visibility == Post.VISIBILITY_DRAFT
+    return Post.objects.filter(id=comment.post_id, visibility=Post.VISIBILITY_DRAFT).exists()
+
+
+def _post_values(post):
+    return {
+        "visibility": post.visibility,
+        "type": post.type,
+        "author": post.author_id,
+        "coauthors": list(post.coauthors or []),
+    }
+
+
+def _apply_post_delta(old_values, new_values):
+    coauthor_slugs = {slug for values in (old_values, new_values) if values for slug in values["coauthors"]}
+    coauthor_ids = dict(User.objects.filter(slug__in=coauthor_slugs).values_list("slug", "id")) \
+        if coauthor_slugs else {}
+
+    deltas = _post_buckets(new_values, coauthor_ids)
+    deltas.subtract(_post_buckets(old_values, coauthor_ids))
+
+    user_deltas = defaultdict(dict)
+    for (user_id, field), delta in deltas.items():
+        if delta:
+            user_deltas[user_id][field] = delta
+
+    for user_id, fields in user_deltas.items():
+        UserCounters.increment(user_id, **fields)
+
+
+def _post_buckets(values, coauthor_ids):
+    buckets = Counter()
+    if not values or values["type"] in UNCOUNTED_POST_TYPES or values["visibility"] == Post.VISIBILITY_DRAFT:
+        return buckets
+
+    if values["visibility"] == Post.VISIBILITY_LINK_ONLY:
+        buckets[(values["author"], "link_only_posts")] += 1
+        return buckets
+
+    buckets[(values["author"], "posts")] += 1
+    for user_id in {coauthor_ids.get(slug) for slug in values["coauthors"]} - {None, values["author"]}:
+        buckets[(user_id, "posts")] += 1
+    return buckets
@@ -15,6 +15,8 @@ ORDERING_TOP_WEEK = "top_week"
 ORDERING_TOP_MONTH = "top_month"
 ORDERING_TOP_YEAR = "top_year"
 
+TOP_PERIOD_ORDERINGS = {ORDERING_TOP_WEEK, ORDERING_TOP_MONTH, ORDERING_TOP_YEAR}
+
 MARKDOWN_IMAGES_RE = re.compile(r"!\[*\]\((.+)\)")
 
 
@@ -37,7 +39,8 @@ def sort_feed(posts, ordering, ordering_param=None):
         return posts.order_by("-last_activity_at")
 
     elif ordering == ORDERING_NEW:
-        return posts.order_by("-published_at", "-created_at")
+        # ties are broken by pk like in the materialized feed (see posts/materialized_feed.py)
+        return posts.order_by("-published_at")
 
     elif ordering == ORDERING_TOP:
         return posts.order_by("-upvotes")
@@ -45,10 +48,20 @@ def sort_feed(posts, ordering, ordering_param=None):
     elif ordering == ORDERING_HOT:
         return posts.order_by("-hotness")
 
-    elif ordering == ORDERING_TOP_WEEK:
-        return posts.filter(
-            published_at__gte=datetime.utcnow() - timedelta(days=7)
-        ).order_by("-upvotes")
+    elif ordering in TOP_PERIOD_ORDERINGS:
+        start_date, end_date = top_period_bounds(ordering, ordering_param)
+        posts = posts.filter(published_at__gte=start_date)
+        if end_date:
+            posts = posts.filter(published_at__lt=end_date)
+        return posts.order_by("-upvotes")
+
+    else:
+        raise Http404()
+
+
+def top_period_bounds(ordering, ordering_param=None):
+    if ordering == ORDERING_TOP_WEEK:
+        return datetime.utcnow() - timedelta(days=7), None
 
     elif ordering == ORDERING_TOP_MONTH:
         if ordering_param:
@@ -60,11 +73,7 @@ def sort_feed(posts, ordering, ordering_param=None):
         else:
             start_date = datetime.utcnow() - timedelta(days=31)
             end_date = datetime.utcnow()
-
-        return posts.filter(
-            published_at__gte=start_date,
-            published_at__lt=end_date,
-        ).order_by("-upvotes")
+        return start_date, end_date
 
     elif ordering == ORDERING_TOP_YEAR:
         if ordering_param:
@@ -76,10 +85,6 @@ def sort_feed(posts, ordering, ordering_param=None):
         else:
             start_date = datetime.utcnow() - timedelta(days=365)
             end_date = datetime.utcnow()
+        return start_date, end_date
 
-        return posts.filter(
-            published_at__gte=start_date,
-            published_at__lt=end_date,
-        ).order_by("-upvotes")
-    else:
-        raise Http404()
+    raise Http404()
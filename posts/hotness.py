@@ -0,0 +1,186 @@
+"""
+Hotness is a log-scale score: hotness = ln(sum(exp((t - EPOCH) / TIMESCALE))) over the latest comment
+of every commenter in the last POST_HOTNESS_PERIOD.
+
+Every comment loses half of its weight each POST_HOTNESS_HALF_LIFE, but since all posts decay at the same
+rate we never have to rewrite old scores — sorting by the stored value is the same as sorting by decayed
+value at any moment. The decayed value itself can be calculated lazily with decayed_hotness().
+
+New comments are added incrementally (one UPDATE of one row), everything else (deletes, edits, repeat
+commenters) recalculates just that post. `manage.py update_hotness` reconciles the rest once an hour.
+"""
+import math
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection
+
+from club import features
+from posts import materialized_feed
+from posts.helpers import ORDERING_HOT
+from posts.models.post import Post
+
+HOTNESS_EPOCH = datetime(2020, 1, 1)
+HOTNESS_TIMESCALE = settings.POST_HOTNESS_HALF_LIFE.total_seconds() / math.log(2)  # seconds
+HOTNESS_PRECISION = 1e-6  # incremental and full calculations round a bit differently
+HOTNESS_COMMENT_FIELDS = {"is_deleted", "created_at", "author", "author_id", "post", "post_id"}
+
+# postgres version of the formula for a set of posts,
+# logsumexp is calculated as max + ln(sum(exp(x - max))) to avoid overflows
+HOTNESS_SQL = """
+    select post_id, max_score + ln(sum(exp(score - max_score))) as hotness
+    from (
+        select post_id, score, max(score) over (partition by post_id) as max_score
+        from (
+            select distinct on (comments.post_id, comments.author_id)
+                comments.post_id,
+                extract(epoch from comments.created_at - %(epoch)s)::float8 / %(timescale)s as score
+            from comments
+            join posts on posts.id = comments.post_id
+            where comments.is_deleted = false
+                and comments.created_at > %(since)s
+                and posts.visibility = 'everywhere'
+                {post_filter}
+            order by comments.post_id, comments.author_id, comments.created_at desc
+        ) as latest_comments
+    ) as scores
+    group by post_id, max_score
+"""
+
+
+def comment_score(created_at):
+    return (created_at - HOTNESS_EPOCH).total_seconds() / HOTNESS_TIMESCALE
+
+
+def decayed_hotness(hotness, now=None):
+    """
+    Sum of comment weights at the moment (fresh comment weights 1.0)
+    """
+    if not hotness:
+        return 0.0
+    return math.exp(hotness - comment_score(now or datetime.utcnow()))
+
+
+def add_comment(comment):
+    """
+    Adds the new comment to post hotness in place: hotness = logaddexp(hotness, score).
+    Zero hotness means no comments, the score is taken as is then
+    """
+    if comment.is_deleted or not comment.author_id:
+        return
+
+    since = datetime.utcnow() - settings.POST_HOTNESS_PERIOD
+    has_commented_before = type(comment).objects\
+        .filter(post_id=comment.post_id, author_id=comment.author_id, is_deleted=False, created_at__gt=since)\
+        .exclude(id=comment.id)\
+        .exists()
+    if has_commented_before:
+        # only the latest comment of every author counts, so the old one has to be subtracted
+        recalculate_post(comment)
+        return
+
+    score = comment_score(comment.created_at)
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            update posts
+            set hotness = case
+                when hotness = 0 then %(score)s
+                -- exp() of a float8 raises "underflow" below about -745, the term is 0 there anyway
+                else greatest(hotness, %(score)s) + ln(1 + exp(-least(abs(hotness - %(score)s), 700)))
+            end
+            where id = %(post_id)s and visibility = 'everywhere'
+            returning hotness
+        """, {"score": score, "post_id": comment.post_id})
+        row = cursor.fetchone()
+
+    if row:
+        _set_post_hotness(comment, row[0])
+
+
+def remember_comment_state(comment):
+    comment._hotness_state = _comment_state(comment)
+
+
+def comment_saved(comment, created=False, update_fields=None):
+    """
+    Only new comments and changes of what hotness depends on (deletes, restores, authors) touch the post,
+    edits, pins and other saves don't
+    """
+    old_state = getattr(comment, "_hotness_state", None)
+    new_state = _comment_state(comment)
+    comment._hotness_state = new_state
+
+    if created:
+        add_comment(comment)
+        return
+
+    if update_fields is not None and not HOTNESS_COMMENT_FIELDS.intersection(update_fields):
+        return
+
+    if old_state is not None and old_state == new_state:
+        return
+
+    if comment.created_at > datetime.utcnow() - settings.POST_HOTNESS_PERIOD:
+        recalculate_post(comment)
+
+
+def recalculate_post(comment):
+    hotness = calculate_hotness(post_ids=[comment.post_id]).get(comment.post_id, 0.0)
+    Post.objects.filter(id=comment.post_id).update(hotness=hotness)
+    _set_post_hotness(comment, hotness)
+
+
+def calculate_hotness(post_ids=None):
+    """
+    Returns {post_id: hotness} for all posts with comments in the hotness period
+    """
+    post_filter = "and comments.post_id = any(%(post_ids)s)" if post_ids is not None else ""
+    with connection.cursor() as cursor:
+        cursor.execute(HOTNESS_SQL.format(post_filter=post_filter), {
+            "epoch": HOTNESS_EPOCH,
+            "timescale": HOTNESS_TIMESCALE,
+            "since": datetime.utcnow() - settings.POST_HOTNESS_PERIOD,
+            "post_ids": list(post_ids or []),
+        })
+        return dict(cursor.fetchall())
+
+
+def reconcile_hotness():
+    """
+    Fixes hotness drift (concurrent saves, missed signals) and resets posts which fell out of the period.
+    Only writes rows where the value has actually changed. Returns {post_id: new_hotness}
+    """
+    expected = calculate_hotness()
+    current = dict(Post.objects.exclude(hotness=0).values_list("id", "hotness"))
+    current.update(Post.objects.filter(id__in=expected.keys()).values_list("id", "hotness"))
+
+    changed = {
+        post_id: expected.get(post_id, 0.0)
+        for post_id, hotness in current.items()
+        if abs(hotness - expected.get(post_id, 0.0)) > HOTNESS_PRECISION
+    }
+
+    for post_id, hotness in changed.items():
+        Post.objects.filter(id=post_id).update(hotness=hotness)
+
+    if features.MATERIALIZED_FEED and changed:
+        materialized_feed.update_scores(ORDERING_HOT, changed)
+
+    return changed
+
+
+def _comment_state(comment):
+    # read from __dict__, so comments loaded with .only() don't fetch deferred fields
+    values = comment.__dict__
+    if not {"is_deleted", "created_at", "author_id", "post_id"}.issubset(values):
+        return None
+    return values["is_deleted"], values["created_at"], values["author_id"], values["post_id"]
+
+
+def _set_post_hotness(comment, hotness):
+    # the caller can save the post object later with all fields, keep it fresh
+    if type(comment).post.is_cached(comment):
+        comment.post.hotness = hotness
+
+    if features.MATERIALIZED_FEED:
+        materialized_feed.update_scores(ORDERING_HOT, {comment.post_id: hotness})
@@ -0,0 +1,87 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from posts.feed_filters import FeedFilterProfile, clear_feed_filter_profile_cache
+from posts.helpers import ORDERING_ACTIVITY, sort_feed
+from posts.models.post import Post
+from users.models.mute import UserMuted
+from users.models.user import User
+
+
+class Command(BaseCommand):
+    help = "Compares feed query plans and latency: joins on mutes vs precomputed filter profile. Changes nothing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=str, required=True, help="Slug of the user to look at the feed as")
+        parser.add_argument("--mutes", type=str, default="0,50,500", help="Comma-separated mute counts to try")
+        parser.add_argument("--runs", type=int, default=20, help="How many times to run each query")
+        parser.add_argument("--plans", action="store_true", help="Print EXPLAIN ANALYZE for each query")
+
+    def handle(self, *args, **options):
+        me = User.objects.filter(slug=options["user"]).first()
+        if not me:
+            raise CommandError(f"User '{options['user']}' not found")
+
+        for mute_count in [int(count) for count in options["mutes"].split(",")]:
+            # mutes are created only for the benchmark and rolled back after it
+            with transaction.atomic():
+                self.mute_authors(me, mute_count)
+                clear_feed_filter_profile_cache(me.id)
+
+                profile_started_at = time.monotonic()
+                profile = FeedFilterProfile.for_user(me)
+                profile_ms = (time.monotonic() - profile_started_at) * 1000
+
+                queries = {
+                    "joins": legacy_feed_queryset(me),
+                    "profile": profile.apply(Post.objects_for_user(me), None, None, ORDERING_ACTIVITY),
+                }
+                for name, posts in queries.items():
+                    posts = sort_feed(posts, ORDERING_ACTIVITY)[:settings.DEFAULT_PAGE_SIZE]
+                    timings = self.measure(posts, options["runs"])
+                    self.stdout.write(
+                        f"mutes={len(profile.muted_user_ids):<4} {name:<8} "
+                        f"median {timings[len(timings) // 2]:.2f}ms, max {timings[-1]:.2f}ms"
+                    )
+                    if options["plans"]:
+                        self.stdout.write(posts.explain(analyze=True))
+
+                self.stdout.write(f"mutes={len(profile.muted_user_ids):<4} profile load {profile_ms:.2f}ms (uncached)")
+                transaction.set_rollback(True)
+
+            clear_feed_filter_profile_cache(me.id)
+
+        self.stdout.write("Done 🥙")
+
+    def mute_authors(self, me, mute_count):
+        if not mute_count:
+            return
+
+        already_muted = UserMuted.objects.filter(user_from=me).values_list("user_to_id", flat=True)
+        authors = User.objects\
+            .exclude(id=me.id)\
+            .exclude(id__in=already_muted)\
+            .order_by("-last_activity_at")\
+            .values_list("id", flat=True)[:mute_count]
+
+        UserMuted.objects.bulk_create([UserMuted(user_from=me, user_to_id=author_id) for author_id in authors])
+
+    def measure(self, posts, runs):
+        timings = []
+        for _ in range(runs):
+            started_at = time.monotonic()
+            list(posts.all())  # fresh clone, otherwise the queryset cache answers
+            timings.append((time.monotonic() - started_at) * 1000)
+        return sorted(timings)
+
+
+def legacy_feed_queryset(me):
+    # how posts.views.feed filtered the main page before FeedFilterProfile
+    return Post.objects_for_user(me)\
+        .exclude(author__muted_to__user_from=me)\
+        .exclude(room__muted_users__user=me)\
+        .exclude(Q(is_room_only=True) & ~Q(room__subscriptions__user=me))
@@ -0,0 +1,132 @@
+import random
+import time
+
+import mistune
+from django.core.management import BaseCommand
+
+from comments.models import Comment
+from common.markdown import cache as markdown_cache
+from common.markdown.club_renderer import ClubRenderer
+from common.markdown.email_renderer import EmailRenderer
+from common.markdown.markdown import markdown_parser, markdown_text
+from common.markdown.plain_renderer import PlainRenderer
+from common.markdown.plugins.clicker import clicker
+from common.markdown.telegram_renderer import TelegramRenderer
+from posts.models.post import Post
+
+RENDERERS = [ClubRenderer, PlainRenderer, TelegramRenderer, EmailRenderer]
+
+WORDS = (
+    "клуб пост комментарий работа жизнь переезд виза деньги код питон продакшен база данных релиз "
+    "команда менеджер отпуск ипотека книга подкаст опыт совет вопрос ответ идея проект стартап"
+).split()
+
+
+class Command(BaseCommand):
+    help = "Measures markdown rendering: fresh parser per call vs reused parser vs render cache (LRU and redis)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=500, help="How many posts and comments to render")
+        parser.add_argument("--from-db", action="store_true", help="Take latest posts and comments from the DB")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        corpus = self.db_corpus(options["count"]) if options["from_db"] else generate_corpus(
+            options["count"], random.Random(options["seed"])
+        )
+        total_length = sum(len(text) for text in corpus)
+        self.stdout.write(f"Corpus: {len(corpus)} texts, {total_length // 1024} KB")
+
+        for renderer in RENDERERS:
+            markdown_cache.local_cache.clear()
+            results = {
+                "fresh parser": self.measure(corpus, lambda text: render_with_fresh_parser(text, renderer)),
+                "reused parser": self.measure(corpus, lambda text: (markdown_parser(renderer)(text) or "").strip()),
+                "cache, 1st pass": self.measure(corpus, lambda text: markdown_text(text, renderer=renderer)),
+                "cache, LRU hits": self.measure(corpus, lambda text: markdown_text(text, renderer=renderer)),
+            }
+            markdown_cache.local_cache.clear()
+            results["cache, redis hits"] = self.measure(corpus, lambda text: markdown_text(text, renderer=renderer))
+
+            for name, total_ms in results.items():
+                self.stdout.write(
+                    f"{renderer.__name__:<17} {name:<18} {total_ms:9.1f}ms total, "
+                    f"{total_ms * 1000 / len(corpus):8.1f}µs per text"
+                )
+
+        self.stdout.write("Done 🥙")
+
+    def db_corpus(self, count):
+        posts = Post.visible_objects().exclude(text="").order_by("-created_at").values_list("text", flat=True)
+        comments = Comment.visible_objects().order_by("-created_at").values_list("text", flat=True)
+        return list(posts[:count // 5]) + list(comments[:count - count // 5])
+
+    def measure(self, corpus, render):
+        started_at = time.monotonic()
+        for text in corpus:
+            render(text)
+        return (time.monotonic() - started_at) * 1000
+
+
+def render_with_fresh_parser(text, renderer):
+    # how common.markdown.markdown.markdown_text worked before the parser reuse and the cache
+    markdown = mistune.create_markdown(
+        escape=True,
+        renderer=renderer(),
+        plugins=["strikethrough", "url", "table", clicker]
+    )
+    return (markdown(text) or "").strip()
+
+
+def generate_corpus(count, rnd):
+    """
+    Posts (every 5th text) are long with headings, images, embeds, lists and code,
+    comments are a few short paragraphs with links and mentions
+    """
+    return [random_post(rnd) if i % 5 == 0 else random_comment(rnd) for i in range(count)]
+
+
+def random_sentence(rnd):
+    words = rnd.choices(WORDS, k=rnd.randint(5, 18))
+    if rnd.random() < 0.2:
+        words.insert(rnd.randint(0, len(words)), f"**{rnd.choice(WORDS)}**")
+    if rnd.random() < 0.15:
+        words.insert(rnd.randint(0, len(words)), f"@user_{rnd.randint(1, 500)}")
+    if rnd.random() < 0.15:
+        words.append(f"https://example.com/{rnd.choice(WORDS)}/{rnd.randint(1, 1000)}")
+    return " ".join(words).capitalize() + "."
+
+
+def random_paragraph(rnd):
+    return " ".join(random_sentence(rnd) for _ in range(rnd.randint(1, 5)))
+
+
+def random_block(rnd):
+    # images, embeds, lists, code and tables after some of the paragraphs, None for nothing
+    kind = rnd.random()
+    if kind < 0.2:
+        return f"![{rnd.choice(WORDS)}](https://i.vas3k.club/{rnd.randint(1, 10 ** 6)}.jpg)"
+    if kind < 0.3:
+        return f"https://www.youtube.com/watch?v={rnd.randint(10 ** 10, 10 ** 11)}"
+    if kind < 0.5:
+        return "\n".join(f"- {'[ ] ' if rnd.random() < 0.3 else ''}{random_sentence(rnd)}" for _ in range(4))
+    if kind < 0.6:
+        return "```python\nfor i in range(10):\n    print(i)\n```"
+    if kind < 0.65:
+        return "| a | b |\n|---|---|\n| 1 | 2 |"
+    return None
+
+
+def random_post(rnd):
+    blocks = []
+    for _ in range(rnd.randint(3, 10)):
+        blocks.append(f"## {random_sentence(rnd)}")
+        blocks += [random_paragraph(rnd) for _ in range(rnd.randint(1, 4))]
+        block = random_block(rnd)
+        if block:
+            blocks.append(block)
+    return "\n\n".join(blocks)
+
+
+def random_comment(rnd):
+    return "\n\n".join(random_paragraph(rnd) for _ in range(rnd.randint(1, 3)))
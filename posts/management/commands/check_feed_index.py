@@ -0,0 +1,33 @@
+from django.core.management import BaseCommand
+
+from club import features
+from posts import materialized_feed
+
+
+class Command(BaseCommand):
+    help = "Compares materialized feed slices in redis with the same SQL queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=100, help="How many top posts of every slice to compare")
+
+    def handle(self, *args, **options):
+        if not features.MATERIALIZED_FEED:
+            self.stdout.write("Materialized feed is disabled in club/features.py, nothing to check")
+            return
+
+        checked_count = 0
+        broken_count = 0
+        for post_type, room_id, label_code in materialized_feed.all_slices():
+            for ordering in materialized_feed.STORED_ORDERINGS:
+                missing, extra, misplaced = materialized_feed.check_slice(
+                    ordering, post_type, room_id, label_code, limit=options["limit"]
+                )
+                checked_count += 1
+                if missing or extra or misplaced:
+                    broken_count += 1
+                    self.stdout.write(
+                        f"{materialized_feed.slice_key(ordering, post_type, room_id, label_code)}: "
+                        f"missing {len(missing)}, extra {len(extra)}, misplaced {len(misplaced)}"
+                    )
+
+        self.stdout.write(f"Done 🥙 Slices: {checked_count}, inconsistent: {broken_count}")
@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from club import features
+from posts.view_buffer import flush_post_views
+
+
+class Command(BaseCommand):
+    help = "Writes post views buffered in redis to postgres (see features.BUFFERED_POST_VIEWS), runs every minute"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Flush leftovers after the buffer was turned off")
+
+    def handle(self, *args, **options):
+        if not features.BUFFERED_POST_VIEWS and not options["force"]:
+            self.stdout.write("Buffered post views are disabled, nothing to do")
+            return
+
+        flushed_counts, flushed_views = flush_post_views()
+        self.stdout.write(f"Done 🥙 Posts: {flushed_counts}, user views: {flushed_views}")
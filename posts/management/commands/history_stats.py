@@ -0,0 +1,23 @@
+from django.core.management import BaseCommand
+
+from comments.models import Comment
+from common.history import history_stats, STATS_DAYS
+from posts.models.post import Post
+
+
+class Command(BaseCommand):
+    help = "Shows how many history rows were written and skipped (saves without tracked changes) per day"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7, help=f"How many days to show, up to {STATS_DAYS}")
+
+    def handle(self, *args, **options):
+        table_names = [Post._meta.db_table, Comment._meta.db_table]
+        for date, table_name, written, skipped in history_stats(table_names, days=options["days"]):
+            total = written + skipped
+            self.stdout.write(
+                f"{date} {table_name}: written {written}, skipped {skipped}"
+                f" ({skipped / total if total else 0:.0%} of saves)"
+            )
+
+        self.stdout.write("Done 🥙")
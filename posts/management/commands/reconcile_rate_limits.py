@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from club import features
+from comments.rate_limits import user_comments_counter, post_comments_counter
+from posts.models.post import user_posts_counter
+
+
+class Command(BaseCommand):
+    help = "Re-seeds live rate limit counters in redis from the database (fixes events lost between DB and redis)"
+
+    def handle(self, *args, **options):
+        if not features.REDIS_RATE_LIMITS:
+            self.stdout.write("Redis rate limits are disabled, nothing to do")
+            return
+
+        for counter in [user_comments_counter, post_comments_counter, user_posts_counter]:
+            self.stdout.write(f"{counter.name}: {counter.reconcile()} counters reconciled")
+
+        self.stdout.write("Done 🥙")
@@ -0,0 +1,62 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management import BaseCommand
+from django.db import connections
+from django.db.models import Q
+
+from comments.models import Comment
+from common.markdown.cache import RENDERER_VERSION
+from posts.models.post import Post
+from posts.prerender import render_posts, render_comments
+
+
+class Command(BaseCommand):
+    help = "Re-renders HTML of posts and comments rendered by older RENDERER_VERSION (or everything with --all)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Re-render everything, not only old versions")
+        parser.add_argument("--only", choices=["posts", "comments"], help="Re-render only posts or comments")
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument("--workers", type=int, default=4, help="Parallel processes, 1 to run in place")
+        parser.add_argument("--dry-run", action="store_true", help="Only count what needs re-rendering")
+
+    def handle(self, *args, **options):
+        jobs = {
+            "posts": (render_posts, outdated_ids(Post.objects.exclude(type=Post.TYPE_WEEKLY_DIGEST), options)),
+            "comments": (render_comments, outdated_ids(Comment.objects.all(), options)),
+        }
+        if options["only"]:
+            jobs = {options["only"]: jobs[options["only"]]}
+
+        for name, (render, ids) in jobs.items():
+            self.stdout.write(f"{name}: {len(ids)} to render with renderer v{RENDERER_VERSION}")
+            if options["dry_run"] or not ids:
+                continue
+
+            chunks = [ids[i:i + options["chunk_size"]] for i in range(0, len(ids), options["chunk_size"])]
+            rendered = 0
+            for done, count in enumerate(self.run(render, chunks, options["workers"]), start=1):
+                rendered += count
+                self.stdout.write(f"{name}: chunk {done}/{len(chunks)}, {rendered} rendered")
+
+            # rows edited during the run are skipped, they were already rendered by their own save
+            self.stdout.write(f"{name}: {rendered} rendered, {len(ids) - rendered} skipped")
+
+        self.stdout.write("Done 🥙")
+
+    def run(self, render, chunks, workers):
+        if workers <= 1:
+            yield from map(render, chunks)
+            return
+
+        # forked workers must not share the parent's DB connection, they open their own
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as pool:
+            yield from pool.map(render, chunks)
+
+
+def outdated_ids(queryset, options):
+    if not options["all"]:
+        queryset = queryset.filter(Q(html_version__isnull=True) | Q(html_version__lt=RENDERER_VERSION))
+    return list(queryset.exclude(text="").order_by("id").values_list("id", flat=True))
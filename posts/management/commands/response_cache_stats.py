@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from posts.cache import response_cache_stats, reset_response_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Shows hit/miss counters of the anonymous response cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Reset counters after printing them")
+
+    def handle(self, *args, **options):
+        stats = response_cache_stats()
+        self.stdout.write(f"Hits: {stats['hits']}, misses: {stats['misses']}, hit ratio: {stats['hit_ratio']:.1%}")
+
+        if options["reset"]:
+            reset_response_cache_stats()
+
+        self.stdout.write("Done 🥙")
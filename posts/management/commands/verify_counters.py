@@ -0,0 +1,33 @@
+from django.core.management import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = "Recounts posts.comment_count and user_counters from scratch and reports (or fixes) the drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Overwrite drifted counters with actual values")
+        parser.add_argument("--verbose", action="store_true", help="Print every drifted counter")
+
+    def handle(self, *args, **options):
+        post_drift = counters.find_post_drift()
+        if options["verbose"]:
+            for post_id, stored, actual in post_drift:
+                self.stdout.write(f"post {post_id}: comment_count {stored} != {actual}")
+
+        user_drift = counters.find_user_drift()
+        if options["verbose"]:
+            for user_id, fields in user_drift.items():
+                for field, (stored, actual) in fields.items():
+                    self.stdout.write(f"user {user_id}: {field} {stored} != {actual}")
+
+        self.stdout.write(f"Posts with drifted comment_count: {len(post_drift)}")
+        self.stdout.write(f"Users with drifted counters: {len(user_drift)}")
+
+        if options["fix"]:
+            counters.fix_post_drift([post_id for post_id, _, _ in post_drift])
+            counters.recalculate_user_counters(list(user_drift.keys()))
+            self.stdout.write("Fixed")
+
+        self.stdout.write("Done 🥙")
@@ -0,0 +1,444 @@
+"""
+Materialized feed: ranked post ids for every (ordering, post_type, room, label) slice are kept
+in redis sorted sets and updated when posts change, so feed pages don't have to sort the whole
+posts table in Postgres. Per-user exclusions (mutes, room-only posts, pins) are applied in memory
+after the page is loaded with in_bulk().
+
+Enabled by features.MATERIALIZED_FEED. Until `manage.py rebuild_feed_index` fills redis
+(or whenever redis is unavailable) the feed silently falls back to SQL.
+"""
+import logging
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from redis import RedisError
+
+from club import features
+from common.pagination import CursorPage, CURSOR_QUERY_PARAM, CURSOR_FORWARD, decode_cursor
+from posts.feed_filters import FeedFilterProfile
+from posts.helpers import POST_TYPE_ALL, ORDERING_ACTIVITY, ORDERING_NEW, ORDERING_HOT, ORDERING_TOP, \
+    TOP_PERIOD_ORDERINGS, top_period_bounds, sort_feed
+from posts.models.post import Post
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = "feed"
+READY_KEY = f"{KEY_PREFIX}:ready"
+MEMBERSHIP_KEY = f"{KEY_PREFIX}:memberships"  # post_id -> "type|room|label" to know which slices to clean up
+EMPTY_SLICE = "-"
+
+# orderings stored as sorted sets (top_week/month/year are sliced out of "new" + "top")
+STORED_ORDERINGS = {
+    ORDERING_ACTIVITY: "last_activity_at",
+    ORDERING_NEW: "published_at",
+    ORDERING_HOT: "hotness",
+    ORDERING_TOP: "upvotes",
+}
+
+# must be the same as paginate_by_cursor() builds for sort_feed() so cursors work in both modes
+CURSOR_ORDERINGS = {
+    ORDERING_ACTIVITY: ["-last_activity_at", "-pk"],
+    ORDERING_NEW: ["-published_at", "-pk"],
+    ORDERING_HOT: ["-hotness", "-pk"],
+    ORDERING_TOP: ["-upvotes", "-pk"],
+}
+
+LINK_ONLY_AUTHOR_CACHE_TIMEOUT = 24 * 60 * 60  # seconds, it's flushed when the author's posts change anyway
+BATCH_SIZE_MULTIPLIER = 2  # fetch more ids than page size because some will be filtered out
+MAX_BATCHES_PER_PAGE = 10  # give up and use SQL if user filters out too much
+EPOCH = datetime(1970, 1, 1)
+
+
+def redis_client():
+    return get_redis_connection("default")
+
+
+def is_ready():
+    if not features.MATERIALIZED_FEED:
+        return False
+    try:
+        return bool(redis_client().exists(READY_KEY))
+    except RedisError:
+        return False
+
+
+def slice_key(ordering, post_type=POST_TYPE_ALL, room_id=None, label_code=None):
+    return f"{KEY_PREFIX}:{ordering}:{post_type or POST_TYPE_ALL}:{room_id or EMPTY_SLICE}:{label_code or EMPTY_SLICE}"
+
+
+def post_slices(post_type, room_id, label_code):
+    # every feed filter combination the post shows up in
+    for slice_type in {POST_TYPE_ALL, post_type}:
+        for slice_room in {None, room_id}:
+            for slice_label in {None, label_code}:
+                yield slice_type, slice_room, slice_label
+
+
+def is_indexable(post):
+    # the same posts as Post.visible_objects() in the SQL feed, deleted ones are drafts already
+    return post.visibility == Post.VISIBILITY_EVERYWHERE
+
+
+def score_for(post, ordering):
+    value = getattr(post, STORED_ORDERINGS[ordering])
+    if isinstance(value, datetime):
+        return datetime_score(value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None  # unknown values (like F() expressions) are fixed by the next full sync
+
+
+def datetime_score(value):
+    # microseconds since epoch still fit into float64 mantissa, so the score is exact
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _membership(post):
+    return "|".join([post.type, post.room_id or "", post.label_code or ""])
+
+
+def _parse_membership(membership):
+    post_type, room_id, label_code = membership.split("|", 2)
+    return post_type, room_id or None, label_code or None
+
+
+def sync_post(post, pipeline=None):
+    """
+    Puts post into all its slices with fresh scores or removes it from the feed completely
+    """
+    if not features.MATERIALIZED_FEED:
+        return
+
+    try:
+        redis = redis_client()
+        post_id = str(post.id)
+        old_membership = _decode(redis.hget(MEMBERSHIP_KEY, post_id))
+        pipe = pipeline or redis.pipeline(transaction=False)
+
+        new_membership = _membership(post) if is_indexable(post) else None
+        if old_membership and old_membership != new_membership:
+            for ordering in STORED_ORDERINGS:
+                for slice_args in post_slices(*_parse_membership(old_membership)):
+                    pipe.zrem(slice_key(ordering, *slice_args), post_id)
+
+        if new_membership:
+            for ordering in STORED_ORDERINGS:
+                score = score_for(post, ordering)
+                if score is None:
+                    continue
+                for slice_args in post_slices(post.type, post.room_id, post.label_code):
+                    pipe.zadd(slice_key(ordering, *slice_args), {post_id: score})
+            pipe.hset(MEMBERSHIP_KEY, post_id, new_membership)
+        else:
+            pipe.hdel(MEMBERSHIP_KEY, post_id)
+
+        if pipeline is None:
+            pipe.execute()
+    except RedisError as ex:
+        log.warning(f"Can't sync post {post.id} to materialized feed: {ex}")
+
+
+def increment_score(post_id, ordering, amount=1):
+    if not features.MATERIALIZED_FEED:
+        return
+
+    try:
+        redis = redis_client()
+        membership = _decode(redis.hget(MEMBERSHIP_KEY, str(post_id)))
+        if not membership:
+            return  # post is not in the feed
+
+        pipe = redis.pipeline(transaction=False)
+        for slice_args in post_slices(*_parse_membership(membership)):
+            pipe.zincrby(slice_key(ordering, *slice_args), amount, str(post_id))
+        pipe.execute()
+    except RedisError as ex:
+        log.warning(f"Can't update {ordering} score for post {post_id}: {ex}")
+
+
+def update_scores(ordering, scores):
+    """
+    Bulk version of increment_score for batch jobs: scores is {post_id: new_score}
+    """
+    if not features.MATERIALIZED_FEED or not scores:
+        return
+
+    try:
+        redis = redis_client()
+        post_ids = [str(post_id) for post_id in scores.keys()]
+        memberships = redis.hmget(MEMBERSHIP_KEY, post_ids)
+        pipe = redis.pipeline(transaction=False)
+        for post_id, score, membership in zip(post_ids, scores.values(), map(_decode, memberships)):
+            if not membership:
+                continue
+            for slice_args in post_slices(*_parse_membership(membership)):
+                pipe.zadd(slice_key(ordering, *slice_args), {post_id: score})
+        pipe.execute()
+    except RedisError as ex:
+        log.warning(f"Can't bulk update {ordering} scores: {ex}")
+
+
+def rebuild(posts, chunk_size=500):
+    """
+    Drops everything and fills slices from scratch. Feed uses SQL while it's running
+    """
+    redis = redis_client()
+    redis.delete(READY_KEY)
+    for keys in _chunks(redis.scan_iter(match=f"{KEY_PREFIX}:*", count=1000), 1000):
+        redis.delete(*keys)
+
+    indexed_count = 0
+    pipe = redis.pipeline(transaction=False)
+    for post in posts.iterator(chunk_size=chunk_size):
+        sync_post(post, pipeline=pipe)
+        indexed_count += 1
+        if indexed_count % chunk_size == 0:
+            pipe.execute()
+    pipe.execute()
+
+    redis.set(READY_KEY, datetime.utcnow().isoformat())
+    return indexed_count
+
+
+def ranked_ids(ordering, post_type=POST_TYPE_ALL, room_id=None, label_code=None, ordering_param=None,
+               cursor_values=None, batch_size=100):
+    """
+    Yields post ids (as strings) in feed order, starting right after the cursor
+    """
+    if ordering in TOP_PERIOD_ORDERINGS:
+        yield from _ranked_top_period_ids(ordering, post_type, room_id, label_code, ordering_param, cursor_values)
+        return
+
+    redis = redis_client()
+    key = slice_key(ordering, post_type, room_id, label_code)
+
+    skip_ties = None
+    offset = 0
+    if cursor_values:
+        cursor_score, cursor_id = _cursor_score(ordering, cursor_values[0]), str(cursor_values[-1])
+        pipe = redis.pipeline(transaction=False)
+        pipe.zscore(key, cursor_id)
+        pipe.zrevrank(key, cursor_id)
+        current_score, current_rank = pipe.execute()
+        if current_rank is not None and current_score == cursor_score:
+            offset = current_rank + 1
+        else:
+            # cursor post has moved or disappeared, seek by score
+            offset = redis.zcount(key, f"({cursor_score}", "+inf")
+            skip_ties = (cursor_score, cursor_id)
+
+    while True:
+        batch = redis.zrevrange(key, offset, offset + batch_size - 1, withscores=True)
+        if not batch:
+            return
+
+        for member, score in batch:
+            member = _decode(member)
+            if skip_ties and score == skip_ties[0] and member >= skip_ties[1]:
+                continue
+            yield member
+
+        offset += len(batch)
+
+
+def _ranked_top_period_ids(ordering, post_type, room_id, label_code, ordering_param, cursor_values):
+    start_date, end_date = top_period_bounds(ordering, ordering_param)
+    redis = redis_client()
+
+    post_ids = redis.zrangebyscore(
+        slice_key(ORDERING_NEW, post_type, room_id, label_code),
+        datetime_score(start_date),
+        f"({datetime_score(end_date)}" if end_date else "+inf",
+    )
+    if not post_ids:
+        return
+
+    upvotes = redis.zmscore(slice_key(ORDERING_TOP, post_type, room_id, label_code), post_ids)
+    ranked = sorted(
+        [
+            (int(score or 0), _decode(post_id))
+            for post_id, score in zip(post_ids, upvotes)
+        ],
+        reverse=True,
+    )
+
+    if cursor_values:
+        cursor = (int(cursor_values[0]), str(cursor_values[-1]))
+        ranked = [item for item in ranked if item < cursor]
+
+    for _, post_id in ranked:
+        yield post_id
+
+
+def _cursor_score(ordering, value):
+    if STORED_ORDERINGS[ordering] in {"last_activity_at", "published_at"}:
+        return datetime_score(datetime.fromisoformat(value))
+    if ordering == ORDERING_HOT:
+        return float(value)  # hotness is a float, see posts/hotness.py
+    return int(value)
+
+
+def materialized_feed_page(request, post_type, room, label_code, ordering, ordering_param, page_size):
+    """
+    Returns CursorPage of posts or None if this request should go the usual SQL way
+    """
+    if not is_ready():
+        return None
+
+    cursor_ordering = CURSOR_ORDERINGS[ORDERING_TOP if ordering in TOP_PERIOD_ORDERINGS else ordering]
+
+    # ?page= links and "previous page" cursors are served by SQL
+    if request.GET.get("page") and not request.GET.get(CURSOR_QUERY_PARAM):
+        return None
+    direction, cursor_values = decode_cursor(request.GET.get(CURSOR_QUERY_PARAM), cursor_ordering)
+    if direction != CURSOR_FORWARD:
+        return None
+
+    me = request.me
+    if me and has_link_only_posts(me):
+        return None  # authors see their own posts on moderation, they are not in the shared index
+
+    is_post_visible = _feed_filter(me, room, label_code, ordering)
+    posts_queryset = Post.objects_for_user(me) if me else Post.visible_objects()
+
+    try:
+        ids = ranked_ids(
+            ordering=ordering,
+            post_type=post_type,
+            room_id=room.slug if room else None,
+            label_code=label_code,
+            ordering_param=ordering_param,
+            cursor_values=cursor_values,
+            batch_size=page_size * BATCH_SIZE_MULTIPLIER,
+        )
+
+        page = []
+        for _ in range(MAX_BATCHES_PER_PAGE):
+            batch = [post_id for _, post_id in zip(range(page_size * BATCH_SIZE_MULTIPLIER), ids)]
+            if not batch:
+                break
+
+            posts_by_id = {str(post_id): post for post_id, post in posts_queryset.in_bulk(batch).items()}
+            for post_id in batch:
+                post = posts_by_id.get(post_id)
+                if post and is_post_visible(post):
+                    page.append(post)
+
+            if len(page) > page_size:
+                break
+        else:
+            return None  # too much filtered out, SQL knows better
+    except (RedisError, ValueError, TypeError) as ex:
+        log.warning(f"Materialized feed failed, falling back to SQL: {ex}")
+        return None
+
+    return CursorPage(
+        page[:page_size],
+        cursor_ordering,
+        has_next=len(page) > page_size,
+        has_previous=bool(cursor_values),
+    )
+
+
+def link_only_author_cache_key(user_id):
+    return f"feed:has_link_only:{user_id}"
+
+
+def has_link_only_posts(user):
+    key = link_only_author_cache_key(user.id)
+    has_posts = cache.get(key)
+    if has_posts is None:
+        has_posts = Post.objects.filter(author=user, visibility=Post.VISIBILITY_LINK_ONLY).exists()
+        cache.set(key, has_posts, LINK_ONLY_AUTHOR_CACHE_TIMEOUT)
+    return has_posts
+
+
+def clear_link_only_author_cache(user_id):
+    if user_id:
+        cache.delete(link_only_author_cache_key(user_id))
+
+
+def _feed_filter(me, room, label_code, ordering):
+    # mirrors the exclusions in posts.views.feed
+    profile = FeedFilterProfile.for_user(me)
+
+    def is_post_visible(post):
+        if not me and (not post.is_public or post.type == Post.TYPE_INTRO):
+            return False
+
+        if not profile.allows(post, room, label_code, ordering):
+            return False
+
+        if ordering == ORDERING_ACTIVITY and post.is_pinned:
+            return False  # pinned posts are shown separately
+
+        return True
+
+    return is_post_visible
+
+
+def sql_ranked_ids(ordering, post_type=POST_TYPE_ALL, room_id=None, label_code=None, limit=100):
+    posts = Post.objects.filter(visibility=Post.VISIBILITY_EVERYWHERE)
+    if post_type != POST_TYPE_ALL:
+        posts = posts.filter(type=post_type)
+    if room_id:
+        posts = posts.filter(room_id=room_id)
+    if label_code:
+        posts = posts.filter(label_code=label_code)
+
+    posts = sort_feed(posts, ordering)
+    posts = posts.order_by(*posts.query.order_by, "-pk")  # redis breaks ties by id too
+    return [str(post_id) for post_id in posts.values_list("id", flat=True)[:limit]]
+
+
+def check_slice(ordering, post_type=POST_TYPE_ALL, room_id=None, label_code=None, limit=100):
+    """
+    Compares top of the redis slice with the same query in SQL. Returns (missing, extra, misplaced) ids
+    """
+    expected = sql_ranked_ids(ordering, post_type, room_id, label_code, limit=limit)
+    actual = [
+        _decode(member)
+        for member in redis_client().zrevrange(slice_key(ordering, post_type, room_id, label_code), 0, limit - 1)
+    ]
+
+    # the tail can differ because of ties on the border, only compare the common length
+    common_length = min(len(expected), len(actual))
+    expected_set, actual_set = set(expected[:common_length]), set(actual[:common_length])
+    missing = expected_set - actual_set
+    extra = actual_set - expected_set
+    misplaced = [
+        post_id for post_id, expected_id in zip(actual, expected)
+        if post_id != expected_id and post_id not in extra
+    ]
+    if len(expected) > len(actual):
+        missing |= set(expected[common_length:])
+
+    return missing, extra, misplaced
+
+
+def all_slices():
+    rows = Post.objects\
+        .filter(visibility=Post.VISIBILITY_EVERYWHERE)\
+        .values_list("type", "room_id", "label_code")\
+        .distinct()
+
+    slices = set()
+    for post_type, room_id, label_code in rows:
+        slices.update(post_slices(post_type, room_id, label_code))
+    return sorted(slices, key=lambda s: tuple(value or "" for value in s))
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,45 @@
+from django.db import migrations, models
+
+# old integer hotness has a different scale, recalculate it right away so the hot feed doesn't jump.
+# the same as posts.hotness.calculate_hotness() with the settings of the time frozen:
+# epoch 2020-01-01, half-life 48 hours, period 5 days
+RECALCULATE_HOTNESS_SQL = """
+    update posts set hotness = 0 where hotness != 0;
+
+    update posts set hotness = hot.hotness
+    from (
+        select post_id, max_score + ln(sum(exp(score - max_score))) as hotness
+        from (
+            select post_id, score, max(score) over (partition by post_id) as max_score
+            from (
+                select distinct on (comments.post_id, comments.author_id)
+                    comments.post_id,
+                    extract(epoch from comments.created_at - timestamp '2020-01-01') / (48 * 3600 / ln(2)) as score
+                from comments
+                join posts on posts.id = comments.post_id
+                where comments.is_deleted = false
+                    and comments.created_at > (now() at time zone 'utc') - interval '5 days'
+                    and posts.visibility = 'everywhere'
+                order by comments.post_id, comments.author_id, comments.created_at desc
+            ) as latest_comments
+        ) as scores
+        group by post_id, max_score
+    ) as hot
+    where posts.id = hot.post_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0036_alter_post_moderation_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='hotness',
+            field=models.FloatField(db_index=True, default=0),
+        ),
+        migrations.RunSQL(RECALCULATE_HOTNESS_SQL, migrations.RunSQL.noop),
+    ]
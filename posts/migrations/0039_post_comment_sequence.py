@@ -0,0 +1,46 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0038_schedule_flush_post_views'),
+        ('comments', '0012_comment_comments_deleted_post_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_sequence',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='postview',
+            name='seen_comment_sequence',
+            field=models.IntegerField(default=0),
+        ),
+        # every comment ever written gets a number, deleted ones included (they're subtracted at read time)
+        migrations.RunSQL("""
+            update posts
+            set comment_sequence = counts.total
+            from (select post_id, count(*) as total from comments group by post_id) as counts
+            where posts.id = counts.post_id
+        """, migrations.RunSQL.noop),
+        # keep the same unread counters: seen = sequence - unread - deleted comments after the last view
+        migrations.RunSQL("""
+            update post_views
+            set seen_comment_sequence = greatest(
+                posts.comment_sequence
+                - post_views.unread_comments
+                - (
+                    select count(*) from comments
+                    where comments.post_id = post_views.post_id
+                        and comments.is_deleted = true
+                        and comments.created_at > post_views.last_view_at
+                ),
+                0
+            )
+            from posts
+            where posts.id = post_views.post_id and post_views.user_id is not null
+        """, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0039_post_comment_sequence'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='postview',
+            name='unread_comments',
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0040_remove_postview_unread_comments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='html_version',
+            field=models.IntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0041_post_html_version'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "create sequence if not exists post_slug_seq",
+                # new posts used to get str(Post.objects.count()), so continue from there
+                "select setval('post_slug_seq', greatest((select count(*) from posts), 1))",
+                """
+                create or replace function next_post_slug() returns text as $$
+                declare
+                    candidate text;
+                begin
+                    loop
+                        candidate := nextval('post_slug_seq')::text;
+                        exit when not exists (select 1 from posts where slug = candidate);
+                    end loop;
+                    return candidate;
+                end;
+                $$ language plpgsql
+                """,
+            ],
+            reverse_sql=[
+                "drop function if exists next_post_slug()",
+                "drop sequence if exists post_slug_seq",
+            ],
+        ),
+    ]
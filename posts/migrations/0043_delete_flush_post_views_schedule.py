@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def delete_schedule(apps, schema_editor):
+    # views are flushed by `manage.py flush_post_views` from etc/crontab now
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(name="flush_post_views").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0042_post_slug_sequence'),
+        ('django_q', '0019_alter_task_options_alter_ormq_key_alter_ormq_lock_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_schedule, migrations.RunPython.noop),
+    ]
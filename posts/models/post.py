@@ -1,23 +1,29 @@
+import logging
 from datetime import datetime, timedelta
 from uuid import uuid4
 
 from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
-from django.db import models
-from django.db.models import BigIntegerField, F, OuterRef, Q, Subquery
-from django.db.models.functions import Extract, Round
+from django.db import models, transaction, connection
+from django.db.models import F, Q
 from django.template.defaultfilters import truncatechars
 from django.urls import reverse
 from django.utils.html import strip_tags
-from simple_history.models import HistoricalRecords
+from redis import RedisError
 
+from club import features
 from common.data.labels import LABELS
+from common.history import ChangeAwareHistoricalRecords
 from common.models import ModelDiffMixin
-from posts.models.views import PostView
-from posts.models.votes import PostVote
+from common.rate_limits import SlidingWindowCounter
+from posts.models.views import PostView  # noqa: F401 (posts/models/__init__.py doesn't register models)
+from posts.models.votes import PostVote  # noqa: F401
 from rooms.models import Room
 from users.models.user import User
-from utils.slug import generate_unique_slug
+
+log = logging.getLogger(__name__)
+
+POST_RATE_LIMIT_WINDOW = timedelta(hours=24)
 
 
 class Post(models.Model, ModelDiffMixin):
@@ -111,6 +117,7 @@ class Post(models.Model, ModelDiffMixin):
     title = models.TextField(null=False)
     text = models.TextField(null=False)
     html = models.TextField(null=True)
+    html_version = models.IntegerField(null=True)  # RENDERER_VERSION of html, see posts/prerender.py
     url = models.URLField(max_length=1024, null=True)
     image = models.URLField(max_length=1024, null=True)
 
@@ -124,9 +131,10 @@ class Post(models.Model, ModelDiffMixin):
     deleted_at = models.DateTimeField(null=True)
 
     comment_count = models.IntegerField(default=0)
+    comment_sequence = models.IntegerField(default=0)  # every comment ever written, never goes down
     view_count = models.IntegerField(default=0)
     upvotes = models.IntegerField(default=0, db_index=True)
-    hotness = models.IntegerField(default=0, db_index=True)
+    hotness = models.FloatField(default=0, db_index=True)  # log-scale, see posts/hotness.py
 
     moderation_status = models.CharField(
         max_length=12,
@@ -146,16 +154,18 @@ class Post(models.Model, ModelDiffMixin):
     is_public = models.BooleanField(default=False)  # post is visible for the outside world
     is_pinned_until = models.DateTimeField(null=True)  # pin on top on the main page
 
-    history = HistoricalRecords(
+    history = ChangeAwareHistoricalRecords(
         user_model=User,
         table_name="posts_history",
         excluded_fields=[
             "html",
+            "html_version",
             "created_at",
             "updated_at",
             "last_activity_at",
             "published_at",
             "comment_count",
+            "comment_sequence",
             "view_count",
             "upvotes",
             "hotness",
@@ -205,7 +215,7 @@ class Post(models.Model, ModelDiffMixin):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = generate_unique_slug(Post, str(Post.objects.count()))
+            self.slug = Post.next_slug()
 
         if not self.published_at and self.visibility != Post.VISIBILITY_DRAFT:
             self.published_at = datetime.utcnow()
@@ -216,9 +226,27 @@ class Post(models.Model, ModelDiffMixin):
     def get_absolute_url(self):
         return reverse("show_post", kwargs={"post_type": self.type, "post_slug": self.slug})
 
+    @classmethod
+    def next_slug(cls):
+        # numeric slugs come from a sequence, numbers already taken by old or custom slugs are skipped
+        # (see next_post_slug() in posts/migrations/0042_post_slug_sequence.py)
+        with connection.cursor() as cursor:
+            cursor.execute("select next_post_slug()")
+            return cursor.fetchone()[0]
+
     def increment_view_count(self):
         return Post.objects.filter(id=self.id).update(view_count=F("view_count") + 1)
 
+    def increment_comment_sequence(self):
+        # refresh_from_db(fields=...) would init a deferred Post, and ModelDiffMixin reads all its fields
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "update posts set comment_sequence = comment_sequence + 1 where id = %s returning comment_sequence",
+                [self.id],
+            )
+            self.comment_sequence = cursor.fetchone()[0]
+        return self.comment_sequence
+
     def increment_vote_count(self):
         if self.coauthors:
             self.increment_coauthors_vote_count()
@@ -350,24 +378,9 @@ class Post(models.Model, ModelDiffMixin):
 
     @classmethod
     def objects_for_user(cls, user):
-        if not user:
-            return cls.visible_objects()
-
-        vote_qs = PostVote.objects.filter(post=OuterRef('pk'), user=user)
-        view_qs = PostView.objects.filter(post=OuterRef('pk'), user=user)
-
-        return cls.visible_objects_for_user(user)\
-            .annotate(
-                upvoted_at=Subquery(
-                    vote_qs.annotate(
-                        epoch_ms=Round(Extract('created_at', 'epoch') * 1000)
-                    ).values('epoch_ms')[:1],
-                    output_field=BigIntegerField(),
-                ),
-                unread_comments=Subquery(
-                    view_qs.values('unread_comments')[:1],
-                ),
-            )
+        # viewer state (votes, unread comments, bookmarks) is attached to the page later,
+        # see posts.viewer_state.attach_post_viewer_state
+        return cls.visible_objects_for_user(user)
 
     @classmethod
     def count_user_posts(cls, user, viewer=None):
@@ -387,9 +400,12 @@ class Post(models.Model, ModelDiffMixin):
         if user.is_moderator:
             return True
 
-        day_post_count = Post.visible_objects()\
-            .filter(author=user, created_at__gte=datetime.utcnow() - timedelta(hours=24))\
-            .count()
+        if features.REDIS_RATE_LIMITS:
+            day_post_count = user_posts_counter.count(user.id)
+        else:
+            day_post_count = Post.visible_objects()\
+                .filter(author=user, created_at__gte=datetime.utcnow() - POST_RATE_LIMIT_WINDOW)\
+                .count()
 
         return day_post_count < settings.RATE_LIMIT_POSTS_PER_DAY
 
@@ -442,3 +458,37 @@ class Post(models.Model, ModelDiffMixin):
     def undelete(self, *args, **kwargs):
         self.deleted_at = None
         self.save()
+
+
+def _recent_visible_posts(user_id, since):
+    return Post.visible_objects()\
+        .filter(author_id=user_id, created_at__gte=since)\
+        .order_by()\
+        .values_list("id", "created_at")
+
+
+# recent visible posts of the user for Post.check_rate_limits (see features.REDIS_RATE_LIMITS)
+user_posts_counter = SlidingWindowCounter("posts:user", POST_RATE_LIMIT_WINDOW, source=_recent_visible_posts)
+
+
+def track_post(post):
+    """
+    Keeps the counter in sync with a saved post once the transaction is committed
+    """
+    if not features.REDIS_RATE_LIMITS:
+        return
+
+    is_counted = post.visibility not in (Post.VISIBILITY_LINK_ONLY, Post.VISIBILITY_DRAFT)
+    post_id, author_id, created_at = post.id, post.author_id, post.created_at
+
+    def update_counter():
+        try:
+            if is_counted:
+                user_posts_counter.add(author_id, event_id=post_id, at=created_at)
+            else:
+                user_posts_counter.remove(author_id, event_id=post_id)
+        except RedisError as ex:
+            # the counter will be fixed by the next reconcile_rate_limits
+            log.warning(f"Can't track post {post_id} in rate limits: {ex}")
+
+    transaction.on_commit(update_counter)
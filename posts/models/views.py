@@ -3,7 +3,6 @@ from uuid import uuid4
 
 from django.conf import settings
 from django.db import models
-from django.db.models import F
 
 from common.request import parse_ip_address
 from users.models.user import User
@@ -21,7 +20,7 @@ class PostView(models.Model):
     registered_view_at = models.DateTimeField(auto_now_add=True)
     last_view_at = models.DateTimeField(auto_now=True)
 
-    unread_comments = models.IntegerField(default=0)
+    seen_comment_sequence = models.IntegerField(default=0)  # post.comment_sequence at the last view
 
     class Meta:
         db_table = "post_views"
@@ -45,9 +44,9 @@ class PostView(models.Model):
             post_view.registered_view_at = datetime.utcnow()
             post.increment_view_count()
 
-        # reset counters and store last view
+        # mark all comments as read and store last view
+        post_view.seen_comment_sequence = post.comment_sequence
         if not is_view_created:
-            post_view.unread_comments = 0
             post_view.last_view_at = datetime.utcnow()
 
         post_view.save()
@@ -77,13 +76,3 @@ class PostView(models.Model):
             post_view.save()
 
         return post_view
-
-    @classmethod
-    def increment_unread_comments(cls, comment):
-        PostView.objects.filter(post=comment.post, last_view_at__lt=comment.created_at, user__isnull=False)\
-            .update(unread_comments=F("unread_comments") + 1)
-
-    @classmethod
-    def decrement_unread_comments(cls, comment):
-        PostView.objects.filter(post=comment.post, last_view_at__lt=comment.created_at, user__isnull=False)\
-            .update(unread_comments=F("unread_comments") - 1)
@@ -0,0 +1,81 @@
+"""
+HTML of posts and comments is rendered when they are saved, not when somebody opens the page.
+
+To (re)render something just set html = None and save it: the post_save signal sends it to django-q
+(or renders it right away if the queue is unavailable). Stored HTML is stamped with RENDERER_VERSION,
+after a renderer change `manage.py rerender_markdown` re-renders old versions in the background,
+pages keep showing the old HTML until then.
+"""
+import hashlib
+import logging
+
+from django.db import connection, transaction
+from django_q.tasks import async_task
+
+from comments.models import Comment
+from common.markdown.cache import RENDERER_VERSION
+from common.markdown.markdown import markdown_text
+from posts.models.post import Post
+
+log = logging.getLogger(__name__)
+
+
+def render_html(post_or_comment):
+    return markdown_text(post_or_comment.text, uniq_id=post_or_comment.id)
+
+
+def needs_render(post_or_comment):
+    if isinstance(post_or_comment, Post) and post_or_comment.type == Post.TYPE_WEEKLY_DIGEST:
+        return False  # never render digests again to preserve their original state
+    return post_or_comment.html is None and bool(post_or_comment.text)
+
+
+def schedule_render(post_or_comment):
+    render = render_posts if isinstance(post_or_comment, Post) else render_comments
+    ids = [post_or_comment.id]
+
+    def enqueue():
+        try:
+            async_task(render, ids)
+        except Exception as ex:
+            log.warning(f"Can't enqueue HTML render, rendering right away: {ex}")
+            render(ids)
+
+    transaction.on_commit(enqueue)  # the task has to see the new text
+
+
+def render_posts(post_ids):
+    # not .only(): ModelDiffMixin of Post reads every field on init, deferred fields recurse there
+    posts = Post.objects\
+        .filter(id__in=post_ids)\
+        .exclude(type=Post.TYPE_WEEKLY_DIGEST)\
+        .values_list("id", "text")
+    return store_html(Post, [(post_id, text, markdown_text(text, uniq_id=post_id)) for post_id, text in posts])
+
+
+def render_comments(comment_ids):
+    comments = Comment.objects.filter(id__in=comment_ids).only("id", "text")
+    return store_html(Comment, [(comment.id, comment.text, render_html(comment)) for comment in comments])
+
+
+def store_html(model, rendered):
+    """
+    Saves [(id, text, html)] without signals and history records. Rows which were edited after the text
+    was read are skipped, their own render is already on the way. Returns the number of updated rows
+    """
+    if not rendered:
+        return 0
+
+    ids, texts, htmls = map(list, zip(*rendered))
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            update {model._meta.db_table} as target
+            set html = rendered.html, html_version = %s
+            from unnest(%s::uuid[], %s::text[], %s::text[]) as rendered(id, text_md5, html)
+            where target.id = rendered.id and md5(target.text) = rendered.text_md5
+        """, [RENDERER_VERSION, ids, [_md5(text) for text in texts], htmls])
+        return cursor.rowcount
+
+
+def _md5(text):
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
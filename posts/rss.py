@@ -1,5 +1,6 @@
 from django.contrib.syndication.views import Feed
 
+from posts.cache import cached_anonymous_response
 from posts.models.post import Post
 
 
@@ -9,6 +10,17 @@ class NewPostsRss(Feed):
     description = ""
     limit = 20
 
+    def __call__(self, request, *args, **kwargs):
+        return cached_anonymous_response(
+            request,
+            tags=self.cache_tags(*args, **kwargs),
+            build_response=lambda: super(NewPostsRss, self).__call__(request, *args, **kwargs),
+            key_parts=kwargs,
+        )
+
+    def cache_tags(self, *args, **kwargs):
+        return ["posts"]
+
     def items(self):
         return Post.visible_objects()\
            .filter(moderation_status=Post.MODERATION_APPROVED)\
@@ -0,0 +1,187 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete, post_init
+from django.dispatch import receiver
+
+from badges.models import UserBadge
+from club import features
+from comments import rate_limits as comment_rate_limits
+from comments.models import Comment, CommentVote
+from posts import materialized_feed, hotness, prerender, counters
+from posts.cache import flush_post_response_cache, flush_response_cache
+from posts.comment_tree import flush_comment_tree_cache
+from posts.feed_filters import clear_feed_filter_profile_cache
+from posts.helpers import ORDERING_TOP
+from posts.models.post import Post, track_post
+from posts.models.votes import PostVote
+from posts.viewer_context import clear_viewer_relations_cache
+from rooms.models import RoomMuted, RoomSubscription
+from users.models.mute import UserMuted
+from users.models.notes import UserNote
+
+FEED_FIELDS = {
+    "visibility", "deleted_at", "type", "room", "label_code",
+    "last_activity_at", "published_at", "hotness", "upvotes",
+}
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def render_html_on_save(sender, instance, **kwargs):
+    if prerender.needs_render(instance):
+        prerender.schedule_render(instance)
+
+
+@receiver(post_save, sender=Post)
+def sync_post_feed_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not FEED_FIELDS.intersection(update_fields):
+        return
+    materialized_feed.sync_post(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def flush_link_only_author_cache(sender, instance, **kwargs):
+    diff = instance.diff
+    if instance.visibility == Post.VISIBILITY_LINK_ONLY or "visibility" in diff or "author" in diff:
+        materialized_feed.clear_link_only_author_cache(instance.author_id)
+        if "author" in diff:
+            materialized_feed.clear_link_only_author_cache(diff["author"][0])  # author's pk
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def flush_post_response_cache_on_change(sender, instance, **kwargs):
+    if not features.ANONYMOUS_RESPONSE_CACHE:
+        return
+
+    # also flush feeds the post was moved from
+    old_values = {
+        field: diff[0]
+        for field, diff in instance.diff.items()
+        if field in ("type", "room", "label_code")
+    }
+    flush_post_response_cache(instance, old_values)
+
+
+@receiver([post_save, post_delete], sender=PostVote)
+@receiver([post_save, post_delete], sender=Comment)
+@receiver([post_save, post_delete], sender=CommentVote)
+def flush_post_page_response_cache(sender, instance, **kwargs):
+    # feeds can live with slightly outdated counters until RESPONSE_CACHE_TIMEOUT, the post page can't
+    if features.ANONYMOUS_RESPONSE_CACHE:
+        flush_response_cache([f"post:{instance.post_id}"])
+
+
+@receiver([post_save, post_delete], sender=Comment)
+@receiver([post_save, post_delete], sender=CommentVote)
+def flush_comment_tree_cache_on_comment_change(sender, instance, **kwargs):
+    flush_comment_tree_cache(instance.post_id)
+
+
+@receiver(post_save, sender=Post)
+def flush_comment_tree_cache_on_post_change(sender, instance, **kwargs):
+    # author hats, is_commentable and links are a part of the thread HTML
+    flush_comment_tree_cache(instance.id)
+
+
+@receiver(post_save, sender=PostVote)
+def increment_post_feed_score(sender, instance, created=False, **kwargs):
+    if created:
+        materialized_feed.increment_score(instance.post_id, ORDERING_TOP, 1)
+
+
+@receiver(post_delete, sender=PostVote)
+def decrement_post_feed_score(sender, instance, **kwargs):
+    materialized_feed.increment_score(instance.post_id, ORDERING_TOP, -1)
+
+
+@receiver([post_save, post_delete], sender=UserMuted)
+def flush_feed_filter_profile_on_user_mute(sender, instance, **kwargs):
+    clear_feed_filter_profile_cache(instance.user_from_id)
+
+
+@receiver([post_save, post_delete], sender=UserMuted)
+@receiver([post_save, post_delete], sender=UserNote)
+def flush_viewer_relations_on_change(sender, instance, **kwargs):
+    clear_viewer_relations_cache(instance.user_from_id)
+
+
+@receiver([post_save, post_delete], sender=RoomMuted)
+@receiver([post_save, post_delete], sender=RoomSubscription)
+def flush_feed_filter_profile_on_room_change(sender, instance, **kwargs):
+    clear_feed_filter_profile_cache(instance.user_id)
+
+
+@receiver(post_save, sender=Comment)
+def increment_post_comment_sequence(sender, instance, created=False, **kwargs):
+    # viewers aren't touched, unread comments are counted from the sequence, see posts/viewer_state.py
+    if created:
+        instance.post.increment_comment_sequence()
+
+
+@receiver(post_init, sender=Comment)
+def remember_comment_hotness_state(sender, instance, **kwargs):
+    hotness.remember_comment_state(instance)
+
+
+@receiver(post_save, sender=Comment)
+def update_post_hotness(sender, instance, created=False, update_fields=None, **kwargs):
+    hotness.comment_saved(instance, created=created, update_fields=update_fields)
+
+
+@receiver(post_delete, sender=Comment)
+def recalculate_post_hotness(sender, instance, **kwargs):
+    if instance.created_at > datetime.utcnow() - settings.POST_HOTNESS_PERIOD:
+        hotness.recalculate_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def track_post_rate_limits(sender, instance, **kwargs):
+    track_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def track_comment_rate_limits(sender, instance, **kwargs):
+    comment_rate_limits.track_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def untrack_comment_rate_limits(sender, instance, **kwargs):
+    comment_rate_limits.track_comment(instance, is_deleted=True)
+
+
+@receiver(post_init, sender=Comment)
+def remember_comment_counted_state(sender, instance, **kwargs):
+    counters.remember_comment_state(instance)
+
+
+@receiver(post_save, sender=Comment)
+def update_comment_counters(sender, instance, created=False, **kwargs):
+    counters.comment_saved(instance, created=created)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_counters(sender, instance, **kwargs):
+    counters.comment_deleted(instance)
+
+
+@receiver(post_save, sender=Post)
+def update_post_counters(sender, instance, created=False, update_fields=None, **kwargs):
+    counters.post_saved(instance, created=created, update_fields=update_fields)
+
+
+@receiver(post_delete, sender=Post)
+def decrement_post_counters(sender, instance, **kwargs):
+    counters.post_deleted(instance)
+
+
+@receiver(post_save, sender=UserBadge)
+def increment_badge_counters(sender, instance, created=False, **kwargs):
+    counters.badge_saved(instance, created=created)
+
+
+@receiver(post_delete, sender=UserBadge)
+def decrement_badge_counters(sender, instance, **kwargs):
+    counters.badge_deleted(instance)
@@ -1,10 +1,18 @@
 from django import template
 
+from common.pagination import CursorPage
+
 register = template.Library()
 
 
 @register.inclusion_tag("common/paginator.html")
 def paginator(items):
+    if isinstance(items, CursorPage):
+        return {
+            "items": items,
+            "is_cursor_page": True,
+        }
+
     adjacent_pages = 4
     num_pages = items.paginator.num_pages
     page = items.number
@@ -10,9 +10,10 @@ from django.utils.safestring import mark_safe
 
 from common.embeds import CUSTOM_ICONS, CUSTOM_PARSERS
 from common.regexp import FAVICON_RE
-from common.markdown.markdown import markdown_text, markdown_plain, markdown_tg
+from common.markdown.markdown import markdown_plain, markdown_tg
 from posts.helpers import extract_any_image
 from posts.models.post import Post
+from posts.prerender import render_html, store_html
 
 register = template.Library()
 
@@ -38,11 +39,11 @@ def render_post(context, post):
         return post.html
 
     if not post.html or settings.DEBUG:
-        new_html = markdown_text(post.text, uniq_id=post.id)
+        # normally it's rendered on save (see posts/prerender.py), this is the fallback if the task is late
+        new_html = render_html(post)
         if new_html != post.html:
-            # to not flood into history
             post.html = new_html
-            post.save(update_fields=["html", "updated_at"])
+            store_html(Post, [(post.id, post.text, new_html)])
 
     return mark_safe(post.html or "")
 
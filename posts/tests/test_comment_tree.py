@@ -0,0 +1,96 @@
+import json
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, Client
+
+from comments.models import Comment, CommentVote
+from debug.utils_for_tests import create_approved_user, login
+from posts.models.post import Post
+from users.models.mute import UserMuted
+
+
+@patch("club.features.COMMENT_TREE_CACHE", True)
+class TestCommentTreeCache(TestCase):
+    def setUp(self):
+        cache.delete_pattern("comment_tree:*")
+        self.author = create_approved_user("tree_author")
+        self.reader = create_approved_user("tree_reader")
+        self.post = Post.objects.create(
+            slug="tree-post",
+            title="Post with comments",
+            text="text",
+            type=Post.TYPE_POST,
+            author=self.author,
+            visibility=Post.VISIBILITY_EVERYWHERE,
+            moderation_status=Post.MODERATION_APPROVED,
+            published_at=datetime.utcnow() - timedelta(hours=1),
+        )
+        self.comment = Comment.objects.create(post=self.post, author=self.author, text="first comment")
+        self.post_url = f"/{self.post.type}/{self.post.slug}/"
+
+    def tearDown(self):
+        cache.delete_pattern("comment_tree:*")
+
+    def _client(self, user):
+        client = Client()
+        login(client, user)
+        return client
+
+    def _overlay(self, response):
+        html = response.content.decode()
+        start = html.index('<script id="comments-viewer-state" type="application/json">')
+        return json.loads(html[html.index(">", start) + 1:html.index("</script>", start)])
+
+    def test_tree_is_rendered_once_for_all_members(self):
+        self.assertEqual(self._client(self.reader).get(self.post_url).status_code, 200)
+
+        with patch("posts.renderers._load_comments") as load_comments:
+            response = self._client(self.author).get(self.post_url)
+
+        load_comments.assert_not_called()
+        self.assertContains(response, "first comment")
+
+    def test_personal_state_is_not_in_cached_html(self):
+        CommentVote.objects.create(user=self.reader, post=self.post, comment=self.comment)
+        response = self._client(self.reader).get(self.post_url)
+
+        self.assertNotContains(response, "initial-is-voted")
+        self.assertContains(response, 'data-viewer-action="edit" hidden')
+        self.assertIn(str(self.comment.id), self._overlay(response)["upvotes"])
+
+    def test_overlay_has_mutes_and_notes(self):
+        UserMuted.objects.create(user_from=self.reader, user_to=self.author)
+
+        overlay = self._overlay(self._client(self.reader).get(self.post_url))
+
+        self.assertEqual(overlay["muted_author_ids"], [str(self.author.id)])
+        self.assertEqual(overlay["me"]["id"], str(self.reader.id))
+        self.assertFalse(overlay["me"]["is_post_author"])
+
+    def test_new_comment_invalidates_tree(self):
+        self._client(self.reader).get(self.post_url)
+
+        Comment.objects.create(post=self.post, author=self.reader, text="second comment")
+
+        self.assertContains(self._client(self.reader).get(self.post_url), "second comment")
+
+    def test_vote_invalidates_tree(self):
+        client = self._client(self.reader)
+        client.get(self.post_url)
+
+        CommentVote.objects.create(user=self.author, post=self.post, comment=self.comment)
+        Comment.objects.filter(id=self.comment.id).update(upvotes=42)
+
+        self.assertContains(client.get(self.post_url), ':initial-upvotes="42"')
+
+    def test_anonymous_tree_has_no_overlay_and_no_buttons(self):
+        self.post.is_public = True
+        self.post.save()
+
+        response = Client().get(self.post_url)
+
+        self.assertContains(response, "first comment")
+        self.assertNotContains(response, "comments-viewer-state")
+        self.assertNotContains(response, "data-viewer-action")
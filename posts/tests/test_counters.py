@@ -0,0 +1,138 @@
+from django.test import TestCase
+
+from badges.models import Badge, UserBadge
+from comments.models import Comment
+from debug.utils_for_tests import create_approved_user
+from posts import counters
+from posts.models.post import Post
+from users.models.counters import UserCounters
+
+
+class TestCounters(TestCase):
+    def setUp(self):
+        self.author = create_approved_user("counters_author")
+        self.coauthor = create_approved_user("counters_coauthor")
+        self.commenter = create_approved_user("counters_commenter")
+        for user in [self.author, self.coauthor, self.commenter]:
+            counters.load_user_counters(user)
+
+        self.post = Post.objects.create(
+            slug="counters-post",
+            title="Counters",
+            text="text",
+            type=Post.TYPE_POST,
+            author=self.author,
+            visibility=Post.VISIBILITY_EVERYWHERE,
+        )
+
+    def assertCountersAreActual(self):
+        self.assertEqual(counters.find_post_drift(), [])
+        self.assertEqual(counters.find_user_drift(), {})
+
+    def _counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_comments_are_counted_incrementally(self):
+        comment = Comment.objects.create(post=self.post, author=self.commenter, text="first")
+        Comment.objects.create(post=self.post, author=self.commenter, text="second")
+
+        self.assertEqual(Post.objects.get(id=self.post.id).comment_count, 2)
+        self.assertEqual(self._counters(self.commenter).comments, 2)
+
+        comment.delete(deleted_by=self.commenter)
+        self.assertEqual(Post.objects.get(id=self.post.id).comment_count, 1)
+        self.assertEqual(self._counters(self.commenter).comments, 1)
+
+        comment.undelete()
+        Comment.objects.get(id=comment.id).save()  # saves without changes don't count twice
+        self.assertEqual(self._counters(self.commenter).comments, 2)
+        self.assertCountersAreActual()
+
+        Comment.objects.filter(id=comment.id).delete()
+        self.assertEqual(Post.objects.get(id=self.post.id).comment_count, 1)
+        self.assertCountersAreActual()
+
+    def test_post_visibility_and_coauthors(self):
+        draft = Post.objects.create(
+            slug="counters-draft",
+            title="Draft",
+            text="text",
+            type=Post.TYPE_POST,
+            author=self.author,
+            visibility=Post.VISIBILITY_DRAFT,
+        )
+        Comment.objects.create(post=draft, author=self.commenter, text="comment under a draft")
+        self.assertEqual(self._counters(self.author).posts, 1)
+        self.assertEqual(self._counters(self.commenter).comments, 0)
+
+        draft.visibility = Post.VISIBILITY_LINK_ONLY
+        draft.save()
+        self.assertEqual(self._counters(self.author).link_only_posts, 1)
+        self.assertEqual(self._counters(self.commenter).comments, 1)
+
+        draft.visibility = Post.VISIBILITY_EVERYWHERE
+        draft.coauthors = [self.coauthor.slug, self.author.slug]
+        draft.save()
+
+        author_counters = self._counters(self.author)
+        self.assertEqual((author_counters.posts, author_counters.link_only_posts), (2, 0))
+        self.assertEqual(self._counters(self.coauthor).posts, 1)
+        self.assertCountersAreActual()
+
+        Post.objects.get(id=draft.id).delete()  # soft delete turns the post back into a draft
+        self.assertEqual(self._counters(self.author).posts, 1)
+        self.assertEqual(self._counters(self.coauthor).posts, 0)
+        self.assertEqual(self._counters(self.commenter).comments, 0)
+
+        Post.objects.filter(id=draft.id).delete()
+        self.assertCountersAreActual()
+
+    def test_link_only_posts_are_shown_to_the_author_only(self):
+        Post.objects.create(
+            slug="counters-link-only",
+            title="Link only",
+            text="text",
+            type=Post.TYPE_POST,
+            author=self.author,
+            visibility=Post.VISIBILITY_LINK_ONLY,
+        )
+
+        author_counters = self._counters(self.author)
+        self.assertEqual(author_counters.posts_for_viewer(self.author), 2)
+        self.assertEqual(author_counters.posts_for_viewer(self.commenter), 1)
+        self.assertEqual(author_counters.posts_for_viewer(None), 1)
+
+    def test_badges(self):
+        badge = Badge.objects.create(code="counters_badge", title="Badge")
+        user_badge = UserBadge.objects.create(
+            badge=badge, from_user=self.commenter, to_user=self.author, post=self.post,
+        )
+
+        self.assertEqual(self._counters(self.author).badges, {"counters_badge": 1})
+        self.assertEqual(UserBadge.user_badges_grouped(self.author, counts=self._counters(self.author).badges), {
+            "counters_badge": {"title": "Badge", "description": None, "count": 1},
+        })
+
+        user_badge.delete()
+        self.assertEqual(UserBadge.user_badges_grouped(self.author, counts=self._counters(self.author).badges), {})
+        self.assertCountersAreActual()
+
+    def test_verifier_fixes_drift(self):
+        Comment.objects.create(post=self.post, author=self.commenter, text="comment")
+        Post.objects.filter(id=self.post.id).update(comment_count=10)
+        UserCounters.objects.filter(user=self.commenter).update(comments=10)
+
+        self.assertEqual(counters.find_post_drift(), [(self.post.id, 10, 1)])
+        self.assertEqual(counters.find_user_drift(), {self.commenter.id: {"comments": (10, 1)}})
+
+        counters.fix_post_drift([self.post.id])
+        counters.recalculate_user_counters([self.commenter.id])
+        self.assertCountersAreActual()
+
+    def test_counters_are_calculated_on_first_read(self):
+        UserCounters.objects.filter(user=self.author).delete()
+        Comment.objects.create(post=self.post, author=self.author, text="comment")
+
+        author_counters = counters.load_user_counters(self.author)
+
+        self.assertEqual((author_counters.posts, author_counters.comments), (1, 1))
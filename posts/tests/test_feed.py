@@ -3,8 +3,10 @@ from datetime import datetime, timedelta
 from django.test import TestCase, Client
 
 from authn.models.session import Session
+from posts.feed_filters import FeedFilterProfile
 from posts.models.post import Post
 from rooms.models import Room, RoomMuted, RoomSubscription
+from users.models.mute import UserMuted
 from users.models.user import User
 
 
@@ -251,3 +253,53 @@ class TestFeedSortingAndVisibility(TestCase):
 
         self.assertIn(other_pending.id, pending_ids)
         self.assertNotIn(own_pending.id, pending_ids)
+
+
+class TestFeedFilterProfile(TestCase):
+    def setUp(self):
+        self.user = _create_user("tfilter_user")
+        self.other = _create_user("tfilter_other")
+        self.room = _create_room("tfilter-room")
+        self.client = Client()
+        _login(self.client, self.user)
+
+    def test_profile_is_cached_and_flushed_on_changes(self):
+        self.assertEqual(FeedFilterProfile.for_user(self.user), FeedFilterProfile())
+
+        UserMuted.objects.create(user_from=self.user, user_to=self.other)
+        RoomMuted.objects.create(user=self.user, room=self.room)
+        RoomSubscription.objects.create(user=self.user, room=self.room)
+
+        with self.assertNumQueries(3):
+            profile = FeedFilterProfile.for_user(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(FeedFilterProfile.for_user(self.user), profile)
+
+        self.assertEqual(profile.muted_user_ids, {self.other.id})
+        self.assertEqual(profile.muted_room_slugs, {self.room.slug})
+        self.assertEqual(profile.subscribed_room_slugs, {self.room.slug})
+
+        UserMuted.unmute(user_from=self.user, user_to=self.other)
+        self.assertEqual(FeedFilterProfile.for_user(self.user).muted_user_ids, set())
+
+    def test_muted_author_hidden_after_mute(self):
+        post = _create_post("tfilter_post", self.other)
+        self.assertIn(post.id, [p.id for p in self.client.get("/").context["posts"]])
+
+        UserMuted.objects.create(user_from=self.user, user_to=self.other)
+
+        self.assertNotIn(post.id, [p.id for p in self.client.get("/").context["posts"]])
+
+    def test_allows_matches_apply(self):
+        posts = [
+            _create_post("tfilter_regular", self.other),
+            _create_post("tfilter_room", self.user, room=self.room),
+            _create_post("tfilter_room_only", self.user, room=self.room, is_room_only=True),
+        ]
+        profile = FeedFilterProfile(muted_room_slugs={self.room.slug})
+
+        for room, label_code, ordering in [(None, None, "activity"), (self.room, None, "new"), (None, "ama", "top")]:
+            queryset = Post.objects.filter(id__in=[post.id for post in posts])
+            expected = set(profile.apply(queryset, room, label_code, ordering).values_list("id", flat=True))
+            actual = {post.id for post in posts if profile.allows(post, room, label_code, ordering)}
+            self.assertEqual(actual, expected)
@@ -0,0 +1,60 @@
+from django.test import TestCase
+
+from comments.models import Comment
+from common.history import history_stats
+from debug.utils_for_tests import create_approved_user
+from posts.models.post import Post
+
+
+class TestChangeAwareHistory(TestCase):
+    def setUp(self):
+        self.author = create_approved_user("history_author")
+        self.post = Post.objects.create(
+            slug="history-post",
+            title="History",
+            text="text",
+            type=Post.TYPE_POST,
+            author=self.author,
+            visibility=Post.VISIBILITY_EVERYWHERE,
+        )
+
+    def test_saves_without_tracked_changes_are_skipped(self):
+        post = Post.objects.get(id=self.post.id)
+        post.visibility = Post.VISIBILITY_LINK_ONLY
+        post.html = "<p>text</p>"
+        post.save()
+        post.save(update_fields=["comment_count", "last_activity_at", "updated_at"])
+
+        self.assertEqual(post.history.count(), 1)
+
+    def test_tracked_changes_are_recorded(self):
+        post = Post.objects.get(id=self.post.id)
+        post.title = "New title"
+        post.save()
+        post.save()  # the second save has nothing new
+        post.coauthors.append("somebody")  # in-place changes are noticed too
+        post.save()
+
+        self.assertEqual(list(post.history.values_list("title", flat=True)), ["New title", "New title", "History"])
+
+    def test_comment_delete_only_records_deleted_by(self):
+        comment = Comment.objects.create(post=self.post, author=self.author, text="comment")
+        comment.is_pinned = True
+        comment.save()
+
+        comment.delete(deleted_by=self.author)
+        comment.undelete()
+
+        self.assertEqual(comment.history.count(), 3)
+
+    def test_stats(self):
+        post = Post.objects.get(id=self.post.id)
+        post.save()
+        post.title = "New title"
+        post.save()
+
+        date, table_name, written, skipped = history_stats([Post._meta.db_table], days=1)[0]
+
+        self.assertEqual(table_name, "posts")
+        self.assertGreaterEqual(written, 2)
+        self.assertGreaterEqual(skipped, 1)
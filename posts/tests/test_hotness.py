@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import TestCase
+
+from comments.models import Comment
+from debug.utils_for_tests import create_approved_user
+from posts import hotness
+from posts.models.post import Post
+
+
+class TestHotness(TestCase):
+    def setUp(self):
+        self.author = create_approved_user("hot_author")
+        self.commenters = [create_approved_user(f"hot_commenter_{i}") for i in range(3)]
+        self.post = Post.objects.create(
+            slug="hot-post",
+            title="Hot post",
+            text="text",
+            type=Post.TYPE_POST,
+            author=self.author,
+            visibility=Post.VISIBILITY_EVERYWHERE,
+            published_at=datetime.utcnow(),
+        )
+
+    def _comment(self, author, **kwargs):
+        return Comment.objects.create(post=self.post, author=author, text="comment", **kwargs)
+
+    def _hotness(self):
+        return Post.objects.values_list("hotness", flat=True).get(id=self.post.id)
+
+    def test_first_comment_sets_its_score(self):
+        comment = self._comment(self.commenters[0])
+
+        self.assertAlmostEqual(self._hotness(), hotness.comment_score(comment.created_at), places=6)
+        self.assertAlmostEqual(hotness.decayed_hotness(self._hotness()), 1.0, places=2)
+
+    def test_more_commenters_make_post_hotter(self):
+        self._comment(self.commenters[0])
+        one_commenter = self._hotness()
+        self._comment(self.commenters[1])
+
+        self.assertGreater(self._hotness(), one_commenter)
+        self.assertAlmostEqual(hotness.decayed_hotness(self._hotness()), 2.0, places=2)
+
+    def test_repeat_commenter_counts_once(self):
+        self._comment(self.commenters[0])
+        self._comment(self.commenters[0])
+
+        self.assertAlmostEqual(hotness.decayed_hotness(self._hotness()), 1.0, places=2)
+
+    def test_fresh_comment_beats_older_discussion(self):
+        old_post = Post.objects.create(
+            slug="hot-post-old",
+            title="Old discussion",
+            text="text",
+            type=Post.TYPE_POST,
+            author=self.author,
+            visibility=Post.VISIBILITY_EVERYWHERE,
+            published_at=datetime.utcnow(),
+        )
+        for commenter in self.commenters[:2]:
+            Comment.objects.create(post=old_post, author=commenter, text="old comment")
+        Comment.objects.filter(post=old_post).update(created_at=datetime.utcnow() - timedelta(days=3))
+        hotness.reconcile_hotness()
+
+        self._comment(self.commenters[2])
+
+        hot_ids = list(Post.objects.order_by("-hotness").values_list("id", flat=True)[:2])
+        self.assertEqual(hot_ids, [self.post.id, old_post.id])
+
+    def test_deleted_comment_is_subtracted(self):
+        comment = self._comment(self.commenters[0])
+        comment.is_deleted = True
+        comment.save()
+
+        self.assertEqual(self._hotness(), 0)
+
+    def test_edits_and_pins_dont_recalculate(self):
+        comment = self._comment(self.commenters[0])
+
+        with patch("posts.hotness.recalculate_post") as recalculate_post:
+            comment.text = "edited"
+            comment.save()
+            comment.is_pinned = True
+            comment.save(update_fields=["is_pinned"])
+            Comment.objects.get(id=comment.id).save()
+
+        recalculate_post.assert_not_called()
+
+    def test_reconcile_agrees_with_incremental_updates(self):
+        for commenter in self.commenters:
+            self._comment(commenter)
+
+        self.assertEqual(hotness.reconcile_hotness(), {})
+
+    def test_reconcile_resets_expired_posts(self):
+        comment = self._comment(self.commenters[0])
+        Comment.objects.filter(id=comment.id).update(
+            created_at=datetime.utcnow() - settings.POST_HOTNESS_PERIOD - timedelta(hours=1)
+        )
+
+        changed = hotness.reconcile_hotness()
+
+        self.assertEqual(changed, {self.post.id: 0.0})
+        self.assertEqual(self._hotness(), 0)
@@ -0,0 +1,168 @@
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, Client, RequestFactory
+
+from comments.models import Comment
+from debug.utils_for_tests import create_approved_user, login
+from posts import materialized_feed
+from posts.helpers import ORDERING_ACTIVITY, ORDERING_HOT, ORDERING_NEW, ORDERING_TOP, ORDERING_TOP_WEEK
+from posts.models.post import Post
+from posts.models.votes import PostVote
+from users.models.mute import UserMuted
+
+
+@patch("club.features.MATERIALIZED_FEED", True)
+class TestMaterializedFeed(TestCase):
+    def setUp(self):
+        self._cleanup_redis()
+        self.author = create_approved_user("mfeed_author")
+        self.reader = create_approved_user("mfeed_reader")
+        self.client = Client()
+        login(self.client, self.reader)
+
+    def tearDown(self):
+        self._cleanup_redis()
+
+    def _cleanup_redis(self):
+        redis = materialized_feed.redis_client()
+        keys = list(redis.scan_iter(match=f"{materialized_feed.KEY_PREFIX}:*"))
+        if keys:
+            redis.delete(*keys)
+
+    def _create_post(self, slug, **kwargs):
+        defaults = dict(
+            title=slug,
+            text=f"{slug} text",
+            type=Post.TYPE_POST,
+            author=self.author,
+            visibility=Post.VISIBILITY_EVERYWHERE,
+            published_at=datetime.utcnow(),
+        )
+        defaults.update(kwargs)
+        return Post.objects.create(slug=slug, **defaults)
+
+    def _ranked(self, ordering, **kwargs):
+        return list(materialized_feed.ranked_ids(ordering, **kwargs))
+
+    def test_saved_post_goes_into_all_its_slices(self):
+        post = self._create_post("mfeed-post", label_code="ama")
+
+        self.assertIn(str(post.id), self._ranked(ORDERING_ACTIVITY))
+        self.assertIn(str(post.id), self._ranked(ORDERING_ACTIVITY, post_type=Post.TYPE_POST))
+        self.assertIn(str(post.id), self._ranked(ORDERING_ACTIVITY, label_code="ama"))
+        self.assertNotIn(str(post.id), self._ranked(ORDERING_ACTIVITY, post_type=Post.TYPE_QUESTION))
+
+    def test_unpublished_post_is_removed_from_slices(self):
+        post = self._create_post("mfeed-unpublished", label_code="ama")
+        post.unpublish()
+
+        self.assertNotIn(str(post.id), self._ranked(ORDERING_ACTIVITY))
+        self.assertNotIn(str(post.id), self._ranked(ORDERING_ACTIVITY, label_code="ama"))
+
+    def test_votes_change_top_score(self):
+        first = self._create_post("mfeed-first")
+        second = self._create_post("mfeed-second")
+        PostVote.upvote(user=self.reader, post=second)
+
+        self.assertEqual(self._ranked(ORDERING_TOP)[0], str(second.id))
+        self.assertEqual(self._ranked(ORDERING_TOP_WEEK), [str(second.id), str(first.id)])
+
+    def test_rebuild_puts_commented_post_into_hot_slices(self):
+        post = self._create_post("mfeed-hot", label_code="ama")
+        Comment.objects.create(post=post, author=self.reader, text="comment")
+
+        materialized_feed.rebuild(Post.objects.filter(id=post.id))  # loaded from the db, hotness is a float
+
+        hotness = Post.objects.values_list("hotness", flat=True).get(id=post.id)
+        self.assertGreater(hotness, 0)
+        for slice_args in [{}, {"label_code": "ama"}]:
+            self.assertEqual(self._ranked(ORDERING_HOT, **slice_args), [str(post.id)])
+            key = materialized_feed.slice_key(ORDERING_HOT, **slice_args)
+            self.assertAlmostEqual(materialized_feed.redis_client().zscore(key, str(post.id)), hotness, places=6)
+
+    def test_rebuild_command(self):
+        post = self._create_post("mfeed-rebuild")
+        self._cleanup_redis()
+
+        call_command("rebuild_feed_index", stdout=StringIO())
+
+        self.assertIn(str(post.id), self._ranked(ORDERING_ACTIVITY))
+
+    def test_slices_match_sql(self):
+        for i in range(5):
+            self._create_post(f"mfeed-sql-{i}", upvotes=i % 2, hotness=i)
+
+        for ordering in materialized_feed.STORED_ORDERINGS:
+            missing, extra, misplaced = materialized_feed.check_slice(ordering)
+            self.assertEqual((missing, extra, misplaced), (set(), set(), []), ordering)
+
+    def test_posts_published_at_the_same_time_are_ordered_like_in_sql(self):
+        published_at = datetime.utcnow()
+        for i in range(3):
+            self._create_post(f"mfeed-tie-{i}", published_at=published_at, created_at=published_at - timedelta(days=i))
+
+        self.assertEqual(materialized_feed.check_slice(ORDERING_NEW), (set(), set(), []))
+
+    def test_feed_view_uses_redis_and_applies_mutes(self):
+        visible = self._create_post("mfeed-visible")
+        muted_author = create_approved_user("mfeed_muted")
+        muted = self._create_post("mfeed-muted", author=muted_author)
+        UserMuted.objects.create(user_from=self.reader, user_to=muted_author)
+        materialized_feed.redis_client().set(materialized_feed.READY_KEY, "1")
+
+        with patch("posts.views.feed.paginate_by_cursor") as sql_paginate:
+            response = self.client.get("/")
+            sql_paginate.assert_not_called()
+
+        feed_ids = [post.id for post in response.context["posts"]]
+        self.assertIn(visible.id, feed_ids)
+        self.assertNotIn(muted.id, feed_ids)
+
+    def test_feed_view_falls_back_to_sql_before_rebuild(self):
+        post = self._create_post("mfeed-not-ready")
+
+        response = self.client.get("/")
+
+        self.assertIn(post.id, [p.id for p in response.context["posts"]])
+
+    def test_cursor_walks_through_redis_pages(self):
+        posts = [
+            self._create_post(f"mfeed-page-{i}", last_activity_at=datetime.utcnow() - timedelta(minutes=i))
+            for i in range(5)
+        ]
+        expected = materialized_feed.sql_ranked_ids(ORDERING_ACTIVITY)
+        materialized_feed.redis_client().set(materialized_feed.READY_KEY, "1")
+
+        first_request = RequestFactory().get("/")
+        first_request.me = self.reader
+        first = materialized_feed.materialized_feed_page(first_request, "all", None, None, ORDERING_ACTIVITY, None, 2)
+
+        second_request = RequestFactory().get("/", {"cursor": first.next_cursor})
+        second_request.me = self.reader
+        second = materialized_feed.materialized_feed_page(second_request, "all", None, None, ORDERING_ACTIVITY, None, 2)
+
+        self.assertEqual(len(posts), 5)
+        self.assertEqual([str(p.id) for p in list(first) + list(second)], expected[:4])
+
+    def test_link_only_author_flag_is_cached_and_flushed(self):
+        materialized_feed.clear_link_only_author_cache(self.author.id)
+        self.assertFalse(materialized_feed.has_link_only_posts(self.author))
+
+        post = self._create_post("mfeed-link-only", visibility=Post.VISIBILITY_LINK_ONLY)
+        self.assertTrue(materialized_feed.has_link_only_posts(self.author))
+
+        with self.assertNumQueries(0):
+            materialized_feed.has_link_only_posts(self.author)
+
+        post.visibility = Post.VISIBILITY_EVERYWHERE
+        post.save()
+        self.assertFalse(materialized_feed.has_link_only_posts(self.author))
+
+    def test_deleted_post_visible_in_sql_stays_in_slices(self):
+        post = self._create_post("mfeed-deleted-everywhere", deleted_at=datetime.utcnow())
+
+        self.assertIn(str(post.id), self._ranked(ORDERING_ACTIVITY))
+        self.assertEqual(materialized_feed.check_slice(ORDERING_ACTIVITY), (set(), set(), []))
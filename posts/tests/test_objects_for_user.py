@@ -2,10 +2,12 @@ from datetime import datetime, timedelta
 
 from django.test import TestCase
 
+from bookmarks.models import PostBookmark
 from comments.models import Comment, CommentVote
 from posts.models.post import Post
 from posts.models.votes import PostVote
 from posts.models.views import PostView
+from posts.viewer_state import attach_post_viewer_state, attach_comment_viewer_state
 from users.models.user import User
 
 
@@ -54,31 +56,81 @@ class TestPostObjectsForUser(TestCase):
         self.user = self.creator.create_user()
         self.post = self.creator.create_post()
 
+    def _load(self, user):
+        post = Post.objects_for_user(user).get(id=self.post.id)
+        attach_post_viewer_state([post], user)
+        return post
+
     def test_upvoted_at_is_epoch_ms_for_voted_post(self):
         vote = PostVote.objects.create(user=self.user, post=self.post)
 
-        post = Post.objects_for_user(self.user).get(id=self.post.id)
+        post = self._load(self.user)
 
         expected_ms = round(vote.created_at.timestamp() * 1000)
         self.assertIsNotNone(post.upvoted_at)
         self.assertAlmostEqual(post.upvoted_at, expected_ms, delta=1000)
 
     def test_upvoted_at_none_for_unvoted_post(self):
-        post = Post.objects_for_user(self.user).get(id=self.post.id)
+        post = self._load(self.user)
 
         self.assertIsNone(post.upvoted_at)
 
     def test_unread_comments(self):
-        PostView.objects.create(user=self.user, post=self.post, unread_comments=5)
+        PostView.register_view(request=None, user=self.user, post=self.post)
+        for _ in range(5):
+            self.creator.create_comment(self.post)
 
-        post = Post.objects_for_user(self.user).get(id=self.post.id)
+        post = self._load(self.user)
 
+        self.assertEqual(post.comment_sequence, 5)
         self.assertEqual(post.unread_comments, 5)
 
+    def test_new_comments_do_not_touch_views(self):
+        post_view, _ = PostView.register_view(request=None, user=self.user, post=self.post)
+
+        self.creator.create_comment(self.post)
+
+        self.assertEqual(PostView.objects.get(id=post_view.id).last_view_at, post_view.last_view_at)
+
+    def test_deleted_comments_are_not_unread(self):
+        PostView.register_view(request=None, user=self.user, post=self.post)
+        comment = self.creator.create_comment(self.post)
+        self.creator.create_comment(self.post)
+
+        comment.delete(deleted_by=self.user)
+        self.assertEqual(self._load(self.user).unread_comments, 1)
+
+        comment.undelete()
+        self.assertEqual(self._load(self.user).unread_comments, 2)
+
+    def test_view_marks_comments_as_read(self):
+        PostView.register_view(request=None, user=self.user, post=self.post)
+        self.creator.create_comment(self.post)
+
+        PostView.register_view(request=None, user=self.user, post=Post.objects.get(id=self.post.id))
+
+        self.assertEqual(self._load(self.user).unread_comments, 0)
+
     def test_unread_comments_none_without_view(self):
-        post = Post.objects_for_user(self.user).get(id=self.post.id)
+        post = self._load(self.user)
+
+        self.assertIsNone(post.unread_comments)
 
+    def test_is_bookmarked(self):
+        PostBookmark.objects.create(user=self.user, post=self.post)
+
+        self.assertTrue(self._load(self.user).is_bookmarked)
+        self.assertFalse(self._load(self.creator.create_user()).is_bookmarked)
+
+    def test_anonymous_viewer_state_without_queries(self):
+        post = Post.objects_for_user(None).get(id=self.post.id)
+
+        with self.assertNumQueries(0):
+            attach_post_viewer_state([post], None)
+
+        self.assertIsNone(post.upvoted_at)
         self.assertIsNone(post.unread_comments)
+        self.assertFalse(post.is_bookmarked)
 
     def test_returns_visible_objects_for_none_user(self):
         draft = self.creator.create_post()
@@ -89,13 +141,27 @@ class TestPostObjectsForUser(TestCase):
         self.assertIn(self.post.id, ids)
         self.assertNotIn(draft.id, ids)
 
-    def test_executes_in_single_query(self):
-        PostVote.objects.create(user=self.user, post=self.post)
-        PostView.objects.create(user=self.user, post=self.post, unread_comments=3)
-
+    def test_page_query_has_no_viewer_subqueries(self):
         with self.assertNumQueries(1):
             list(Post.objects_for_user(self.user).filter(id=self.post.id))
 
+        sql = str(Post.objects_for_user(self.user).query)
+        self.assertNotIn("post_views", sql)
+        self.assertNotIn("post_votes", sql)
+
+    def test_one_query_per_relation_for_whole_page(self):
+        posts = [self.post] + [self.creator.create_post() for _ in range(5)]
+        for post in posts:
+            PostVote.objects.create(user=self.user, post=post)
+            PostView.objects.create(user=self.user, post=post)
+        Post.objects.filter(id__in=[post.id for post in posts]).update(comment_sequence=3)
+
+        page = list(Post.objects_for_user(self.user).filter(id__in=[post.id for post in posts]))
+        with self.assertNumQueries(3):
+            attach_post_viewer_state(page, self.user)
+
+        self.assertTrue(all(post.upvoted_at and post.unread_comments == 3 for post in page))
+
 
 class TestCommentObjectsForUser(TestCase):
     def setUp(self):
@@ -104,19 +170,24 @@ class TestCommentObjectsForUser(TestCase):
         self.post = self.creator.create_post()
         self.comment = self.creator.create_comment(post=self.post)
 
+    def _load(self, user):
+        comment = Comment.objects_for_user(user).get(id=self.comment.id)
+        attach_comment_viewer_state([comment], user)
+        return comment
+
     def test_upvoted_at_is_epoch_ms_for_voted_comment(self):
         vote = CommentVote.objects.create(
             user=self.user, comment=self.comment, post=self.post
         )
 
-        comment = Comment.objects_for_user(self.user).get(id=self.comment.id)
+        comment = self._load(self.user)
 
         expected_ms = round(vote.created_at.timestamp() * 1000)
         self.assertIsNotNone(comment.upvoted_at)
         self.assertAlmostEqual(comment.upvoted_at, expected_ms, delta=1000)
 
     def test_upvoted_at_none_for_unvoted_comment(self):
-        comment = Comment.objects_for_user(self.user).get(id=self.comment.id)
+        comment = self._load(self.user)
 
         self.assertIsNone(comment.upvoted_at)
 
@@ -124,6 +195,7 @@ class TestCommentObjectsForUser(TestCase):
         CommentVote.objects.create(
             user=self.user, comment=self.comment, post=self.post
         )
+        comments = list(Comment.objects_for_user(self.user).filter(id=self.comment.id))
 
         with self.assertNumQueries(1):
-            list(Comment.objects_for_user(self.user).filter(id=self.comment.id))
+            attach_comment_viewer_state(comments, self.user)
@@ -0,0 +1,81 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from comments.models import Comment
+from common.markdown.cache import RENDERER_VERSION
+from debug.utils_for_tests import create_approved_user
+from posts import prerender
+from posts.models.post import Post
+
+
+def run_task_in_place(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+class TestPrerender(TestCase):
+    def setUp(self):
+        self.author = create_approved_user("prerender_author")
+        self.post = Post.objects.create(
+            slug="prerender-post",
+            title="Prerender",
+            text="Hello **world**",
+            type=Post.TYPE_POST,
+            author=self.author,
+            visibility=Post.VISIBILITY_EVERYWHERE,
+        )
+
+    def _post(self):
+        return Post.objects.get(id=self.post.id)
+
+    @patch("posts.prerender.async_task", run_task_in_place)
+    def test_post_is_rendered_on_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.text = "New **text**"
+            self.post.html = None
+            self.post.save()
+
+        post = self._post()
+        self.assertIn("<strong>text</strong>", post.html)
+        self.assertEqual(post.html_version, RENDERER_VERSION)
+
+    @patch("posts.prerender.async_task", run_task_in_place)
+    def test_comment_is_rendered_on_create(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            comment = Comment.objects.create(post=self.post, author=self.author, text="**bold**")
+
+        self.assertIn("<strong>bold</strong>", Comment.objects.get(id=comment.id).html)
+
+    @patch("posts.prerender.async_task", side_effect=ConnectionError("redis is down"))
+    def test_renders_in_place_if_queue_is_down(self, async_task):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.html = None
+            self.post.save()
+
+        async_task.assert_called_once()
+        self.assertIn("<strong>world</strong>", self._post().html)
+
+    def test_does_not_overwrite_edited_text(self):
+        stale_render = [(self.post.id, "Hello **world**", "<p>stale</p>")]
+        Post.objects.filter(id=self.post.id).update(text="Edited")
+
+        self.assertEqual(prerender.store_html(Post, stale_render), 0)
+        self.assertIsNone(self._post().html)
+
+    def test_weekly_digest_is_never_rendered(self):
+        self.post.type = Post.TYPE_WEEKLY_DIGEST
+        self.assertFalse(prerender.needs_render(self.post))
+        self.assertFalse(prerender.needs_render(Post(text="text", html="<p>text</p>")))
+
+    def test_rerender_command_updates_old_versions(self):
+        Post.objects.filter(id=self.post.id).update(html="<p>old</p>", html_version=RENDERER_VERSION - 1)
+        comment = Comment.objects.create(post=self.post, author=self.author, text="comment")
+        Comment.objects.filter(id=comment.id).update(html="<p>current</p>", html_version=RENDERER_VERSION)
+
+        call_command("rerender_markdown", workers=1, stdout=StringIO())
+
+        self.assertIn("<strong>world</strong>", self._post().html)
+        self.assertEqual(self._post().html_version, RENDERER_VERSION)
+        self.assertEqual(Comment.objects.get(id=comment.id).html, "<p>current</p>")
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, Client
+
+from debug.utils_for_tests import create_approved_user, login
+from posts.cache import response_cache_stats
+from posts.models.post import Post
+
+
+@patch("club.features.ANONYMOUS_RESPONSE_CACHE", True)
+class TestAnonymousResponseCache(TestCase):
+    def setUp(self):
+        cache.delete_pattern("response_cache:*")
+        self.author = create_approved_user("rcache_author")
+        self.post = Post.objects.create(
+            slug="rcache-post",
+            title="Cached post",
+            text="text",
+            type=Post.TYPE_POST,
+            author=self.author,
+            visibility=Post.VISIBILITY_EVERYWHERE,
+            moderation_status=Post.MODERATION_APPROVED,
+            is_public=True,
+            published_at=datetime.utcnow() - timedelta(hours=1),
+        )
+        self.client = Client()
+
+    def tearDown(self):
+        cache.delete_pattern("response_cache:*")
+
+    def test_second_anonymous_request_is_served_from_cache(self):
+        first = self.client.get("/posts.rss")
+        second = self.client.get("/posts.rss")
+
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first["Content-Type"], second["Content-Type"])
+        self.assertEqual(response_cache_stats()["hits"], 1)
+        self.assertEqual(response_cache_stats()["misses"], 1)
+
+    def test_etag_returns_not_modified(self):
+        first = self.client.get("/feed.json")
+        second = self.client.get("/feed.json", HTTP_IF_NONE_MATCH=first["ETag"])
+
+        self.assertEqual(second.status_code, 304)
+        self.assertTrue(first["Last-Modified"])
+
+    def test_post_change_invalidates_feeds_and_post_page(self):
+        post_url = f"/{self.post.type}/{self.post.slug}/"
+        self.client.get("/posts.rss")
+        self.client.get(post_url)
+
+        self.post.title = "Renamed post"
+        self.post.save()
+
+        rss = self.client.get("/posts.rss")
+        post_page = self.client.get(post_url)
+
+        self.assertEqual(rss["X-Cache"], "MISS")
+        self.assertIn("Renamed post", rss.content.decode())
+        self.assertEqual(post_page["X-Cache"], "MISS")
+
+    def test_other_slices_stay_cached(self):
+        self.client.get("/question/top/feed.json")
+
+        self.post.title = "Renamed post"
+        self.post.save()
+
+        self.assertEqual(self.client.get("/question/top/feed.json")["X-Cache"], "HIT")
+
+    def test_logged_in_users_are_not_cached(self):
+        login(self.client, self.author)
+
+        self.client.get("/posts.rss")
+        response = self.client.get("/posts.rss")
+
+        self.assertNotIn("X-Cache", response)
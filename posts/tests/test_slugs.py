@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+
+from debug.utils_for_tests import create_approved_user
+from posts.models.post import Post
+
+
+def last_sequence_value():
+    with connection.cursor() as cursor:
+        cursor.execute("select last_value from post_slug_seq")
+        return cursor.fetchone()[0]
+
+
+class TestPostSlugs(TestCase):
+    def setUp(self):
+        self.author = create_approved_user("slug_author")
+
+    def _post(self, **kwargs):
+        return Post.objects.create(
+            title="Slugs",
+            text="text",
+            type=Post.TYPE_POST,
+            author=self.author,
+            visibility=Post.VISIBILITY_EVERYWHERE,
+            **kwargs,
+        )
+
+    def test_slugs_are_numeric_and_increasing(self):
+        first = self._post()
+        second = self._post()
+
+        self.assertTrue(first.slug.isdigit())
+        self.assertEqual(int(second.slug), int(first.slug) + 1)
+
+    def test_taken_slugs_are_skipped(self):
+        next_value = last_sequence_value() + 1
+        self._post(slug=str(next_value))
+        self._post(slug=str(next_value + 1))
+
+        self.assertEqual(self._post().slug, str(next_value + 2))
+
+    def test_intro_keeps_user_slug(self):
+        intro = Post.upsert_user_intro(self.author, "intro text")
+
+        self.assertEqual(intro.slug, self.author.slug)
+
+
+class TestConcurrentPostSlugs(TransactionTestCase):
+    THREADS = 10
+    POSTS_PER_THREAD = 5
+
+    def test_parallel_publishing_gets_unique_slugs(self):
+        author = create_approved_user("parallel_slug_author")
+        barrier = Barrier(self.THREADS)
+
+        def publish(thread_number):
+            try:
+                barrier.wait()
+                return [
+                    Post.objects.create(
+                        title=f"Parallel {thread_number}.{i}",
+                        text="text",
+                        type=Post.TYPE_POST,
+                        author=author,
+                        visibility=Post.VISIBILITY_EVERYWHERE,
+                    ).slug
+                    for i in range(self.POSTS_PER_THREAD)
+                ]
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=self.THREADS) as pool:
+            slugs = [slug for thread_slugs in pool.map(publish, range(self.THREADS)) for slug in thread_slugs]
+
+        self.assertEqual(len(slugs), self.THREADS * self.POSTS_PER_THREAD)
+        self.assertEqual(len(set(slugs)), len(slugs))
+        self.assertEqual(Post.objects.filter(author=author).count(), len(slugs))
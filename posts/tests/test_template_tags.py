@@ -49,8 +49,8 @@ class TestRenderPost(TestCase):
         self.post.refresh_from_db()
         self.assertTrue(len(self.post.html) > 0)
 
-    def test_save_uses_update_fields(self):
-        """save() should UPDATE only html and updated_at, not all columns."""
+    def test_stores_only_html(self):
+        """Fallback render should UPDATE only html and its version, without signals and history records."""
         Post.objects.filter(id=self.post.id).update(html="")
         self.post.refresh_from_db()
 
@@ -61,10 +61,11 @@ class TestRenderPost(TestCase):
         with CaptureQueriesContext(connection) as queries:
             render_post(context, self.post)
 
-        update_queries = [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+        update_queries = [q["sql"] for q in queries if q["sql"].lstrip().upper().startswith("UPDATE")]
         self.assertEqual(len(update_queries), 1)
 
         sql = update_queries[0]
         self.assertIn("html", sql)
         self.assertNotIn("title", sql)
         self.assertNotIn('"text"', sql)
+        self.assertEqual(self.post.history.count(), 1)  # only the one from create
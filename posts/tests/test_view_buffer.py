@@ -0,0 +1,94 @@
+from datetime import datetime
+from unittest.mock import patch
+
+from django.test import TestCase, Client, RequestFactory
+
+from comments.models import Comment
+from debug.utils_for_tests import create_approved_user, login
+from posts import view_buffer
+from posts.models.post import Post
+from posts.models.views import PostView
+
+
+@patch("club.features.BUFFERED_POST_VIEWS", True)
+class TestPostViewBuffer(TestCase):
+    def setUp(self):
+        self._cleanup_redis()
+        self.author = create_approved_user("vbuf_author")
+        self.reader = create_approved_user("vbuf_reader")
+        self.post = Post.objects.create(
+            slug="vbuf-post",
+            title="Buffered views",
+            text="text",
+            type=Post.TYPE_POST,
+            author=self.author,
+            visibility=Post.VISIBILITY_EVERYWHERE,
+            published_at=datetime.utcnow(),
+        )
+
+    def tearDown(self):
+        self._cleanup_redis()
+
+    def _cleanup_redis(self):
+        redis = view_buffer.redis_client()
+        keys = list(redis.scan_iter(match=f"{view_buffer.KEY_PREFIX}:*"))
+        if keys:
+            redis.delete(*keys)
+
+    def _view_count(self):
+        return Post.objects.values_list("view_count", flat=True).get(id=self.post.id)
+
+    def test_views_are_written_on_flush(self):
+        view_buffer.register_view(self.reader, self.post)
+
+        self.assertFalse(PostView.objects.filter(user=self.reader, post=self.post).exists())
+        self.assertEqual(self._view_count(), 0)
+
+        self.assertEqual(view_buffer.flush_post_views(), (1, 1))
+
+        self.assertTrue(PostView.objects.filter(user=self.reader, post=self.post).exists())
+        self.assertEqual(self._view_count(), 1)
+
+    def test_repeat_view_within_cooldown_is_not_counted(self):
+        first_last_view_at = view_buffer.register_view(self.reader, self.post)
+        second_last_view_at = view_buffer.register_view(self.reader, self.post)
+        view_buffer.flush_post_views()
+
+        self.assertEqual(self._view_count(), 1)
+        self.assertGreaterEqual(second_last_view_at, first_last_view_at)
+
+    def test_last_view_is_readable_before_flush(self):
+        view_buffer.register_view(self.reader, self.post)
+        comment = Comment.objects.create(post=self.post, author=self.author, text="new comment")
+
+        last_view_at = view_buffer.register_view(self.reader, self.post)
+
+        self.assertLess(last_view_at, comment.created_at)
+
+    def test_unread_comments_after_buffered_view_are_kept(self):
+        view_buffer.register_view(self.reader, self.post)
+        Comment.objects.create(post=self.post, author=self.author, text="written before flush")
+
+        view_buffer.flush_post_views()
+
+        post_view = PostView.objects.get(user=self.reader, post=self.post)
+        self.assertEqual(post_view.seen_comment_sequence, 0)
+        self.assertEqual(Post.objects.get(id=self.post.id).comment_sequence, 1)
+
+    def test_anonymous_views_are_deduplicated_by_ip(self):
+        for ip in ["1.1.1.1", "1.1.1.1", "2.2.2.2"]:
+            view_buffer.register_anonymous_view(RequestFactory().get("/", REMOTE_ADDR=ip), self.post)
+
+        view_buffer.flush_post_views()
+
+        self.assertEqual(self._view_count(), 2)
+        self.assertFalse(PostView.objects.filter(post=self.post, user__isnull=True).exists())
+
+    def test_show_post_does_not_write_views(self):
+        client = Client()
+        login(client, self.reader)
+
+        response = client.get(f"/{self.post.type}/{self.post.slug}/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(PostView.objects.filter(post=self.post).exists())
@@ -0,0 +1,126 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from bookmarks.models import PostBookmark
+from comments.models import Comment, CommentVote
+from debug.helpers import HelperClient
+from debug.utils_for_tests import create_approved_user
+from posts.models.post import Post
+from posts.models.subscriptions import PostSubscription
+from posts.models.votes import PostVote
+from posts.viewer_context import ViewerContext, viewer_relations_cache_key
+from tags.models import Tag, UserTag
+from users.models.mute import UserMuted
+from users.models.notes import UserNote
+
+
+class TestViewerContext(TestCase):
+    def setUp(self):
+        self.me = create_approved_user("viewer_me")
+        self.author = create_approved_user("viewer_author")
+        self.tag = Tag.objects.create(code="viewer_collectible", name="Collectible", group=Tag.GROUP_COLLECTIBLE)
+        self.post = Post.objects.create(
+            type=Post.TYPE_POST,
+            slug="viewer-context-post",
+            title="Viewer context",
+            text="text",
+            author=self.author,
+            visibility=Post.VISIBILITY_EVERYWHERE,
+            collectible_tag_code=self.tag.code,
+        )
+        cache.delete(viewer_relations_cache_key(self.me.id))
+
+    def test_loads_everything_about_viewer(self):
+        comment = Comment.objects.create(post=self.post, author=self.author, text="comment")
+        CommentVote.objects.create(user=self.me, post=self.post, comment=comment)
+        PostVote.objects.create(user=self.me, post=self.post)
+        PostBookmark.objects.create(user=self.me, post=self.post)
+        PostSubscription.subscribe(self.me, self.post)
+        UserTag.objects.create(user=self.me, tag=self.tag, name=self.tag.name)
+        UserMuted.objects.create(user_from=self.me, user_to=self.author)
+        UserNote.objects.create(user_from=self.me, user_to=self.author, text="note")
+
+        viewer = ViewerContext.load(self.me, self.post)
+
+        self.assertTrue(viewer.is_bookmark)
+        self.assertIsNotNone(viewer.upvoted_at)
+        self.assertEqual(viewer.subscription.type, PostSubscription.TYPE_TOP_LEVEL_ONLY)
+        self.assertEqual(viewer.collectible_tag.name, "Collectible")
+        self.assertTrue(viewer.is_collectible_tag_collected)
+        self.assertEqual(viewer.muted_user_ids, [self.author.id])
+        self.assertEqual(viewer.user_notes, {self.author.id: "note"})
+        self.assertEqual(list(viewer.comment_upvotes), [comment.id])
+        self.assertFalse(viewer.is_comment_rate_exceeded)
+
+    def test_nothing_for_fresh_viewer(self):
+        viewer = ViewerContext.load(self.me, self.post)
+
+        self.assertFalse(viewer.is_bookmark)
+        self.assertIsNone(viewer.upvoted_at)
+        self.assertIsNone(viewer.subscription)
+        self.assertFalse(viewer.is_collectible_tag_collected)
+        self.assertEqual(viewer.muted_user_ids, [])
+        self.assertEqual(viewer.user_notes, {})
+        self.assertEqual(viewer.comment_upvotes, {})
+
+    def test_one_query_with_cached_relations(self):
+        with self.assertNumQueries(2):
+            ViewerContext.load(self.me, self.post)
+
+        with self.assertNumQueries(1):
+            ViewerContext.load(self.me, self.post)
+
+    def test_mute_and_note_flush_cached_relations(self):
+        ViewerContext.load(self.me, self.post)
+
+        UserMuted.objects.create(user_from=self.me, user_to=self.author)
+        self.assertEqual(ViewerContext.load(self.me, self.post).muted_user_ids, [self.author.id])
+
+        UserNote.objects.create(user_from=self.me, user_to=self.author, text="note")
+        self.assertEqual(ViewerContext.load(self.me, self.post).user_notes, {self.author.id: "note"})
+
+        UserMuted.objects.filter(user_from=self.me).delete()
+        self.assertEqual(ViewerContext.load(self.me, self.post).muted_user_ids, [])
+
+    def test_anonymous_has_empty_context_without_queries(self):
+        with self.assertNumQueries(0):
+            viewer = ViewerContext.load(None, self.post)
+        self.assertIsNone(viewer.subscription)
+
+
+class TestPostPageQueryCount(TestCase):
+    def setUp(self):
+        self.me = create_approved_user("query_count_me")
+        self.post = Post.objects.create(
+            type=Post.TYPE_POST,
+            slug="query-count-post",
+            title="Query count",
+            text="text",
+            author=self.me,
+            visibility=Post.VISIBILITY_EVERYWHERE,
+        )
+        self.client = HelperClient(self.me).authorise()
+
+    def _add_comments(self, count):
+        for i in range(count):
+            author = create_approved_user(f"query_count_author_{Comment.objects.count()}")
+            comment = Comment.objects.create(post=self.post, author=author, text=f"comment {i}")
+            Comment.objects.create(post=self.post, author=self.me, text=f"reply {i}", reply_to=comment)
+            CommentVote.objects.create(user=self.me, post=self.post, comment=comment)
+            UserNote.objects.create(user_from=self.me, user_to=author, text=f"note {i}")
+        # pretend they were all rendered on save
+        Comment.objects.filter(post=self.post).update(html="<p>comment</p>")
+
+    def _assert_page_queries(self, count):
+        self.client.get(reverse("show_post", args=(self.post.type, self.post.slug)))  # warm up caches
+        with self.assertNumQueries(count):
+            response = self.client.get(reverse("show_post", args=(self.post.type, self.post.slug)))
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_count_does_not_depend_on_comments(self):
+        self._add_comments(1)
+        self._assert_page_queries(7)
+
+        self._add_comments(20)
+        self._assert_page_queries(7)
@@ -9,6 +9,10 @@ class UserPostsRss(NewPostsRss):
     def get_object(self, _, user_slug=None):
         return get_object_or_404(User, slug=user_slug)
 
+    def cache_tags(self, user_slug=None):
+        author_id = User.objects.filter(slug=user_slug).values_list("id", flat=True).first()
+        return [f"posts:author:{author_id}"]
+
     def link(self, user):
         return f"/user/{user.slug}/posts.rss"
 
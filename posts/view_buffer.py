@@ -0,0 +1,228 @@
+"""
+Write-behind buffer for post views. Opening a post only touches redis:
+
+- post_views:counts — hash of post_id -> views not yet added to posts.view_count
+- post_views:view:<user_id>:<post_id> — last_view_at, registered_view_at and seen_comment_sequence of the user
+  (read immediately to highlight new comments, seeded from post_views table on the first view)
+- post_views:dirty — "<user_id>:<post_id>" pairs waiting to be written to post_views table
+- post_views:anon:<post_id>:<ip> — anonymous view marker which lives for POST_VIEW_COOLDOWN_PERIOD
+
+flush_post_views() runs every minute (`manage.py flush_post_views` in etc/crontab) and writes everything
+to postgres in a few bulk queries.
+
+Enabled by features.BUFFERED_POST_VIEWS
+"""
+import logging
+from datetime import datetime
+from uuid import UUID, uuid4
+
+from django.conf import settings
+from django.db import connection, transaction
+from django_redis import get_redis_connection
+from redis import RedisError
+
+from club import features
+from common.request import parse_ip_address
+from posts.models.views import PostView
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = "post_views"
+COUNTS_KEY = f"{KEY_PREFIX}:counts"
+FLUSHING_COUNTS_KEY = f"{KEY_PREFIX}:counts:flushing"
+DIRTY_VIEWS_KEY = f"{KEY_PREFIX}:dirty"
+VIEW_TTL = int(settings.POST_VIEW_COOLDOWN_PERIOD.total_seconds()) * 2  # then it's read from postgres again
+FLUSH_BATCH_SIZE = 1000
+DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+def redis_client():
+    return get_redis_connection("default")
+
+
+def view_key(user_id, post_id):
+    return f"{KEY_PREFIX}:view:{user_id}:{post_id}"
+
+
+def register_post_view(request, post):
+    """
+    Records a view of the current user (or anonymous view) to redis or postgres.
+    Returns previous last_view_at of the user to highlight new comments
+    """
+    if features.BUFFERED_POST_VIEWS:
+        try:
+            if request.me:
+                return register_view(request.me, post)
+            register_anonymous_view(request, post)
+            return None
+        except RedisError as ex:
+            log.warning(f"Post view buffer is unavailable, writing the view to DB: {ex}")
+
+    if request.me:
+        post_view, last_view_at = PostView.register_view(request=request, user=request.me, post=post)
+        return last_view_at
+
+    PostView.register_anonymous_view(request=request, post=post)
+    return None
+
+
+def register_view(user, post):
+    """
+    Same as PostView.register_view, but without touching postgres (except the very first view after TTL).
+    Returns previous last_view_at to highlight new comments
+    """
+    now = datetime.utcnow()
+    redis = redis_client()
+    key = view_key(user.id, post.id)
+
+    buffered_view = redis.hgetall(key)
+    if buffered_view:
+        last_view_at = _parse_datetime(buffered_view[b"last_view_at"])
+        registered_view_at = _parse_datetime(buffered_view[b"registered_view_at"])
+    else:
+        db_view = PostView.objects\
+            .filter(user=user, post=post)\
+            .values_list("last_view_at", "registered_view_at")\
+            .first()
+        last_view_at, registered_view_at = db_view or (now, None)
+
+    # increment view counter for new views or for re-opens after cooldown period
+    if not registered_view_at or registered_view_at < now - settings.POST_VIEW_COOLDOWN_PERIOD:
+        registered_view_at = now
+        redis.hincrby(COUNTS_KEY, str(post.id), 1)
+
+    pipeline = redis.pipeline()
+    pipeline.hset(key, mapping={
+        "last_view_at": _format_datetime(now),
+        "registered_view_at": _format_datetime(registered_view_at),
+        "seen_comment_sequence": post.comment_sequence,
+    })
+    pipeline.expire(key, VIEW_TTL)
+    pipeline.sadd(DIRTY_VIEWS_KEY, f"{user.id}:{post.id}")
+    pipeline.execute()
+
+    return last_view_at
+
+
+def register_anonymous_view(request, post):
+    is_new_view = redis_client().set(
+        f"{KEY_PREFIX}:anon:{post.id}:{parse_ip_address(request)}",
+        1,
+        nx=True,
+        ex=int(settings.POST_VIEW_COOLDOWN_PERIOD.total_seconds()),
+    )
+    if is_new_view:
+        redis_client().hincrby(COUNTS_KEY, str(post.id), 1)
+
+
+def pending_view_post_ids(user, post_ids):
+    """
+    Posts which user has just opened, but the view is not in post_views table yet
+    """
+    post_ids = list(post_ids)
+    try:
+        is_pending = redis_client().smismember(DIRTY_VIEWS_KEY, [f"{user.id}:{post_id}" for post_id in post_ids])
+    except RedisError as ex:
+        log.warning(f"Can't read buffered post views: {ex}")
+        return set()
+    return {post_id for post_id, pending in zip(post_ids, is_pending) if pending}
+
+
+def flush_post_views():
+    """
+    Periodic task: moves buffered views from redis to postgres
+    """
+    redis = redis_client()
+    flushed_counts = _flush_view_counts(redis)
+
+    flushed_views = 0
+    while True:
+        members = redis.spop(DIRTY_VIEWS_KEY, FLUSH_BATCH_SIZE)
+        if not members:
+            break
+        flushed_views += _flush_user_views(redis, members)
+
+    log.info(f"Flushed post views: {flushed_counts} posts, {flushed_views} user views")
+    return flushed_counts, flushed_views
+
+
+def _flush_view_counts(redis):
+    # counts are moved aside first so new views are not lost during the flush,
+    # if the previous flush died halfway — its leftovers go first
+    if not redis.exists(FLUSHING_COUNTS_KEY):
+        try:
+            redis.rename(COUNTS_KEY, FLUSHING_COUNTS_KEY)
+        except RedisError:  # no views since last flush
+            return 0
+
+    counts = {UUID(post_id.decode()): int(count) for post_id, count in redis.hgetall(FLUSHING_COUNTS_KEY).items()}
+    if counts:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                update posts
+                set view_count = view_count + counts.delta
+                from unnest(%s::uuid[], %s::int[]) as counts(post_id, delta)
+                where posts.id = counts.post_id
+            """, [list(counts.keys()), list(counts.values())])
+
+    redis.delete(FLUSHING_COUNTS_KEY)
+    return len(counts)
+
+
+def _flush_user_views(redis, members):
+    pipeline = redis.pipeline()
+    pairs = []
+    for member in members:
+        user_id, post_id = member.decode().split(":")
+        pairs.append((user_id, post_id))
+        pipeline.hgetall(view_key(user_id, post_id))
+
+    rows = [
+        (uuid4(), UUID(user_id), UUID(post_id),
+         _parse_datetime(view[b"registered_view_at"]), _parse_datetime(view[b"last_view_at"]),
+         _parse_int(view.get(b"seen_comment_sequence")))
+        for (user_id, post_id), view in zip(pairs, pipeline.execute())
+        if view
+    ]
+    if not rows:
+        return 0
+
+    try:
+        _upsert_post_views(*map(list, zip(*rows)))
+    except Exception:
+        redis.sadd(DIRTY_VIEWS_KEY, *members)  # try again next time
+        raise
+
+    return len(rows)
+
+
+def _upsert_post_views(ids, user_ids, post_ids, registered_view_ats, last_view_ats, seen_comment_sequences):
+    with transaction.atomic(), connection.cursor() as cursor:
+        # the sequence is taken from the buffered view, so comments written before the flush stay unread
+        cursor.execute("""
+            insert into post_views
+                (id, user_id, post_id, first_view_at, registered_view_at, last_view_at, seen_comment_sequence)
+            select
+                views.id, views.user_id, views.post_id, views.last_view_at, views.registered_view_at,
+                views.last_view_at, coalesce(views.seen_comment_sequence, posts.comment_sequence)
+            from unnest(%s::uuid[], %s::uuid[], %s::uuid[], %s::timestamp[], %s::timestamp[], %s::int[])
+                as views(id, user_id, post_id, registered_view_at, last_view_at, seen_comment_sequence)
+            join posts on posts.id = views.post_id
+            where exists (select 1 from users where users.id = views.user_id)
+            on conflict (user_id, post_id) do update set
+                registered_view_at = greatest(post_views.registered_view_at, excluded.registered_view_at),
+                last_view_at = greatest(post_views.last_view_at, excluded.last_view_at),
+                seen_comment_sequence = greatest(post_views.seen_comment_sequence, excluded.seen_comment_sequence)
+        """, [ids, user_ids, post_ids, registered_view_ats, last_view_ats, seen_comment_sequences])
+
+
+def _format_datetime(value):
+    return value.strftime(DATETIME_FORMAT)
+
+
+def _parse_int(value):
+    return int(value) if value is not None else None  # views buffered before seen_comment_sequence existed
+
+
+def _parse_datetime(value):
+    return datetime.strptime(value.decode() if isinstance(value, bytes) else value, DATETIME_FORMAT)
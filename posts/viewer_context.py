@@ -0,0 +1,176 @@
+"""
+Viewer context: everything the post page needs to know about the current user (bookmark, votes, subscription,
+collectible tag, comment rate limits), loaded with one SQL statement instead of a query per relation.
+
+Mutes and notes rarely change, so they are cached per user and loaded by a second statement only on a cache miss.
+The cache is flushed by signals in posts/signals.py when UserMuted or UserNote change.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from uuid import UUID
+
+from django.core.cache import cache
+from django.db import connection
+
+from club import features
+from comments.rate_limits import RATE_LIMIT_WINDOW, is_comment_rate_limit_exceeded
+from posts.models.subscriptions import PostSubscription
+from posts.viewer_state import epoch_ms
+from tags.models import Tag
+
+VIEWER_RELATIONS_CACHE_TIMEOUT = 24 * 60 * 60  # seconds, it's flushed on every change anyway
+VIEWER_NOTES_LIMIT = 100
+
+
+def viewer_relations_cache_key(user_id) -> str:
+    return f"viewer:relations:{user_id}"
+
+
+def clear_viewer_relations_cache(user_id) -> None:
+    if user_id:
+        cache.delete(viewer_relations_cache_key(user_id))
+
+
+@dataclass
+class ViewerContext:
+    is_bookmark: bool = False
+    upvoted_at: int | None = None
+    subscription: PostSubscription | None = None
+    muted_user_ids: list[UUID] = field(default_factory=list)
+    user_notes: dict[UUID, str] = field(default_factory=dict)
+    collectible_tag: Tag | None = None
+    is_collectible_tag_collected: bool = False
+    is_comment_rate_exceeded: bool = False
+    comment_upvotes: dict[UUID, datetime] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, user, post):
+        if not user:
+            return cls()
+
+        row = _load_post_state(user, post)
+        muted_user_ids, user_notes = load_viewer_relations(user)
+
+        subscription = None
+        if row["subscription"]:
+            subscription = PostSubscription(
+                id=UUID(row["subscription"]["id"]), user=user, post=post, type=row["subscription"]["type"],
+            )
+
+        collectible_tag = None
+        if row.get("collectible_tag"):
+            collectible_tag = Tag(
+                code=post.collectible_tag_code,
+                name=row["collectible_tag"]["name"],
+                group=row["collectible_tag"]["group"],
+            )
+
+        return cls(
+            is_bookmark=row["is_bookmark"],
+            upvoted_at=epoch_ms(row["upvoted_at"]),
+            subscription=subscription,
+            muted_user_ids=muted_user_ids,
+            user_notes=user_notes,
+            collectible_tag=collectible_tag,
+            is_collectible_tag_collected=bool(collectible_tag and row["collectible_tag"]["is_collected"]),
+            is_comment_rate_exceeded=is_comment_rate_limit_exceeded(
+                post, user,
+                post_comments_count=row.get("post_comments_count"),
+                total_comments_count=row.get("total_comments_count"),
+            ),
+            comment_upvotes={
+                UUID(comment_id): datetime.fromisoformat(created_at)
+                for comment_id, created_at in (row["comment_upvotes"] or {}).items()
+            },
+        )
+
+
+def _load_post_state(user, post):
+    params = {
+        "user_id": user.id,
+        "post_id": post.id,
+        "since": datetime.utcnow() - RATE_LIMIT_WINDOW,
+        "tag_code": post.collectible_tag_code,
+    }
+
+    # with features.REDIS_RATE_LIMITS the counts are taken from redis, moderators have no limits at all
+    rate_limit_columns = """,
+        (
+            select count(*) from comments
+            where author_id = %(user_id)s and post_id = %(post_id)s
+                and is_visible and deleted_by is null and created_at >= %(since)s
+        ) as post_comments_count,
+        (
+            select count(*) from comments
+            where author_id = %(user_id)s and is_visible and deleted_by is null and created_at >= %(since)s
+        ) as total_comments_count
+    """ if not features.REDIS_RATE_LIMITS and not user.is_moderator else ""
+
+    # tags are only looked up for posts which have one
+    collectible_tag_column = """,
+        (
+            select json_build_object(
+                'name', tags.name,
+                'group', tags."group",
+                'is_collected', exists (
+                    select 1 from user_tags where user_tags.tag_id = tags.code and user_tags.user_id = %(user_id)s
+                )
+            )
+            from tags where tags.code = %(tag_code)s
+        ) as collectible_tag
+    """ if post.collectible_tag_code else ""
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            select
+                exists (
+                    select 1 from post_bookmarks where post_id = %(post_id)s and user_id = %(user_id)s
+                ) as is_bookmark,
+                (
+                    select created_at from post_votes where post_id = %(post_id)s and user_id = %(user_id)s limit 1
+                ) as upvoted_at,
+                (
+                    select json_build_object('id', id, 'type', type)
+                    from post_subscriptions where post_id = %(post_id)s and user_id = %(user_id)s limit 1
+                ) as subscription,
+                (
+                    select json_object_agg(comment_id, created_at)
+                    from comment_votes where user_id = %(user_id)s and post_id = %(post_id)s
+                ) as comment_upvotes
+                {rate_limit_columns}
+                {collectible_tag_column}
+        """, params)
+        columns = [column[0] for column in cursor.description]
+        return dict(zip(columns, cursor.fetchone()))
+
+
+def load_viewer_relations(user):
+    """
+    Returns (muted_user_ids, user_notes), cached until the user mutes somebody or edits a note
+    """
+    cached = cache.get(viewer_relations_cache_key(user.id))
+    if cached is None:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                select
+                    (
+                        select coalesce(json_agg(user_to_id), '[]') from muted where user_from_id = %(user_id)s
+                    ),
+                    (
+                        select coalesce(json_object_agg(notes.user_to_id, notes.text), '{}')
+                        from (
+                            select user_to_id, text from user_notes
+                            where user_from_id = %(user_id)s
+                            order by created_at desc
+                            limit %(notes_limit)s
+                        ) as notes
+                    )
+            """, {"user_id": user.id, "notes_limit": VIEWER_NOTES_LIMIT})
+            muted_user_ids, user_notes = cursor.fetchone()
+        cached = {"muted_user_ids": muted_user_ids, "user_notes": user_notes}
+        cache.set(viewer_relations_cache_key(user.id), cached, VIEWER_RELATIONS_CACHE_TIMEOUT)
+
+    return (
+        [UUID(user_id) for user_id in cached["muted_user_ids"]],
+        {UUID(user_id): text for user_id, text in cached["user_notes"].items()},
+    )
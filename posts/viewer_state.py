@@ -0,0 +1,112 @@
+"""
+Viewer state overlay: what the current user did with the posts/comments on a page (votes, views, bookmarks).
+
+Feed queries don't join it anymore — first we load the page, then attach the state for exactly those ids
+with one query per relation. Works for any list of loaded objects: feed, bookmarks, profile and search pages.
+"""
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from bookmarks.models import PostBookmark
+from club import features
+from comments.models import Comment, CommentVote
+from posts import view_buffer
+from posts.models.views import PostView
+from posts.models.votes import PostVote
+
+
+def attach_post_viewer_state(posts, user):
+    """
+    Sets post.upvoted_at (epoch ms), post.unread_comments and post.is_bookmarked on already loaded posts
+    """
+    posts = [post for post in posts if post]
+    if not posts:
+        return posts
+
+    if not user:
+        for post in posts:
+            post.upvoted_at = None
+            post.unread_comments = None
+            post.is_bookmarked = False
+        return posts
+
+    post_ids = {post.id for post in posts}
+    votes = dict(
+        PostVote.objects.filter(user=user, post_id__in=post_ids).values_list("post_id", "created_at")
+    )
+    unread_comments = unread_comments_by_post(user, {post.id: post for post in posts})
+    if features.BUFFERED_POST_VIEWS:
+        # views which are still in redis, the user has already seen all comments there
+        for post_id in view_buffer.pending_view_post_ids(user, post_ids):
+            unread_comments[post_id] = 0
+
+    bookmarked_ids = set(
+        PostBookmark.objects.filter(user=user, post_id__in=post_ids).values_list("post_id", flat=True)
+    )
+
+    for post in posts:
+        post.upvoted_at = epoch_ms(votes.get(post.id))
+        post.unread_comments = unread_comments.get(post.id)
+        post.is_bookmarked = post.id in bookmarked_ids
+
+    return posts
+
+
+def unread_comments_by_post(user, posts_by_id):
+    """
+    Unread = comments written since the last view (post.comment_sequence - view.seen_comment_sequence)
+    minus those of them which were deleted. Posts without a view are not in the result
+    """
+    deleted_since_view = Comment.objects\
+        .filter(post_id=OuterRef("post_id"), is_deleted=True, created_at__gt=OuterRef("last_view_at"))\
+        .order_by()\
+        .values("post_id")\
+        .annotate(count=Count("id"))\
+        .values("count")
+
+    views = PostView.objects\
+        .filter(user=user, post_id__in=posts_by_id.keys())\
+        .annotate(deleted_since_view=Coalesce(Subquery(deleted_since_view), Value(0)))\
+        .values_list("post_id", "seen_comment_sequence", "deleted_since_view")
+
+    return {
+        post_id: max(posts_by_id[post_id].comment_sequence - seen_comment_sequence - deleted_since_view, 0)
+        for post_id, seen_comment_sequence, deleted_since_view in views
+    }
+
+
+def attach_comment_viewer_state(comments, user):
+    """
+    Sets comment.upvoted_at (epoch ms) on already loaded comments
+    """
+    comments = [comment for comment in comments if comment]
+    if not comments:
+        return comments
+
+    if not user:
+        for comment in comments:
+            comment.upvoted_at = None
+        return comments
+
+    votes = dict(
+        CommentVote.objects.filter(
+            user=user,
+            comment_id__in={comment.id for comment in comments},
+        ).values_list("comment_id", "created_at")
+    )
+
+    for comment in comments:
+        comment.upvoted_at = epoch_ms(votes.get(comment.id))
+
+    return comments
+
+
+def attach_search_viewer_state(results, user):
+    attach_post_viewer_state([result.post for result in results], user)
+    attach_comment_viewer_state([result.comment for result in results], user)
+    return results
+
+
+def epoch_ms(value):
+    # frontend upvote components expect the same milliseconds postgres used to give us
+    return round(value.timestamp() * 1000) if value else None
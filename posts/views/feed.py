@@ -1,18 +1,24 @@
 from datetime import datetime, timedelta
 
+from django.conf import settings
 from django.db.models import Q
 from django.shortcuts import get_object_or_404, render
 
 from authn.decorators.auth import require_auth
 from club import features
 from common.feature_flags import feature_switch, noop
-from common.pagination import paginate
-from posts.helpers import POST_TYPE_ALL, ORDERING_ACTIVITY, ORDERING_NEW, sort_feed, ORDERING_HOT
+from common.pagination import paginate_by_cursor
+from posts.cache import cache_anonymous_response, feed_cache_tags
+from posts.feed_filters import FeedFilterProfile
+from posts.helpers import POST_TYPE_ALL, ORDERING_ACTIVITY, sort_feed
+from posts.materialized_feed import materialized_feed_page
 from posts.models.post import Post
+from posts.viewer_state import attach_post_viewer_state
 from rooms.models import Room
 
 
 @feature_switch(features.PRIVATE_FEED, yes=require_auth, no=noop)
+@cache_anonymous_response(tags=feed_cache_tags)
 def feed(
     request,
     post_type=POST_TYPE_ALL,
@@ -42,27 +48,12 @@ def feed(
     if label_code:
         posts = posts.filter(label_code=label_code)
 
-    # hide muted users and rooms
-    if request.me:
-        # exclude muted users
-        posts = posts.exclude(author__muted_to__user_from=request.me)
-
-        # exclude muted rooms (only if not in the room)
-        if not room and ordering in [ORDERING_NEW, ORDERING_HOT, ORDERING_ACTIVITY]:
-            posts = posts.exclude(room__muted_users__user=request.me)
-
     # hide non-public posts and intros from unauthorized users
     if not request.me:
         posts = posts.exclude(is_public=False).exclude(type=Post.TYPE_INTRO)
 
-    # hide room-only posts (except from subscribed rooms)
-    if not room and not label_code:
-        if request.me:
-            posts = posts.exclude(
-                Q(is_room_only=True) & ~Q(room__subscriptions__user=request.me)
-            )
-        else:
-            posts = posts.exclude(is_room_only=True)
+    # hide muted users and rooms, room-only posts (except from subscribed rooms)
+    posts = FeedFilterProfile.for_user(request.me).apply(posts, room, label_code, ordering)
 
     # order posts by some metric
     posts = sort_feed(posts, ordering, ordering_param)
@@ -71,9 +62,21 @@ def feed(
     pinned_posts = []
     if ordering == ORDERING_ACTIVITY:
         now = datetime.utcnow()
-        pinned_posts = posts.filter(is_pinned_until__gte=now)
+        pinned_posts = list(posts.filter(is_pinned_until__gte=now))
         posts = posts.filter(Q(is_pinned_until__isnull=True) | Q(is_pinned_until__lt=now))
 
+    # ranked ids from redis (if enabled), otherwise let postgres sort
+    posts_page = None
+    if features.MATERIALIZED_FEED:
+        posts_page = materialized_feed_page(
+            request, post_type, room, label_code, ordering, ordering_param, page_size=settings.DEFAULT_PAGE_SIZE
+        )
+    if posts_page is None:
+        posts_page = paginate_by_cursor(request, posts)
+
+    # votes, unread comments and bookmarks only for posts on the page
+    attach_post_viewer_state(list(posts_page) + pinned_posts, request.me)
+
     # for moderators — pending posts
     waiting_for_moderation_posts = []
     if request.me and request.me.is_moderator and ordering == ORDERING_ACTIVITY:
@@ -87,7 +90,7 @@ def feed(
         "ordering_full": ordering + (f":{ordering_param}" if ordering_param else ""),
         "room": room,
         "label_code": label_code,
-        "posts": paginate(request, posts),
+        "posts": posts_page,
         "pinned_posts": pinned_posts,
         "waiting_for_moderation_posts": waiting_for_moderation_posts,
         "date_month_ago": datetime.utcnow() - timedelta(days=30),
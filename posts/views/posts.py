@@ -10,12 +10,14 @@ from club.exceptions import AccessDenied, ContentDuplicated, RateLimitException
 from notifications.telegram.posts import send_published_post_to_moderators, notify_author_friends, \
     announce_in_online_channel, send_intro_changes_to_moderators, notify_post_label_changed, \
     notify_post_coauthors_changed
+from posts.cache import cached_anonymous_response
 from posts.forms.compose import POST_TYPE_MAP, PostTextForm
 from posts.models.linked import LinkedPost
 from posts.models.post import Post
 from posts.models.subscriptions import PostSubscription
-from posts.models.views import PostView
 from posts.renderers import render_post
+from posts.view_buffer import register_post_view
+from search.indexing import index_later
 from search.models import SearchIndex
 
 
@@ -37,33 +39,27 @@ def show_post(request, post_type, post_slug):
             return access_denied
 
     # record a new view
-    last_view_at = None
     if request.me:
         request.me.update_last_activity()
-        post_view, last_view_at = PostView.register_view(
-            request=request,
-            user=request.me,
-            post=post,
-        )
-    else:
-        PostView.register_anonymous_view(
-            request=request,
-            post=post,
-        )
-
-    # find linked posts and sort them by upvotes
-    linked_posts = sorted({
-        link.post_to if link.post_to != post else link.post_from
-        for link in LinkedPost.links_for_post(post)[:50]
-    }, key=lambda p: p.upvotes, reverse=True)
-
-    # force cleanup deleted/hidden posts from linked
-    linked_posts = [p for p in linked_posts if not p.is_draft]
-
-    return render_post(request, post, {
-        "post_last_view_at": last_view_at,
-        "linked_posts": linked_posts,
-    })
+    last_view_at = register_post_view(request, post)
+
+    def render_post_page():
+        # find linked posts and sort them by upvotes
+        linked_posts = sorted({
+            link.post_to if link.post_to != post else link.post_from
+            for link in LinkedPost.links_for_post(post)[:50]
+        }, key=lambda p: p.upvotes, reverse=True)
+
+        # force cleanup deleted/hidden posts from linked
+        linked_posts = [p for p in linked_posts if not p.is_draft]
+
+        return render_post(request, post, {
+            "post_last_view_at": last_view_at,
+            "linked_posts": linked_posts,
+        })
+
+    # public posts look the same for all anonymous users (views are still counted above)
+    return cached_anonymous_response(request, tags=[f"post:{post.id}"], build_response=render_post_page)
 
 
 @require_auth
@@ -227,7 +223,7 @@ def create_or_edit(request, post_type, post=None, mode="create"):
             if post.room:
                 post.room.update_last_activity()
 
-            SearchIndex.update_post_index(post)
+            index_later(SearchIndex.TYPE_POST, post.id)
             LinkedPost.create_links_from_text(post, post.text)
 
         # track label and coauthors changes
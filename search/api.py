@@ -1,6 +1,8 @@
 from django.http import Http404, JsonResponse
 
 from authn.decorators.api import api
+from club import features
+from search.mentions import member_index
 from search.models import SearchIndex
 from tags.models import Tag
 from users.models.user import User
@@ -21,6 +23,10 @@ def api_search_users(request):
 
     if prefix:
         if MIN_PREFIX_LENGTH <= len(prefix) < MAX_PREFIX_LENGTH:
+            if features.MENTION_PREFIX_INDEX:
+                # the same slug, full_name and avatar, but from memory
+                return JsonResponse({"users": member_index.find(prefix, limit=MAX_RESULTS)})
+
             users = User.registered_members()\
                 .filter(slug__istartswith=prefix)\
                 .order_by("-last_activity_at")[:MAX_RESULTS]
@@ -0,0 +1,162 @@
+"""
+Search result cache (features.SEARCH_RESULT_CACHE).
+
+Ranking is the expensive part of search: SearchRank is computed twice for every matching row. So we rank once
+and cache the ordered ids of up to SEARCH_CACHE_MAX_RESULTS rows and the total number of hits, keyed by
+the parsed query, type, ordering and the generation of the index. Every indexing bumps the generation,
+old entries are never read again and expire by themselves. Pages are then loaded by ids, pages past the cached
+ids are ranked by the database like without the cache.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+from club import features
+from posts.models.post import Post
+from search.helpers import parse_search_query
+from search.models import SearchIndex
+from utils.queryset import estimate_count
+
+KEY_PREFIX = "search_cache"
+GENERATION_KEY = f"{KEY_PREFIX}:generation"
+GENERATION_TIMEOUT = settings.SEARCH_CACHE_TIMEOUT * 2  # must outlive any entry created before a bump
+
+
+def bump_search_generation():
+    cache.set(GENERATION_KEY, time.time_ns(), GENERATION_TIMEOUT)
+
+
+def candidate_limit(ordering):
+    # only ranking by relevance is worth the shortcut, other orderings are cheap anyway
+    if features.SEARCH_TWO_PHASE and ordering == "-rank":
+        return settings.SEARCH_CANDIDATE_LIMIT
+    return None
+
+
+def filtered_search(query, content_type=None, post_type=None, ordering=None):
+    """
+    Search results the way search page and bot tools show them: without intros among posts and deleted comments
+    """
+    scope = SearchIndex.objects.all()
+
+    if content_type:
+        scope = scope.filter(type=content_type)
+
+    if post_type:
+        scope = scope.filter(post__type=post_type)
+    elif content_type == SearchIndex.TYPE_POST:
+        scope = scope.exclude(post__type=Post.TYPE_INTRO)
+
+    scope = scope.exclude(comment__isnull=False, comment__is_deleted=True)
+    return SearchIndex.search(query, queryset=scope, candidate_limit=candidate_limit(ordering))
+
+
+def search_cache_key(query, content_type=None, ordering="-rank", post_type=None):
+    parsed = parse_search_query(query)
+    parsed["query"] = " ".join(parsed["query"].split())
+    raw_key = json.dumps(
+        [cache.get(GENERATION_KEY, 0), sorted(parsed.items()), content_type, ordering, post_type],
+        ensure_ascii=False,
+    )
+    return f"{KEY_PREFIX}:{hashlib.md5(raw_key.encode('utf-8')).hexdigest()}"
+
+
+def search_result_ids(query, content_type=None, ordering="-rank", post_type=None):
+    """
+    Returns (ranked ids of search_index rows, total number of hits), only the first SEARCH_CACHE_MAX_RESULTS ids
+    """
+    results = cached_search_results(query, content_type, ordering, post_type)
+    return results["ids"], results["count"]
+
+
+def cached_search_results(query, content_type=None, ordering="-rank", post_type=None):
+    """
+    The same as search_result_ids() as a dict, "is_approximate" tells if the count is the planner estimate
+    """
+    key = search_cache_key(query, content_type, ordering, post_type)
+    cached = cache.get(key)
+    if cached:
+        return cached
+
+    results = filtered_search(query, content_type, post_type, ordering).order_by(ordering, "pk")
+    ids = list(results.values_list("id", flat=True)[:settings.SEARCH_CACHE_MAX_RESULTS])
+
+    # every hit is among the ids unless they were cut by the cache or by two-phase search
+    max_ids = min(settings.SEARCH_CACHE_MAX_RESULTS, candidate_limit(ordering) or settings.SEARCH_CACHE_MAX_RESULTS)
+    if len(ids) < max_ids:
+        count, is_approximate = len(ids), False
+    else:
+        count, is_approximate = count_hits(query, content_type, post_type)
+
+    cached = {"ids": ids, "count": count, "is_approximate": is_approximate}
+    cache.set(key, cached, settings.SEARCH_CACHE_TIMEOUT)
+    return cached
+
+
+def count_hits(query, content_type=None, post_type=None):
+    """
+    Returns (number of hits, whether it's estimated)
+    """
+    hits = filtered_search(query, content_type, post_type).order_by()
+    if settings.SEARCH_APPROXIMATE_COUNT:
+        return estimate_count(hits), True  # "about N results" from the planner, without visiting every match
+    return hits.count(), False
+
+
+def load_results(ids, queryset=None):
+    """
+    Loads search_index rows by ids keeping their order, rows filtered out by the queryset are skipped
+    """
+    queryset = queryset if queryset is not None else SearchIndex.objects.all()
+    rows = queryset.in_bulk(ids)
+    return [rows[row_id] for row_id in ids if row_id in rows]
+
+
+class SearchPaginator(Paginator):
+    """
+    Paginator over cached ids which knows the total number of hits, not only the cached ones
+    """
+
+    def __init__(self, ids, per_page, hits, max_hits=None, is_approximate=False):
+        super().__init__(ids, per_page)
+        self.hits = hits
+        self.max_hits = max_hits
+        self.is_approximate = is_approximate
+
+    @cached_property
+    def count(self):
+        count = max(self.hits, len(self.object_list))
+        if self.max_hits is not None:
+            count = min(count, self.max_hits)  # two-phase search never ranks more
+        return count
+
+
+def paginate_cached_search(request, query, content_type, ordering, page_size=settings.SEARCH_PAGE_SIZE):
+    results = cached_search_results(query, content_type, ordering)
+    ids = results["ids"]
+    paginator = SearchPaginator(
+        ids,
+        page_size,
+        hits=results["count"],
+        max_hits=candidate_limit(ordering),
+        is_approximate=results.get("is_approximate", False),
+    )
+    page = paginator.get_page(request.GET.get("page") or 1)
+
+    if page.end_index() > len(ids):
+        # past the cached window, OFFSET is slow but rare
+        results = filtered_search(query, content_type, ordering=ordering)\
+            .select_related("post__author", "comment__author", "comment__post", "user")\
+            .order_by(ordering, "pk")
+        page.object_list = list(results[page.start_index() - 1:page.end_index()])
+    else:
+        page.object_list = load_results(
+            page.object_list,
+            SearchIndex.objects.select_related("post__author", "comment__author", "comment__post", "user"),
+        )
+    return page
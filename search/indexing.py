@@ -0,0 +1,270 @@
+"""
+Set-based search indexing: index rows are computed by postgres with INSERT ... SELECT for many objects at once,
+the vectors are the same as SearchIndex.update_*_index produce one by one.
+
+With features.SEARCH_INDEX_QUEUE views don't index anything themselves, index_later() puts "type:id"
+into a redis sorted set (scored by the time it was first queued) and flush_search_queue() picks it up once it's
+older than SEARCH_INDEX_DEBOUNCE_SECONDS. A burst of edits of the same object is indexed once,
+everything ready is upserted in batches with ON CONFLICT on the partial unique constraints of search_index.
+The flush runs every minute (`manage.py flush_search_queue` in etc/crontab),
+`manage.py search_index_stats` shows the queue and its freshness lag.
+"""
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+from uuid import UUID
+
+from django.conf import settings
+from django.db import connection, transaction
+from django_redis import get_redis_connection
+from redis import RedisError
+
+from club import features
+from comments.models import Comment
+from posts.models.post import Post
+from search.cache import bump_search_generation
+from search.models import SearchIndex
+from users.models.user import User
+
+log = logging.getLogger(__name__)
+
+TABLE = SearchIndex._meta.db_table
+COLUMNS = "id, type, post_id, comment_id, user_id, tags, author, upvotes, title, created_at, updated_at, index"
+
+KEY_PREFIX = "search_index"
+QUEUE_KEY = f"{KEY_PREFIX}:queue"
+FLUSH_BATCH_SIZE = 500
+LAG_WARNING_SECONDS = 60
+
+# the indexed object of every type, its column in search_index
+OBJECT_COLUMNS = {
+    SearchIndex.TYPE_POST: "post_id",
+    SearchIndex.TYPE_COMMENT: "comment_id",
+    SearchIndex.TYPE_USER: "user_id",
+}
+
+OBJECT_TABLES = {
+    SearchIndex.TYPE_POST: Post._meta.db_table,
+    SearchIndex.TYPE_COMMENT: Comment._meta.db_table,
+    SearchIndex.TYPE_USER: User._meta.db_table,
+}
+
+# own columns of indexed objects and their weights, related ones (author, room, intro) are added by select_sql
+VECTOR_COLUMNS = {
+    SearchIndex.TYPE_POST: [("title", "A"), ("text", "B")],
+    SearchIndex.TYPE_COMMENT: [("text", "B")],
+    SearchIndex.TYPE_USER: [
+        ("slug", "A"), ("full_name", "A"), ("email", "A"),
+        ("bio", "B"), ("company", "B"),
+        ("country", "C"), ("city", "C"), ("contact", "C"),
+    ],
+}
+
+
+def _vector_sql(*columns):
+    # the same as search.models._multi_search_vector: russian + simple config for every column
+    return " || ".join(
+        f"setweight(to_tsvector('{config}'::regconfig, coalesce(({column})::text, '')), '{weight}')"
+        for column, weight in columns
+        for config in ("russian", "simple")
+    )
+
+
+def vector_sql(type, qualified=True):
+    # vector of the object's own columns, stored in the generated search_vector column in trigger mode
+    table = OBJECT_TABLES[type]
+    return _vector_sql(*[
+        (f"{table}.{column}" if qualified else column, weight) for column, weight in VECTOR_COLUMNS[type]
+    ])
+
+
+def select_sql(type, where, generated=False):
+    """
+    SELECT of search_index rows (in COLUMNS order) for indexable objects of the type matching the where clause,
+    with generated=True own vectors are taken from search_vector columns (see search/triggers.py)
+    """
+    own_vector = f"{OBJECT_TABLES[type]}.search_vector" if generated else vector_sql(type)
+
+    if type == SearchIndex.TYPE_COMMENT:
+        return f"""
+            select
+                gen_random_uuid(), 'comment', comments.post_id, comments.id, null, null,
+                users.slug, comments.upvotes, posts.title, comments.created_at, %(now)s,
+                {own_vector} || {_vector_sql(("users.slug", "C"))}
+            from comments
+                join posts on posts.id = comments.post_id
+                left join users on users.id = comments.author_id
+            where ({where.format(id="comments.id")})
+                and comments.is_visible and not comments.is_deleted and comments.deleted_by is null
+                and posts.visibility <> %(draft)s
+        """
+
+    if type == SearchIndex.TYPE_POST:
+        return f"""
+            select
+                gen_random_uuid(), 'post', posts.id, null, null, null,
+                users.slug, posts.upvotes, posts.title, coalesce(posts.published_at, posts.created_at), %(now)s,
+                {own_vector} || {_vector_sql(("users.slug", "C"), ("rooms.title", "C"))}
+            from posts
+                left join users on users.id = posts.author_id
+                left join rooms on rooms.slug = posts.room_id
+            where ({where.format(id="posts.id")})
+                and posts.visibility <> %(draft)s
+        """
+
+    if type == SearchIndex.TYPE_USER:
+        return f"""
+            select
+                gen_random_uuid(), 'user', null, null, users.id,
+                array(select tag_id from user_tags where user_tags.user_id = users.id limit 100),
+                users.slug, users.upvotes, users.full_name, users.created_at, %(now)s,
+                -- glued as text like in update_user_index, so intro positions are not shifted
+                (
+                    ({own_vector})::text || ' ' || coalesce((
+                        select ({_vector_sql(("intro.text", "B"))})::text
+                        from posts as intro
+                        where intro.author_id = users.id and intro.type = %(intro)s
+                        order by intro.created_at desc
+                        limit 1
+                    ), '')
+                )::tsvector
+            from users
+            where ({where.format(id="users.id")})
+                and users.moderation_status = %(approved)s
+        """
+
+    raise ValueError(f"Unknown search index type: {type}")
+
+
+def select_params(**params):
+    return {
+        "now": datetime.utcnow(),
+        "draft": Post.VISIBILITY_DRAFT,
+        "intro": Post.TYPE_INTRO,
+        "approved": User.MODERATION_STATUS_APPROVED,
+        **params,
+    }
+
+
+def index_objects(type, object_ids):
+    """
+    Upserts index rows of the objects with one statement and removes rows of those which are not indexable anymore
+    (deleted comments, drafts, users who are not approved)
+    """
+    object_ids = {UUID(str(object_id)) for object_id in object_ids}
+    if not object_ids:
+        return 0
+
+    column = OBJECT_COLUMNS[type]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(upsert_sql(type, where="{id} = any(%(ids)s::uuid[])"), select_params(ids=list(object_ids)))
+        indexed_ids = {row[0] for row in cursor.fetchall()}
+
+        removed_ids = object_ids - indexed_ids
+        if removed_ids:
+            SearchIndex.objects.filter(type=type, **{f"{column}__in": removed_ids}).delete()
+            if type == SearchIndex.TYPE_POST:
+                # comments of drafts are not searchable either
+                SearchIndex.objects.filter(post_id__in=removed_ids).delete()
+
+    bump_search_generation()
+    return len(indexed_ids)
+
+
+def upsert_sql(type, where, generated=False):
+    column = OBJECT_COLUMNS[type]
+    return f"""
+        insert into {TABLE} ({COLUMNS})
+        {select_sql(type, where, generated)}
+        on conflict (type, {column}) where type = '{type}' and {column} is not null
+        do update set
+            post_id = excluded.post_id,
+            tags = excluded.tags,
+            author = excluded.author,
+            upvotes = excluded.upvotes,
+            title = excluded.title,
+            created_at = excluded.created_at,
+            updated_at = excluded.updated_at,
+            index = excluded.index
+        returning {column}
+    """
+
+
+def index_later(type, object_id):
+    if features.SEARCH_INDEX_TRIGGERS:
+        # postgres has already indexed it, cached results are stale now
+        transaction.on_commit(bump_search_generation)
+        return
+
+    if not features.SEARCH_INDEX_QUEUE:
+        index_objects(type, [object_id])
+        return
+
+    member = f"{type}:{object_id}"
+
+    def enqueue():
+        try:
+            # the score is the time of the first change, so objects edited all the time are not postponed forever
+            redis_client().zadd(QUEUE_KEY, {member: time.time()}, nx=True)
+        except RedisError as ex:
+            log.warning(f"Search index queue is unavailable, indexing {member} right away: {ex}")
+            index_objects(type, [object_id])
+
+    # the worker has to see the committed object
+    transaction.on_commit(enqueue)
+
+
+def flush_search_queue():
+    """
+    Indexes queued objects which were not changed for SEARCH_INDEX_DEBOUNCE_SECONDS, returns how many
+    """
+    debounce_seconds = settings.SEARCH_INDEX_DEBOUNCE_SECONDS
+    stats = search_queue_stats()
+    if stats["lag_seconds"] > LAG_WARNING_SECONDS:
+        log.warning(f"Search index is behind: {stats['pending']} objects, {stats['lag_seconds']:.0f}s lag")
+
+    redis = redis_client()
+    flushed = 0
+    while True:
+        members = redis.zrangebyscore(QUEUE_KEY, "-inf", time.time() - debounce_seconds, start=0, num=FLUSH_BATCH_SIZE)
+        if not members:
+            break
+
+        # claimed before indexing: if the object changes again meanwhile, it's queued again and not lost
+        scores = redis.zmscore(QUEUE_KEY, members)
+        redis.zrem(QUEUE_KEY, *members)
+
+        by_type = defaultdict(list)
+        for member in members:
+            type, object_id = member.decode().split(":", 1)
+            by_type[type].append(object_id)
+
+        try:
+            for type, object_ids in by_type.items():
+                index_objects(type, object_ids)
+        except Exception:
+            redis.zadd(QUEUE_KEY, {m: s for m, s in zip(members, scores) if s is not None}, nx=True)
+            raise
+
+        flushed += len(members)
+
+    if flushed:
+        log.info(f"Indexed {flushed} objects, lag was {stats['lag_seconds']:.1f}s")
+    return flushed
+
+
+def search_queue_stats():
+    """
+    Objects waiting for indexing and how long the oldest one waits, the freshness lag of search
+    """
+    redis = redis_client()
+    oldest = redis.zrange(QUEUE_KEY, 0, 0, withscores=True)
+    return {
+        "pending": redis.zcard(QUEUE_KEY),
+        "lag_seconds": max(time.time() - oldest[0][1], 0.0) if oldest else 0.0,
+    }
+
+
+def redis_client():
+    return get_redis_connection("default")
@@ -0,0 +1,129 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import connection
+
+from search.models import SearchIndex
+from utils.queryset import estimate_count
+
+BENCHMARK_TABLE = "search_benchmark"  # the same columns and indexes as search_index, but never searched by the site
+BENCHMARK_AUTHOR = "search_benchmark"
+BATCH_SIZE = 100_000
+
+# the most frequent words come first, word frequencies fall like in real texts (roughly Zipf's law)
+COMMON_WORDS = [
+    "работа", "дом", "деньги", "время", "город", "код", "проект", "жизнь", "друг", "книга",
+    "машина", "компания", "страна", "игра", "вопрос", "идея", "опыт", "команда", "сервер", "данные",
+    "клуб", "пост", "комментарий", "язык", "ипотека", "зарплата", "переезд", "виза", "отпуск", "ремонт",
+]
+DEFAULT_QUERIES = ["работа", "дом деньги", "ипотека", "переезд виза", "\"новый проект\"", "term500", "term15000"]
+
+
+class Command(BaseCommand):
+    help = "Compares exact and two-phase search ranking on a synthetic corpus of comments: latency and overlap"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic comments to generate")
+        parser.add_argument("--vocabulary", type=int, default=20_000, help="Distinct words in the corpus")
+        parser.add_argument("--query", action="append", dest="queries", help="Query to compare, can be repeated")
+        parser.add_argument("--candidates", type=int, default=settings.SEARCH_CANDIDATE_LIMIT)
+        parser.add_argument("--top", type=int, default=settings.SEARCH_PAGE_SIZE, help="Results to compare")
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--reuse", action="store_true", help="Use the corpus left by a previous --keep run")
+        parser.add_argument("--keep", action="store_true", help=f"Don't drop the {BENCHMARK_TABLE} table at the end")
+
+    def handle(self, *args, **options):
+        if not options["reuse"]:
+            self.generate(options["rows"], options["vocabulary"])
+
+        top = options["top"]
+        self.stdout.write(
+            f"{'query':<20} {'exact ms':>9} {'2-phase ms':>11} {'overlap':>8} {'hits':>9} {'estimate':>9}"
+        )
+        with benchmark_table():
+            self.compare(options["queries"] or DEFAULT_QUERIES, top, options)
+
+        if not options["keep"]:
+            self.stdout.write("Dropping the corpus...")
+            with connection.cursor() as cursor:
+                cursor.execute(f"drop table if exists {BENCHMARK_TABLE}")
+
+        self.stdout.write("Done 🥙")
+
+    def compare(self, queries, top, options):
+        for query in queries:
+            exact_ids, exact_ms = self.measure(
+                lambda: SearchIndex.search(query).order_by("-rank", "pk").values_list("id", flat=True)[:top],
+                options["runs"],
+            )
+            two_phase_ids, two_phase_ms = self.measure(
+                lambda: SearchIndex.search(query, candidate_limit=options["candidates"])
+                .order_by("-rank", "pk").values_list("id", flat=True)[:top],
+                options["runs"],
+            )
+            overlap = len(set(exact_ids) & set(two_phase_ids)) / len(exact_ids) if exact_ids else 1.0
+            hits = SearchIndex.search(query).order_by()
+
+            self.stdout.write(
+                f"{query:<20} {exact_ms:>9.1f} {two_phase_ms:>11.1f} {overlap:>8.0%}"
+                f" {hits.count():>9} {estimate_count(hits):>9}"
+            )
+
+    def generate(self, rows, vocabulary_size):
+        vocabulary = COMMON_WORDS + [f"term{n}" for n in range(vocabulary_size - len(COMMON_WORDS))]
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"drop table if exists {BENCHMARK_TABLE}")
+            cursor.execute(f"create table {BENCHMARK_TABLE} (like search_index including all)")
+
+            for start in range(0, rows, BATCH_SIZE):
+                self.stdout.write(f"Generating comments {start}..{min(start + BATCH_SIZE, rows)}")
+                cursor.execute(f"""
+                    insert into {BENCHMARK_TABLE} (id, type, author, upvotes, title, created_at, updated_at, index)
+                    select
+                        gen_random_uuid(), 'comment', %(author)s,
+                        floor(power(random(), 8) * 300)::int,  -- most comments have no upvotes
+                        'Benchmark', now() - random() * interval '5 years', now(),
+                        setweight(to_tsvector('russian', body), 'B') || setweight(to_tsvector('simple', body), 'B')
+                    from (
+                        select (
+                            -- log-uniform word numbers: the first words are the most frequent
+                            select string_agg((%(words)s::text[])[floor(exp(random() * ln(%(size)s)))::int], ' ')
+                            from generate_series(1, 10 + g %% 40)
+                        ) as body
+                        from generate_series(%(start)s, %(end)s) as g
+                    ) as corpus
+                """, {
+                    "author": BENCHMARK_AUTHOR,
+                    "words": vocabulary,
+                    "size": len(vocabulary),
+                    "start": start,
+                    "end": min(start + BATCH_SIZE, rows) - 1,
+                })
+
+            cursor.execute(f"analyze {BENCHMARK_TABLE}")
+
+    def measure(self, run_query, runs):
+        timings = []
+        result = []
+        for _ in range(runs):
+            started_at = time.perf_counter()
+            result = list(run_query())
+            timings.append((time.perf_counter() - started_at) * 1000)
+        return result, statistics.median(timings)
+
+
+@contextmanager
+def benchmark_table():
+    """
+    Points SearchIndex querysets of this process to the corpus table, so search() runs exactly as on the site
+    """
+    original_table = SearchIndex._meta.db_table
+    SearchIndex._meta.db_table = BENCHMARK_TABLE
+    try:
+        yield
+    finally:
+        SearchIndex._meta.db_table = original_table
@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from club import features
+from search.indexing import flush_search_queue
+
+
+class Command(BaseCommand):
+    help = "Indexes objects queued for search (see features.SEARCH_INDEX_QUEUE), runs every minute"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Flush leftovers after the queue was turned off")
+
+    def handle(self, *args, **options):
+        if not features.SEARCH_INDEX_QUEUE and not options["force"]:
+            self.stdout.write("Search index queue is disabled, nothing to do")
+            return
+
+        flushed = flush_search_queue()
+        self.stdout.write(f"Done 🥙 Indexed {flushed} objects")
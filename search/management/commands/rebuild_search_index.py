@@ -5,7 +5,9 @@ from django.db import OperationalError
 
 from comments.models import Comment
 from posts.models.post import Post
+from search.cache import bump_search_generation
 from search.models import SearchIndex
+from search.rebuild import rebuild_search_index
 from users.models.user import User
 from utils.queryset import chunked_queryset
 
@@ -15,7 +17,25 @@ log = logging.getLogger(__name__)
 class Command(BaseCommand):
     help = "Rebuild search index for comments, posts and users"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--in-place", action="store_true",
+            help="Old mode: empty the index and fill it row by row (search is partial until it's done)",
+        )
+        parser.add_argument("--workers", type=int, default=4, help="Parallel loaders of the shadow table")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per INSERT ... SELECT")
+        parser.add_argument(
+            "--type", action="append", choices=[t for t, _ in SearchIndex.TYPES], dest="types",
+            help="Rebuild only these types, rows of the others are copied from the current index",
+        )
+
     def handle(self, *args, **options):
+        if options["in_place"]:
+            self.rebuild_in_place()
+        else:
+            self.rebuild_shadow(options)
+
+    def rebuild_in_place(self):
         SearchIndex.objects.all().delete()
         indexed_comment_count = 0
         indexed_post_count = 0
@@ -72,7 +92,33 @@ class Command(BaseCommand):
 
                 indexed_user_count += 1
 
+        bump_search_generation()
         self.stdout.write(
             f"Done 🥙 "
             f"Comments: {indexed_comment_count} Posts: {indexed_post_count} Users: {indexed_user_count}"
         )
+
+    def rebuild_shadow(self, options):
+        def on_progress(type, stats):
+            self.stdout.write(f"Loaded {type}: {stats.rows[type]} rows")
+
+        stats = rebuild_search_index(
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+            types=options["types"],
+            on_progress=on_progress,
+        )
+
+        for type, rows in stats.rows.items():
+            self.stdout.write(f"{type}: {rows} rows, {stats.rows_per_second(type):.0f} rows/s per worker")
+        if stats.kept_rows:
+            self.stdout.write(f"Kept {stats.kept_rows} rows of other types")
+
+        total_rows = sum(stats.rows.values())
+        load_seconds = stats.wall_seconds["load"]
+        self.stdout.write(
+            f"Load: {load_seconds:.1f}s ({total_rows / load_seconds if load_seconds else 0:.0f} rows/s), "
+            f"indexes: {stats.wall_seconds['indexes']:.1f}s, "
+            f"swap: {stats.wall_seconds['swap']:.1f}s ({stats.caught_up_rows} rows changed during the rebuild)"
+        )
+        self.stdout.write(f"Done 🥙 Indexed: {total_rows}")
@@ -0,0 +1,20 @@
+from django.core.management import BaseCommand
+
+from search.indexing import search_queue_stats, flush_search_queue
+
+
+class Command(BaseCommand):
+    help = "Shows how many objects wait for search indexing and the freshness lag of the index"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--flush", action="store_true", help="Index everything that is ready right now")
+
+    def handle(self, *args, **options):
+        stats = search_queue_stats()
+        self.stdout.write(f"Pending: {stats['pending']}, lag: {stats['lag_seconds']:.1f}s")
+
+        if options["flush"]:
+            flushed = flush_search_queue()
+            self.stdout.write(f"Indexed {flushed} objects")
+
+        self.stdout.write("Done 🥙")
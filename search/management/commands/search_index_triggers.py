@@ -0,0 +1,21 @@
+from django.core.management import BaseCommand
+
+from search.triggers import install_search_triggers, uninstall_search_triggers
+
+
+class Command(BaseCommand):
+    help = "Installs or removes generated search vectors and triggers which maintain search_index in postgres"
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["install", "uninstall"])
+
+    def handle(self, *args, **options):
+        if options["action"] == "install":
+            self.stdout.write("Adding search_vector columns (rewrites posts, comments and users) and triggers...")
+            install_search_triggers()
+            self.stdout.write("Installed, now turn on features.SEARCH_INDEX_TRIGGERS")
+        else:
+            uninstall_search_triggers()
+            self.stdout.write("Removed, make sure features.SEARCH_INDEX_TRIGGERS is off, so the app indexes content")
+
+        self.stdout.write("Done 🥙")
@@ -0,0 +1,90 @@
+"""
+In-process prefix index of members for @-mention autocomplete (features.MENTION_PREFIX_INDEX).
+
+Autocomplete asks for every typed letter, so instead of a query per keystroke every worker keeps
+a sorted list of lowercased slugs and names of approved members and finds a prefix with bisect.
+The list is rebuilt every MENTION_INDEX_REFRESH_SECONDS, new members appear in autocomplete after that.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+
+from users.models.user import User
+
+
+class PrefixIndex:
+    def __init__(self, entries):
+        """
+        entries: (key, item) pairs, an item can be found by the prefix of any of its keys
+        """
+        pairs = sorted(((key.lower(), item) for key, item in entries if key), key=lambda pair: pair[0])
+        self._keys = [key for key, _ in pairs]
+        self._items = [item for _, item in pairs]
+
+    def find(self, prefix):
+        prefix = prefix.lower()
+        start = bisect_left(self._keys, prefix)
+        end = bisect_right(self._keys, prefix + chr(0x10FFFF), lo=start)
+        return self._items[start:end]
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class MemberIndex:
+    """
+    Lazily built and refreshed PrefixIndex of members, one per worker process
+    """
+
+    def __init__(self, refresh_seconds):
+        self.refresh_seconds = refresh_seconds
+        self._index = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def find(self, prefix, limit):
+        """
+        Members whose slug or name starts with the prefix, recently active first
+        """
+        # a member is found once, even if both the slug and the name match
+        found = {member["slug"]: (activity, member) for activity, member in self._current().find(prefix)}
+        ranked = sorted(found.values(), key=lambda item: item[0], reverse=True)
+        return [member for _, member in ranked[:limit]]
+
+    def invalidate(self):
+        self._built_at = 0.0
+
+    def _current(self):
+        if self._index is None or time.monotonic() - self._built_at > self.refresh_seconds:
+            # only the first request waits for the build, others are served by the old index meanwhile
+            if self._lock.acquire(blocking=self._index is None):
+                try:
+                    if self._index is None or time.monotonic() - self._built_at > self.refresh_seconds:
+                        self._index = build_member_index()
+                        self._built_at = time.monotonic()
+                finally:
+                    self._lock.release()
+        return self._index
+
+
+def build_member_index():
+    entries = []
+    for slug, full_name, avatar, last_activity_at in User.registered_members().values_list(
+        "slug", "full_name", "avatar", "last_activity_at"
+    ):
+        member = (last_activity_at, {
+            "slug": slug,
+            "full_name": full_name,
+            "avatar": avatar or settings.DEFAULT_AVATAR,  # User.get_avatar()
+        })
+        entries.append((slug, member))
+        entries.append((full_name, member))
+        for word in (full_name or "").split()[1:]:
+            entries.append((word, member))  # "ivan petrov" is also found by "pet"
+
+    return PrefixIndex(entries)
+
+
+member_index = MemberIndex(refresh_seconds=settings.MENTION_INDEX_REFRESH_SECONDS)
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def create_schedule(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.update_or_create(
+        name="flush_search_queue",
+        defaults=dict(
+            func="search.indexing.flush_search_queue",
+            schedule_type="I",  # Schedule.MINUTES
+            minutes=1,
+            repeats=-1,
+        ),
+    )
+
+
+def delete_schedule(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(name="flush_search_queue").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0006_searchindex_unique_per_type_object'),
+        ('django_q', '0019_alter_task_options_alter_ormq_key_alter_ormq_lock_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_schedule, delete_schedule),
+    ]
@@ -0,0 +1,29 @@
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False  # search_index is big, indexes are built without blocking writes
+
+    dependencies = [
+        ('search', '0007_schedule_flush_search_queue'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='searchindex',
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper('title'), name='gin_trgm_ops'
+                ),
+                name='search_index_title_trgm',
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name='searchindex',
+            index=models.Index(django.db.models.functions.text.Upper('author'), name='search_index_author_upper'),
+        ),
+    ]
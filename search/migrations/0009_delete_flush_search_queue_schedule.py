@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def delete_schedule(apps, schema_editor):
+    # the queue is flushed by `manage.py flush_search_queue` from etc/crontab now
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(name="flush_search_queue").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0008_searchindex_title_trgm_author_upper'),
+        ('django_q', '0019_alter_task_options_alter_ormq_key_alter_ormq_lock_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_schedule, migrations.RunPython.noop),
+    ]
@@ -2,12 +2,12 @@ from datetime import datetime
 from uuid import uuid4
 
 from django.contrib.postgres.fields import ArrayField
-from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.contrib.postgres.search import SearchVectorField, SearchVector, SearchRank, SearchQuery
 from django.core.exceptions import MultipleObjectsReturned
 from django.db import models, IntegrityError
 from django.db.models import F, Value, FloatField
-from django.db.models.functions import Coalesce, Ln
+from django.db.models.functions import Coalesce, Ln, Upper
 
 from comments.models import Comment
 from posts.models.post import Post
@@ -48,6 +48,9 @@ class SearchIndex(models.Model):
         ordering = ["-created_at"]
         indexes = [
             GinIndex(fields=["index"], fastupdate=False),
+            # title:/-title: operators (icontains) and author:/-author: (iexact) compare UPPER() of the column
+            GinIndex(OpClass(Upper("title"), name="gin_trgm_ops"), name="search_index_title_trgm"),
+            models.Index(Upper("author"), name="search_index_author_upper"),
         ]
         constraints = [
             models.UniqueConstraint(
@@ -68,12 +71,16 @@ class SearchIndex(models.Model):
         ]
 
     @classmethod
-    def search(cls, query):
+    def search(cls, query, queryset=None, candidate_limit=None):
+        """
+        Ranked search over the queryset (all rows by default). With candidate_limit it's done in two phases:
+        the GIN index finds matching rows, only candidate_limit most upvoted and recent of them are ranked
+        """
         parsed = parse_search_query(query)
         normalized_query = parsed["query"]
         has_quoted_phrase = '"' in normalized_query
 
-        result = SearchIndex.objects.all()
+        result = queryset if queryset is not None else SearchIndex.objects.all()
 
         if parsed["author"]:
             result = result.filter(author__iexact=parsed["author"])
@@ -106,23 +113,25 @@ class SearchIndex(models.Model):
 
         sq_simple = SearchQuery(normalized_query, config="simple", search_type="websearch")
         if has_quoted_phrase:
-            return result\
-                .annotate(
-                    text_rank=SearchRank(F("index"), sq_simple),
-                    popularity_rank=Coalesce(Ln(F("upvotes") + Value(1.0)), Value(0.0)),
-                )\
-                .annotate(rank=F("text_rank") + F("popularity_rank") * Value(0.05))\
-                .filter(index=sq_simple, text_rank__gt=0)
+            match = sq_simple
+            text_rank = SearchRank(F("index"), sq_simple)
+        else:
+            sq_stemmed = SearchQuery(normalized_query, config="russian", search_type="websearch")
+            match = sq_simple | sq_stemmed
+            text_rank = SearchRank(F("index"), sq_simple) * 2 + SearchRank(F("index"), sq_stemmed)
 
-        sq_stemmed = SearchQuery(normalized_query, config="russian", search_type="websearch")
+        if candidate_limit:
+            # ranking reads the whole vector of every row, so only the best candidates get there
+            candidates = result.filter(index=match).order_by("-upvotes", "-created_at").values("id")
+            result = SearchIndex.objects.filter(id__in=candidates[:candidate_limit])
 
         return result\
             .annotate(
-                text_rank=SearchRank(F("index"), sq_simple) * 2 + SearchRank(F("index"), sq_stemmed),
+                text_rank=text_rank,
                 popularity_rank=Coalesce(Ln(F("upvotes") + Value(1.0)), Value(0.0)),
             )\
             .annotate(rank=F("text_rank") + F("popularity_rank") * Value(0.05))\
-            .filter(index=sq_simple | sq_stemmed, text_rank__gt=0)
+            .filter(index=match, text_rank__gt=0)
 
     @classmethod
     def update_comment_index(cls, comment):
@@ -0,0 +1,270 @@
+"""
+Zero-downtime rebuild of the search index.
+
+Instead of emptying search_index and refilling it row by row, a shadow table is filled with set-based
+INSERT ... SELECT statements (the ones of search.indexing), in pk ranges which can be loaded by parallel workers.
+
+Indexes are built after the load, which is much faster than keeping them up to date on every insert.
+Rows changed by the regular incremental indexing during the rebuild are copied over, then the shadow
+table replaces search_index in one short transaction, taking the names of its indexes and constraints.
+"""
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from django.db import connection, transaction, IntegrityError
+
+from comments.models import Comment
+from posts.models.post import Post
+from search.cache import bump_search_generation
+from search.indexing import TABLE, COLUMNS, OBJECT_COLUMNS, select_sql, select_params
+from search.models import SearchIndex
+from users.models.user import User
+from utils.queryset import chunked_pk_ranges
+
+log = logging.getLogger(__name__)
+
+SHADOW_TABLE = f"{TABLE}_shadow"
+SHADOW_SUFFIX = "_shadow"
+
+# type -> the object it indexes, used to match rows of both tables
+OBJECT_ID_SQL = "case type when 'post' then post_id when 'comment' then comment_id else user_id end"
+
+RANGE_WHERE = "(%(start_pk)s::uuid is null or {id} > %(start_pk)s::uuid) and {id} <= %(end_pk)s::uuid"
+
+LOAD_SQL = {
+    type: f"insert into {SHADOW_TABLE} ({COLUMNS}) {select_sql(type, where=RANGE_WHERE)}"
+    for type in OBJECT_COLUMNS
+}
+
+
+@dataclass
+class RebuildStats:
+    rows: dict = field(default_factory=dict)  # type -> loaded rows
+    load_seconds: dict = field(default_factory=dict)  # type -> seconds spent by all workers
+    wall_seconds: dict = field(default_factory=dict)  # load, indexes, swap -> seconds
+    kept_rows: int = 0  # rows of types which were not rebuilt
+    caught_up_rows: int = 0
+
+    def rows_per_second(self, type):
+        seconds = self.load_seconds.get(type) or 0
+        return self.rows.get(type, 0) / seconds if seconds else 0.0
+
+
+def content_querysets():
+    return {
+        SearchIndex.TYPE_COMMENT: Comment.visible_objects()
+        .filter(is_deleted=False)
+        .exclude(post__visibility=Post.VISIBILITY_DRAFT),
+        SearchIndex.TYPE_POST: Post.objects.exclude(visibility=Post.VISIBILITY_DRAFT),
+        SearchIndex.TYPE_USER: User.objects.filter(moderation_status=User.MODERATION_STATUS_APPROVED),
+    }
+
+
+def rebuild_search_index(workers=4, chunk_size=5000, types=None, on_progress=None):
+    """
+    Rebuilds search_index through a shadow table, search keeps working on the old one until the swap
+    """
+    stats = RebuildStats()
+    started_at = datetime.utcnow()
+    querysets = content_querysets()
+    types = types or list(querysets.keys())
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"drop table if exists {SHADOW_TABLE}")  # leftovers of a failed run
+        cursor.execute(f"create table {SHADOW_TABLE} (like {TABLE} including defaults including constraints)")
+
+    # load
+    timer = time.monotonic()
+    jobs = [
+        (type, start_pk, end_pk)
+        for type in types
+        for start_pk, end_pk in chunked_pk_ranges(querysets[type].order_by(), chunk_size=chunk_size)
+    ]
+
+    def load(job):
+        type, start_pk, end_pk = job
+        try:
+            job_timer = time.monotonic()
+            rows = load_chunk(type, start_pk, end_pk, now=started_at)
+            return type, rows, time.monotonic() - job_timer
+        finally:
+            if workers > 1:
+                connection.close()  # every thread has its own connection
+
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(load, jobs)
+            _collect(results, stats, on_progress)
+    else:
+        _collect(map(load, jobs), stats, on_progress)
+    stats.wall_seconds["load"] = time.monotonic() - timer
+
+    # types which are not rebuilt are kept as they are
+    kept_types = [type for type in querysets if type not in types]
+    if kept_types:
+        stats.kept_rows = copy_live_rows(kept_types)
+
+    # indexes and constraints are built once, after the load
+    timer = time.monotonic()
+    renames = build_shadow_indexes()
+    stats.wall_seconds["indexes"] = time.monotonic() - timer
+
+    # most of the changes made during the rebuild are copied without blocking search
+    timer = time.monotonic()
+    caught_up_at = datetime.utcnow()
+    stats.caught_up_rows = catch_up(started_at)
+    stats.caught_up_rows += swap(caught_up_at, renames)
+    stats.wall_seconds["swap"] = time.monotonic() - timer
+
+    validate_foreign_keys()
+    bump_search_generation()
+    return stats
+
+
+def load_chunk(type, start_pk, end_pk, now):
+    with connection.cursor() as cursor:
+        cursor.execute(LOAD_SQL[type], select_params(start_pk=start_pk, end_pk=end_pk, now=now))
+        return cursor.rowcount
+
+
+def copy_live_rows(types):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"insert into {SHADOW_TABLE} ({COLUMNS}) select {COLUMNS} from {TABLE} where type = any(%s)",
+            [list(types)],
+        )
+        return cursor.rowcount
+
+
+def build_shadow_indexes():
+    """
+    Copies indexes and unique/primary constraints of search_index to the shadow table under temporary names,
+    returns [(is_constraint, temporary name, original name)] to rename them after the swap
+    """
+    renames = []
+    with connection.cursor() as cursor:
+        for name, definition in _live_indexes(cursor):
+            shadow_name = f"{name}{SHADOW_SUFFIX}"
+            definition = definition.replace(f"INDEX {name} ON ", f"INDEX {shadow_name} ON ", 1)
+            definition = re.sub(rf" ON (\S+\.)?{TABLE} USING ", rf" ON \g<1>{SHADOW_TABLE} USING ", definition, count=1)
+            cursor.execute(definition)
+            renames.append((False, shadow_name, name))
+
+        for name, definition in _live_constraints(cursor, types=("p", "u")):
+            shadow_name = f"{name}{SHADOW_SUFFIX}"
+            cursor.execute(f"alter table {SHADOW_TABLE} add constraint {shadow_name} {definition}")
+            renames.append((True, shadow_name, name))
+
+        cursor.execute(f"analyze {SHADOW_TABLE}")
+
+    return renames
+
+
+def catch_up(since):
+    """
+    Replaces shadow rows of objects changed since the given moment with the rows from the live table
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("drop table if exists search_index_changed")
+        cursor.execute(f"""
+            create temporary table search_index_changed on commit drop as
+            select 'comment' as type, id from comments where updated_at >= %(since)s
+            union select 'post', id from posts where updated_at >= %(since)s
+            union select 'user', id from users where updated_at >= %(since)s
+            union select type, {OBJECT_ID_SQL} from {TABLE} where updated_at >= %(since)s
+        """, {"since": since})
+        cursor.execute(f"""
+            delete from {SHADOW_TABLE}
+            where (type, {OBJECT_ID_SQL}) in (select type, id from search_index_changed)
+        """)
+        cursor.execute(f"""
+            insert into {SHADOW_TABLE} ({COLUMNS})
+            select {COLUMNS} from {TABLE}
+            where (type, {OBJECT_ID_SQL}) in (select type, id from search_index_changed)
+        """)
+        caught_up_rows = cursor.rowcount
+
+        # hard deleted objects don't leave a trace in updated_at
+        cursor.execute(f"""
+            delete from {SHADOW_TABLE} as shadow
+            where (shadow.post_id is not null and not exists (select 1 from posts where id = shadow.post_id))
+                or (shadow.comment_id is not null and not exists (select 1 from comments where id = shadow.comment_id))
+                or (shadow.user_id is not null and not exists (select 1 from users where id = shadow.user_id))
+        """)
+
+    return caught_up_rows
+
+
+def swap(since, renames):
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # incremental indexing waits for the swap from here on, search reads too (for a moment)
+            cursor.execute(f"lock table {TABLE} in access exclusive mode")
+
+        caught_up_rows = catch_up(since)
+
+        with connection.cursor() as cursor:
+            foreign_keys = _live_constraints(cursor, types=("f",))
+            # deferred foreign key checks of rows written in an outer transaction don't let the table be dropped
+            cursor.execute("set constraints all immediate")
+            cursor.execute(f"drop table {TABLE}")
+            cursor.execute(f"alter table {SHADOW_TABLE} rename to {TABLE}")
+
+            for is_constraint, shadow_name, name in renames:
+                if is_constraint:
+                    cursor.execute(f"alter table {TABLE} rename constraint {shadow_name} to {name}")
+                else:
+                    cursor.execute(f"alter index {shadow_name} rename to {name}")
+
+            # checked later, without blocking writes to posts, comments and users
+            for name, definition in foreign_keys:
+                cursor.execute(f"alter table {TABLE} add constraint {name} {definition} not valid")
+
+    return caught_up_rows
+
+
+def validate_foreign_keys():
+    with connection.cursor() as cursor:
+        for name, _ in _live_constraints(cursor, types=("f",), only_not_valid=True):
+            try:
+                with transaction.atomic():
+                    cursor.execute(f"alter table {TABLE} validate constraint {name}")
+            except IntegrityError as ex:
+                # the constraint still works for new rows, the next rebuild will try again
+                log.warning(f"Can't validate {name} of the rebuilt search index: {ex}")
+
+
+def _collect(results, stats, on_progress):
+    for type, rows, seconds in results:
+        stats.rows[type] = stats.rows.get(type, 0) + rows
+        stats.load_seconds[type] = stats.load_seconds.get(type, 0.0) + seconds
+        if on_progress:
+            on_progress(type, stats)
+
+
+def _live_indexes(cursor):
+    # indexes behind constraints (the primary key) are created together with their constraints
+    cursor.execute("""
+        select index_class.relname, pg_get_indexdef(index_class.oid)
+        from pg_index
+            join pg_class as index_class on index_class.oid = pg_index.indexrelid
+        where pg_index.indrelid = %s::regclass
+            and not exists (
+                select 1 from pg_constraint
+                where pg_constraint.conindid = pg_index.indexrelid and pg_constraint.conrelid = pg_index.indrelid
+            )
+    """, [TABLE])
+    return cursor.fetchall()
+
+
+def _live_constraints(cursor, types, only_not_valid=False):
+    cursor.execute("""
+        select conname, pg_get_constraintdef(oid)
+        from pg_constraint
+        where conrelid = %s::regclass and contype = any(%s) and (not %s or not convalidated)
+    """, [TABLE, list(types), only_not_valid])
+    return cursor.fetchall()
@@ -0,0 +1,77 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory, override_settings
+
+from debug.utils_for_tests import create_approved_user
+from posts.models.post import Post
+from search.cache import search_result_ids, paginate_cached_search, bump_search_generation, GENERATION_KEY
+from search.indexing import index_objects
+from search.models import SearchIndex
+
+
+class TestSearchResultCache(TestCase):
+    def setUp(self):
+        cache.delete(GENERATION_KEY)
+        self.author = create_approved_user("cache_author")
+        self.posts = [
+            Post.objects.create(
+                slug=f"cache-post-{i}",
+                title=f"Квас рецепт {i}",
+                text="Квас на ржаном хлебе" * (i + 1),
+                type=Post.TYPE_POST,
+                author=self.author,
+                visibility=Post.VISIBILITY_EVERYWHERE,
+                upvotes=i,
+            )
+            for i in range(3)
+        ]
+        index_objects(SearchIndex.TYPE_POST, [post.id for post in self.posts])
+
+    def test_ranked_once_until_the_index_changes(self):
+        ids, count = search_result_ids("квас", SearchIndex.TYPE_POST, "-upvotes")
+        self.assertEqual(count, 3)
+        self.assertEqual(
+            ids, list(SearchIndex.objects.filter(post__in=self.posts).order_by("-upvotes").values_list("id", flat=True))
+        )
+
+        with patch.object(SearchIndex, "search") as search:
+            # the same query with other spaces, filters are in the key too
+            self.assertEqual(search_result_ids("  квас ", SearchIndex.TYPE_POST, "-upvotes"), (ids, count))
+            search.assert_not_called()
+
+        Post.objects.filter(id=self.posts[0].id).update(visibility=Post.VISIBILITY_DRAFT)
+        index_objects(SearchIndex.TYPE_POST, [self.posts[0].id])
+
+        self.assertEqual(search_result_ids("квас", SearchIndex.TYPE_POST, "-upvotes")[1], 2)
+
+    def test_pages_are_served_from_ids(self):
+        bump_search_generation()
+        request = RequestFactory().get("/search/", {"q": "квас", "page": 2})
+
+        page = paginate_cached_search(request, "квас", None, "-upvotes", page_size=2)
+
+        self.assertEqual([result.post_id for result in page], [self.posts[0].id])
+        self.assertEqual(page.paginator.num_pages, 2)
+
+    @override_settings(SEARCH_CACHE_MAX_RESULTS=2, SEARCH_APPROXIMATE_COUNT=False)
+    def test_pages_past_the_cached_ids_are_loaded_from_the_database(self):
+        bump_search_generation()
+        request = RequestFactory().get("/search/", {"q": "квас", "page": 2})
+
+        page = paginate_cached_search(request, "квас", None, "-upvotes", page_size=2)
+
+        self.assertEqual([result.post_id for result in page], [self.posts[0].id])
+        self.assertEqual(page.paginator.hits, 3)
+        self.assertEqual(page.paginator.num_pages, 2)
+
+    @override_settings(SEARCH_CACHE_MAX_RESULTS=2, SEARCH_APPROXIMATE_COUNT=True)
+    def test_hits_past_the_cached_ids_are_estimated(self):
+        bump_search_generation()
+        request = RequestFactory().get("/search/", {"q": "квас"})
+
+        with patch("search.cache.estimate_count", return_value=40):
+            page = paginate_cached_search(request, "квас", None, "-upvotes", page_size=2)
+
+        self.assertEqual(page.paginator.hits, 40)
+        self.assertTrue(page.paginator.is_approximate)
@@ -0,0 +1,112 @@
+import time
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from comments.models import Comment
+from debug.utils_for_tests import create_approved_user
+from posts.models.post import Post
+from search.indexing import index_objects, index_later, flush_search_queue, search_queue_stats, \
+    redis_client, QUEUE_KEY
+from search.models import SearchIndex
+from tags.models import Tag, UserTag
+
+
+class TestBulkIndexing(TestCase):
+    def setUp(self):
+        self.author = create_approved_user("indexing_author", bio="Паяю платы")
+        self.post = Post.objects.create(
+            slug="indexing-post",
+            title="Паяльная станция",
+            text="Выбираю паяльник",
+            type=Post.TYPE_POST,
+            author=self.author,
+            visibility=Post.VISIBILITY_EVERYWHERE,
+        )
+        self.comment = Comment.objects.create(post=self.post, author=self.author, text="Бери с феном")
+        tag = Tag.objects.create(code="hardware", name="Железо", group=Tag.GROUP_HOBBIES)
+        UserTag.objects.create(user=self.author, tag=tag, name=tag.name)
+
+    def _index(self):
+        return {
+            (row.type, row.post_id, row.comment_id, row.user_id): (row.index, row.author, row.title, row.tags)
+            for row in SearchIndex.objects.all()
+        }
+
+    def test_same_rows_as_update_index(self):
+        SearchIndex.update_post_index(self.post)
+        SearchIndex.update_comment_index(self.comment)
+        SearchIndex.update_user_index(self.author)
+        SearchIndex.update_user_tags(self.author)
+        expected_index = self._index()
+        SearchIndex.objects.all().delete()
+
+        index_objects(SearchIndex.TYPE_POST, [self.post.id])
+        index_objects(SearchIndex.TYPE_COMMENT, [self.comment.id])
+        index_objects(SearchIndex.TYPE_USER, [self.author.id])
+
+        self.assertEqual(self._index(), expected_index)
+
+    def test_upsert_and_removal(self):
+        index_objects(SearchIndex.TYPE_POST, [self.post.id])
+        index_objects(SearchIndex.TYPE_COMMENT, [self.comment.id])
+        row_id = SearchIndex.objects.get(post=self.post, type=SearchIndex.TYPE_POST).id
+
+        Post.objects.filter(id=self.post.id).update(title="Паяльная станция с феном")
+        index_objects(SearchIndex.TYPE_POST, [self.post.id])
+
+        row = SearchIndex.objects.get(post=self.post, type=SearchIndex.TYPE_POST)
+        self.assertEqual((row.id, row.title), (row_id, "Паяльная станция с феном"))
+
+        Post.objects.filter(id=self.post.id).update(visibility=Post.VISIBILITY_DRAFT)
+        index_objects(SearchIndex.TYPE_POST, [self.post.id])
+
+        self.assertFalse(SearchIndex.objects.filter(post=self.post).exists())  # comments of the draft too
+
+
+class TestIndexingQueue(TestCase):
+    def setUp(self):
+        self.author = create_approved_user("queue_author")
+        self.redis = redis_client()
+        self.redis.delete(QUEUE_KEY)
+
+    def tearDown(self):
+        self.redis.delete(QUEUE_KEY)
+
+    def test_without_the_feature_indexes_right_away(self):
+        index_later(SearchIndex.TYPE_USER, self.author.id)
+
+        self.assertTrue(SearchIndex.objects.filter(user=self.author).exists())
+        self.assertEqual(search_queue_stats()["pending"], 0)
+
+    @patch("club.features.SEARCH_INDEX_QUEUE", True)
+    @override_settings(SEARCH_INDEX_DEBOUNCE_SECONDS=0)
+    def test_changes_are_coalesced(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            index_later(SearchIndex.TYPE_USER, self.author.id)
+            index_later(SearchIndex.TYPE_USER, self.author.id)
+
+        self.assertEqual(search_queue_stats()["pending"], 1)
+        self.assertFalse(SearchIndex.objects.filter(user=self.author).exists())
+
+        self.assertEqual(flush_search_queue(), 1)
+        self.assertTrue(SearchIndex.objects.filter(user=self.author).exists())
+        self.assertEqual(search_queue_stats(), {"pending": 0, "lag_seconds": 0.0})
+
+    @patch("club.features.SEARCH_INDEX_QUEUE", True)
+    @override_settings(SEARCH_INDEX_DEBOUNCE_SECONDS=60)
+    def test_recent_changes_wait_for_debounce(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            index_later(SearchIndex.TYPE_USER, self.author.id)
+
+        self.assertEqual(flush_search_queue(), 0)
+
+        self.assertEqual(search_queue_stats()["pending"], 1)
+
+    def test_lag(self):
+        self.redis.zadd(QUEUE_KEY, {f"user:{self.author.id}": time.time() - 30})
+
+        stats = search_queue_stats()
+
+        self.assertEqual(stats["pending"], 1)
+        self.assertGreaterEqual(stats["lag_seconds"], 30)
@@ -0,0 +1,42 @@
+from unittest.mock import patch
+
+from django.test import Client, TestCase
+
+from debug.utils_for_tests import create_approved_user, login
+from search.mentions import PrefixIndex, member_index
+
+
+class TestPrefixIndex(TestCase):
+    def test_find(self):
+        index = PrefixIndex([("Vas3k", 1), ("vasya", 2), ("vanya", 3), ("", 4)])
+
+        self.assertEqual(index.find("vas"), [1, 2])
+        self.assertEqual(index.find("VASY"), [2])
+        self.assertEqual(index.find("x"), [])
+        self.assertEqual(len(index), 3)
+
+
+@patch("club.features.MENTION_PREFIX_INDEX", True)
+class TestMentionAutocomplete(TestCase):
+    def setUp(self):
+        self.viewer = create_approved_user("mention_viewer")
+        self.client = Client()
+        login(self.client, self.viewer)
+        member_index.invalidate()
+
+    def tearDown(self):
+        member_index.invalidate()
+
+    def test_by_slug_and_name(self):
+        member = create_approved_user("mentioned_member", full_name="Пётр Каменский")
+        member_index.invalidate()
+
+        member_index.find("men", limit=1)  # builds the index
+        with self.assertNumQueries(0):
+            self.assertEqual([user["slug"] for user in member_index.find("mentioned", limit=5)], [member.slug])
+
+        by_slug = self.client.get("/search/users.json", data={"prefix": "mentioned"}).json()["users"]
+        by_name = self.client.get("/search/users.json", data={"prefix": "камен"}).json()["users"]
+
+        self.assertEqual(by_slug, [{"slug": member.slug, "full_name": member.full_name, "avatar": member.get_avatar()}])
+        self.assertEqual([user["slug"] for user in by_name], [member.slug])
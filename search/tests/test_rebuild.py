@@ -0,0 +1,93 @@
+from datetime import datetime
+
+from django.db import connection
+from django.test import TestCase
+
+from comments.models import Comment
+from debug.utils_for_tests import create_approved_user
+from posts.models.post import Post
+from search.models import SearchIndex
+from search.rebuild import rebuild_search_index, TABLE
+from users.models.user import User
+
+
+def table_indexes():
+    with connection.cursor() as cursor:
+        cursor.execute("select indexname from pg_indexes where tablename = %s", [TABLE])
+        return {row[0] for row in cursor.fetchall()}
+
+
+class TestShadowRebuild(TestCase):
+    def setUp(self):
+        self.author = create_approved_user("rebuild_author", bio="Пишу про ардуино")
+        self.post = Post.objects.create(
+            slug="rebuild-post",
+            title="Умный дом на ардуино",
+            text="Купил ардуино и радуюсь",
+            type=Post.TYPE_POST,
+            author=self.author,
+            visibility=Post.VISIBILITY_EVERYWHERE,
+        )
+        self.intro = Post.upsert_user_intro(self.author, "Привет, я делаю умный дом")
+        self.comment = Comment.objects.create(post=self.post, author=self.author, text="Дом тоже умный")
+        Post.objects.create(
+            slug="rebuild-draft",
+            title="Черновик",
+            text="text",
+            type=Post.TYPE_POST,
+            author=self.author,
+            visibility=Post.VISIBILITY_DRAFT,
+        )
+
+    def _index_incrementally(self):
+        # data migrations create posts and users too
+        for post in Post.objects.exclude(visibility=Post.VISIBILITY_DRAFT):
+            SearchIndex.update_post_index(post)
+        SearchIndex.update_comment_index(self.comment)
+        for user in User.objects.filter(moderation_status=User.MODERATION_STATUS_APPROVED):
+            SearchIndex.update_user_index(user)
+            SearchIndex.update_user_tags(user)
+
+    def _index(self):
+        return {
+            (row.type, row.post_id, row.comment_id, row.user_id): (row.index, row.author, row.title, row.tags)
+            for row in SearchIndex.objects.all()
+        }
+
+    def test_same_rows_as_incremental_indexing(self):
+        self._index_incrementally()
+        incremental_index = self._index()
+        indexes = table_indexes()
+
+        stats = rebuild_search_index(workers=1, chunk_size=1)
+
+        self.assertEqual(self._index(), incremental_index)
+        self.assertEqual(table_indexes(), indexes)
+        published_posts = Post.objects.exclude(visibility=Post.VISIBILITY_DRAFT).count()
+        self.assertEqual(stats.rows[SearchIndex.TYPE_POST], published_posts)  # drafts are skipped
+        self.assertEqual(SearchIndex.search("ардуино").filter(type=SearchIndex.TYPE_POST).count(), 1)
+
+    def test_changes_during_the_rebuild_are_kept(self):
+        SearchIndex.update_comment_index(self.comment)
+
+        def edit_during_rebuild(type, stats):
+            SearchIndex.objects.filter(comment=self.comment).update(
+                title="changed during the rebuild", updated_at=datetime.utcnow(),
+            )
+
+        rebuild_search_index(workers=1, on_progress=edit_during_rebuild)
+
+        self.assertEqual(SearchIndex.objects.get(comment=self.comment).title, "changed during the rebuild")
+
+    def test_other_types_are_kept_when_rebuilding_one(self):
+        self._index_incrementally()
+        SearchIndex.objects.filter(comment=self.comment).update(title="kept as it is")
+        other_rows = SearchIndex.objects.exclude(type=SearchIndex.TYPE_POST).count()
+
+        stats = rebuild_search_index(workers=1, types=[SearchIndex.TYPE_POST])
+
+        self.assertEqual(stats.kept_rows, other_rows)
+        self.assertEqual(SearchIndex.objects.get(comment=self.comment).title, "kept as it is")
+        self.assertTrue(SearchIndex.objects.filter(type=SearchIndex.TYPE_USER, user=self.author).exists())
+        post_rows = SearchIndex.objects.filter(type=SearchIndex.TYPE_POST).count()
+        self.assertEqual(post_rows, stats.rows[SearchIndex.TYPE_POST])
@@ -0,0 +1,64 @@
+from django.test import TestCase
+
+from comments.models import Comment
+from debug.utils_for_tests import create_approved_user
+from posts.models.post import Post
+from search.models import SearchIndex
+from search.triggers import install_search_triggers
+from tags.models import Tag, UserTag
+from users.models.user import User
+
+
+class TestSearchIndexTriggers(TestCase):
+    def setUp(self):
+        install_search_triggers(concurrently=False)  # rolled back with the test
+
+        self.author = create_approved_user("triggers_author", bio="Варю сыр")
+        self.post = Post.objects.create(
+            slug="triggers-post",
+            title="Сыроварня дома",
+            text="Купил закваску",
+            type=Post.TYPE_POST,
+            author=self.author,
+            visibility=Post.VISIBILITY_EVERYWHERE,
+        )
+        self.comment = Comment.objects.create(post=self.post, author=self.author, text="Какую закваску?")
+
+    def assertSameAsUpdateIndex(self, row, update_index, obj):
+        # the application side indexing of the same object gives the same vector
+        update_index(obj)
+        self.assertEqual(row.index, SearchIndex.objects.get(id=row.id).index)
+
+    def test_new_content_is_indexed(self):
+        post_row = SearchIndex.objects.get(post=self.post, type=SearchIndex.TYPE_POST)
+        comment_row = SearchIndex.objects.get(comment=self.comment)
+        user_row = SearchIndex.objects.get(user=self.author)
+
+        self.assertEqual(comment_row.title, "Сыроварня дома")
+        self.assertSameAsUpdateIndex(post_row, SearchIndex.update_post_index, self.post)
+        self.assertSameAsUpdateIndex(comment_row, SearchIndex.update_comment_index, self.comment)
+        self.assertSameAsUpdateIndex(user_row, SearchIndex.update_user_index, self.author)
+
+    def test_changes_are_indexed(self):
+        self.post.title = "Сыроварня на балконе"
+        self.post.save()
+        self.comment.text = "Мезофильную"
+        self.comment.save()
+        tag = Tag.objects.create(code="cheese", name="Сыр", group=Tag.GROUP_HOBBIES)
+        UserTag.objects.create(user=self.author, tag=tag, name=tag.name)
+
+        self.assertEqual(SearchIndex.objects.get(comment=self.comment).title, "Сыроварня на балконе")
+        self.assertEqual(SearchIndex.search("мезофильную").get().comment_id, self.comment.id)
+        self.assertEqual(SearchIndex.objects.get(user=self.author).tags, ["cheese"])
+
+    def test_hidden_content_is_removed(self):
+        self.comment.delete(deleted_by=self.author)
+        self.assertFalse(SearchIndex.objects.filter(comment=self.comment).exists())
+
+        self.post.visibility = Post.VISIBILITY_DRAFT
+        self.post.save()
+        self.assertFalse(SearchIndex.objects.filter(post=self.post).exists())
+
+        self.author.moderation_status = User.MODERATION_STATUS_REJECTED
+        self.author.save()
+        self.assertFalse(SearchIndex.objects.filter(user=self.author).exists())
@@ -0,0 +1,51 @@
+from django.test import TestCase
+
+from debug.utils_for_tests import create_approved_user
+from posts.models.post import Post
+from search.indexing import index_objects
+from search.models import SearchIndex
+from utils.queryset import estimate_count
+
+
+class TestTwoPhaseSearch(TestCase):
+    def setUp(self):
+        self.author = create_approved_user("two_phase_author")
+        self.posts = [
+            Post.objects.create(
+                slug=f"two-phase-{i}",
+                title=f"Байдарка {i}",
+                text="Сплав на байдарке " * (3 - i),
+                type=Post.TYPE_POST,
+                author=self.author,
+                visibility=Post.VISIBILITY_EVERYWHERE,
+                upvotes=i * 10,
+            )
+            for i in range(3)
+        ]
+        Post.objects.create(
+            slug="two-phase-other", title="Палатка", text="Про палатки", type=Post.TYPE_POST,
+            author=self.author, visibility=Post.VISIBILITY_EVERYWHERE, upvotes=100,
+        )
+        post_ids = Post.objects.filter(slug__startswith="two-phase").values_list("id", flat=True)
+        index_objects(SearchIndex.TYPE_POST, post_ids)
+
+    def _ranked(self, **kwargs):
+        results = SearchIndex.search("байдарка", **kwargs).order_by("-rank", "pk")
+        return list(results.values_list("post_id", "rank"))
+
+    def test_enough_candidates_give_exact_ranking(self):
+        self.assertEqual(self._ranked(candidate_limit=100), self._ranked())
+
+    def test_only_candidates_are_ranked(self):
+        # the most upvoted match, not the most relevant one
+        self.assertEqual([post_id for post_id, _ in self._ranked(candidate_limit=1)], [self.posts[2].id])
+
+    def test_scope_is_applied_before_candidates(self):
+        scope = SearchIndex.objects.exclude(post=self.posts[2])
+
+        results = SearchIndex.search("байдарка", queryset=scope, candidate_limit=1)
+
+        self.assertEqual([result.post_id for result in results], [self.posts[1].id])
+
+    def test_estimate_count(self):
+        self.assertGreaterEqual(estimate_count(SearchIndex.search("байдарка").order_by()), 0)
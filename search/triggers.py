@@ -0,0 +1,160 @@
+"""
+Search index maintained by postgres itself (features.SEARCH_INDEX_TRIGGERS).
+
+Posts, comments and users get a stored generated search_vector column (their own texts, with a GIN index),
+and triggers upsert search_index rows from them whenever something searchable changes: the texts, visibility,
+moderation status, author slugs, room titles, intros and user tags. The app doesn't index anything then,
+search keeps querying search_index as before, and content can't drift from its index until the next rebuild.
+
+Adding stored columns rewrites the tables, so it's installed once with `manage.py search_index_triggers install`
+before turning the feature on, and can be removed with `manage.py search_index_triggers uninstall`.
+"""
+from django.db import connection, transaction
+
+from posts.models.post import Post
+from search.indexing import OBJECT_COLUMNS, OBJECT_TABLES, TABLE, upsert_sql, vector_sql
+from search.models import SearchIndex
+from users.models.user import User
+
+# plpgsql can't have query parameters, values of select_params() are inlined
+FUNCTION_PARAMS = {
+    "now": "now()",
+    "draft": f"'{Post.VISIBILITY_DRAFT}'",
+    "intro": f"'{Post.TYPE_INTRO}'",
+    "approved": f"'{User.MODERATION_STATUS_APPROVED}'",
+}
+
+
+def refresh_function_sql(type):
+    """
+    search_index_refresh_<type>(uuid[]) does the same as search.indexing.index_objects() inside postgres
+    """
+    column = OBJECT_COLUMNS[type]
+    upsert = upsert_sql(type, where="{id} = any(object_ids)", generated=True) % FUNCTION_PARAMS
+    drop_comments_of_removed_posts = f"""
+        delete from {TABLE} where post_id = any(object_ids) and not (post_id = any(indexed_ids));
+    """ if type == SearchIndex.TYPE_POST else ""
+
+    return f"""
+        create or replace function search_index_refresh_{type}(object_ids uuid[]) returns void
+        language plpgsql as $$
+        declare
+            indexed_ids uuid[];
+        begin
+            if object_ids is null or cardinality(object_ids) = 0 then
+                return;
+            end if;
+
+            with indexed as ({upsert})
+            select coalesce(array_agg({column}), '{{}}') into indexed_ids from indexed;
+
+            delete from {TABLE}
+            where type = '{type}' and {column} = any(object_ids) and not ({column} = any(indexed_ids));
+            {drop_comments_of_removed_posts}
+        end
+        $$
+    """
+
+
+def _changed(*columns):
+    return " or ".join(f"old.{column} is distinct from new.{column}" for column in columns)
+
+
+# (table, event, condition, body) of row triggers, bodies refresh search_index rows of everything affected
+TRIGGERS = [
+    ("posts", "insert", None, """
+        perform search_index_refresh_post(array[new.id]);
+        if new.type = {intro} then
+            perform search_index_refresh_user(array[new.author_id]);
+        end if;
+    """),
+    ("posts", "update", _changed("title", "text", "visibility", "author_id", "room_id", "published_at", "type"), """
+        perform search_index_refresh_post(array[new.id]);
+        if old.title is distinct from new.title or old.visibility is distinct from new.visibility then
+            -- comments are indexed with the title of their post and hidden with it
+            perform search_index_refresh_comment(array(select id from comments where post_id = new.id));
+        end if;
+        if new.type = {intro} or old.type = {intro} then
+            perform search_index_refresh_user(array[new.author_id]);
+        end if;
+    """),
+    ("comments", "insert", None, """
+        perform search_index_refresh_comment(array[new.id]);
+    """),
+    ("comments", "update", _changed("text", "is_visible", "is_deleted", "deleted_by", "author_id", "post_id"), """
+        perform search_index_refresh_comment(array[new.id]);
+    """),
+    ("users", "insert", None, """
+        perform search_index_refresh_user(array[new.id]);
+    """),
+    ("users", "update", _changed(
+        "slug", "full_name", "email", "bio", "company", "country", "city", "contact", "moderation_status",
+    ), """
+        perform search_index_refresh_user(array[new.id]);
+        if old.slug is distinct from new.slug then
+            perform search_index_refresh_post(array(select id from posts where author_id = new.id));
+            perform search_index_refresh_comment(array(select id from comments where author_id = new.id));
+        end if;
+    """),
+    ("user_tags", "insert", None, """
+        perform search_index_refresh_user(array[new.user_id]);
+    """),
+    ("user_tags", "delete", None, """
+        perform search_index_refresh_user(array[old.user_id]);
+    """),
+    ("rooms", "update", _changed("title"), """
+        perform search_index_refresh_post(array(select id from posts where room_id = new.slug));
+    """),
+]
+
+
+def _trigger_name(table, event):
+    return f"search_index_{table}_{event}"
+
+
+def install_search_triggers(concurrently=True):
+    with connection.cursor() as cursor:
+        for type, table in OBJECT_TABLES.items():
+            cursor.execute(f"""
+                alter table {table} add column if not exists search_vector tsvector
+                generated always as ({vector_sql(type, qualified=False)}) stored
+            """)
+            # can't be built concurrently inside a transaction (tests)
+            mode = "concurrently" if concurrently else ""
+            cursor.execute(
+                f"create index {mode} if not exists {table}_search_vector on {table} using gin (search_vector)"
+            )
+
+        with transaction.atomic():
+            for type in OBJECT_TABLES:
+                cursor.execute(refresh_function_sql(type))
+
+            for table, event, when, body in TRIGGERS:
+                name = _trigger_name(table, event)
+                cursor.execute(f"""
+                    create or replace function {name}() returns trigger
+                    language plpgsql as $$
+                    begin
+                        {body.format(**FUNCTION_PARAMS)}
+                        return null;
+                    end
+                    $$
+                """)
+                condition = f"when ({when})" if when else ""
+                cursor.execute(f"drop trigger if exists {name} on {table}")
+                cursor.execute(f"""
+                    create trigger {name} after {event} on {table} for each row {condition}
+                    execute function {name}()
+                """)
+
+
+def uninstall_search_triggers():
+    with transaction.atomic(), connection.cursor() as cursor:
+        for table, event, _, _ in TRIGGERS:
+            name = _trigger_name(table, event)
+            cursor.execute(f"drop trigger if exists {name} on {table}")
+            cursor.execute(f"drop function if exists {name}()")
+
+        for type, table in OBJECT_TABLES.items():
+            cursor.execute(f"drop function if exists search_index_refresh_{type}(uuid[])")
+            cursor.execute(f"alter table {table} drop column if exists search_vector")  # with its index
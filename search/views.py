@@ -2,8 +2,10 @@ from django.conf import settings
 from django.shortcuts import render, redirect
 
 from authn.decorators.auth import require_auth
-from common.pagination import paginate
-from search.models import SearchIndex
+from club import features
+from common.pagination import paginate_by_cursor
+from posts.viewer_state import attach_search_viewer_state
+from search.cache import filtered_search, paginate_cached_search
 
 ALLOWED_TYPES = {"post", "comment", "user"}
 ALLOWED_ORDERING = {"-rank", "-upvotes", "-created_at", "created_at"}
@@ -15,35 +17,29 @@ def search(request):
     if not query:
         return redirect("index")
 
-    # fetch query results
-    results = SearchIndex\
-        .search(query)\
-        .select_related("post__author", "comment__author", "comment__post", "user")
-
-    # filter them by type
     content_type = request.GET.get("type")
-    if content_type in ALLOWED_TYPES:
-        results = results.filter(type=content_type)
-    else:
+    if content_type not in ALLOWED_TYPES:
         content_type = None
 
-    # hack: exclude intros from posts page
-    if content_type == "post":
-        results = results.exclude(post__type="intro")
-
-    # exclude all deleted comments
-    results = results.exclude(comment__isnull=False, comment__is_deleted=True)
-
-    # ordering
     ordering = request.GET.get("ordering")
     if ordering not in ALLOWED_ORDERING:
         ordering = "-rank"
 
-    results = results.order_by(ordering)
+    if features.SEARCH_RESULT_CACHE:
+        # ranked once, pages are loaded by cached ids
+        results_page = paginate_cached_search(request, query, content_type, ordering)
+    else:
+        # intros are excluded from the posts page, deleted comments from everywhere
+        results = filtered_search(query, content_type, ordering=ordering)\
+            .select_related("post__author", "comment__author", "comment__post", "user")\
+            .order_by(ordering)
+        results_page = paginate_by_cursor(request, results, page_size=settings.SEARCH_PAGE_SIZE)
+
+    attach_search_viewer_state(results_page, request.me)
 
     return render(request, "search.html", {
         "type": content_type,
         "ordering": ordering,
         "query": query,
-        "results": paginate(request, results, page_size=settings.SEARCH_PAGE_SIZE),
+        "results": results_page,
     })
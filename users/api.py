@@ -1,5 +1,6 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, render
+from django.utils.cache import get_conditional_response
 
 from authn.decorators.api import api
 from badges.models import UserBadge
@@ -7,6 +8,8 @@ from club.exceptions import ApiAccessDenied
 from tags.models import UserTag
 from users.models.achievements import UserAchievement
 from users.models.user import User
+from users.people_map import clamp_zoom, map_layer, map_points, people_map_layer
+from users.views.people import filter_people, is_filtered
 
 
 def api_profile_user(request, user_slug):
@@ -84,3 +87,26 @@ def api_profile_by_telegram_id(request, telegram_id):
         user = same_telegram[0]
 
     return JsonResponse({"user": user.to_dict()})
+
+
+@api(require_auth=True)
+def api_people_map(request):
+    try:
+        zoom = clamp_zoom(request.GET.get("zoom") or 0)
+    except ValueError:
+        zoom = 0
+
+    if is_filtered(request):
+        users = filter_people(request, User.registered_members()).filter(geo__isnull=False)
+        layer = map_layer(map_points(users.order_by().values_list("slug", "avatar", "geo")), zoom)
+    else:
+        layer = people_map_layer(zoom)
+
+    conditional_response = get_conditional_response(request, etag=layer["etag"])
+    if conditional_response is not None:
+        return conditional_response
+
+    response = HttpResponse(layer["content"], content_type="application/json")
+    response["ETag"] = layer["etag"]
+    response["Cache-Control"] = "private, no-cache"  # browsers revalidate with If-None-Match and get 304
+    return response
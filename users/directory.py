@@ -0,0 +1,162 @@
+"""
+People directory facets (features.PEOPLE_FACETS).
+
+Every worker keeps a columnar snapshot of approved members in the order of the people page (newest first):
+ids, slugs, countries, cities, companies, activity and geo, plus a bitset of members for every tag.
+Filters become bitsets too (AND-ed together) and all facets of the result are counted in one pass over it.
+Facets of the whole directory are computed once, when the snapshot is built.
+
+The snapshot is rebuilt after profile edits (invalidate_member_snapshot bumps the version in the cache),
+but not more often than PEOPLE_SNAPSHOT_MIN_AGE, and every PEOPLE_SNAPSHOT_MAX_AGE anyway.
+"""
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.cache import cache
+
+from tags.models import UserTag
+from users.models.user import User
+
+VERSION_KEY = "people:snapshot:version"
+TOP_LIMIT = 5
+
+FAANG_COMPANIES = {
+    "Facebook", "Apple", "Google", "Amazon", "Netflix", "Microsoft",
+    "Фейсбук", "Гугл", "Амазон", "Нетфликс", "Майкрософт", "Микрософт",
+}
+
+
+@dataclass
+class Facets:
+    total: int = 0
+    map_stat_groups: dict = field(default_factory=dict)
+    users_for_map: list = field(default_factory=list)  # (slug, avatar, geo)
+
+
+class MemberSnapshot:
+    def __init__(self, members, user_tags, version=0):
+        """
+        members: (id, slug, avatar, country, city, company, last_activity_at, geo) rows, newest first
+        user_tags: (user_id, tag_code) pairs
+        """
+        self.version = version
+        self.built_at = time.monotonic()
+        self.ids, self.slugs, self.avatars, self.countries, self.cities, self.companies, \
+            self.activity, self.geos = [list(column) for column in zip(*members)] or [[]] * 8
+        self.positions = {user_id: position for position, user_id in enumerate(self.ids)}
+        self.all = (1 << len(self.ids)) - 1
+
+        tag_positions = {}
+        for user_id, tag_code in user_tags:
+            if user_id in self.positions:
+                tag_positions.setdefault(tag_code, []).append(self.positions[user_id])
+        self.tags = {tag_code: self.mask(positions) for tag_code, positions in tag_positions.items()}
+
+        # the page without filters doesn't need to count anything
+        self.unfiltered = self.facets(self.all)
+        self.active_countries = [
+            {"country": country, "country_count": count}
+            for country, count in Counter(country for country in self.countries if country).most_common()
+        ]
+
+    def mask(self, positions):
+        bits = bytearray((len(self.ids) + 7) // 8)
+        for position in positions:
+            bits[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(bits, "little")
+
+    def mask_where(self, column, predicate):
+        return self.mask(position for position, value in enumerate(column) if predicate(value))
+
+    def iter_positions(self, mask):
+        for byte_index, byte in enumerate(mask.to_bytes((len(self.ids) + 7) // 8, "little")):
+            while byte:
+                lowest = byte & -byte
+                yield (byte_index << 3) + lowest.bit_length() - 1
+                byte ^= lowest
+
+    def filter(self, tags=None, country=None, cities=None, companies=None, active_since=None, user_ids=None):
+        mask = self.all
+        for tag_code in tags or []:
+            mask &= self.tags.get(tag_code, 0)
+        if country:
+            mask &= self.mask_where(self.countries, lambda value: value == country)
+        if cities:
+            mask &= self.mask_where(self.cities, lambda value: value in cities)
+        if companies:
+            mask &= self.mask_where(self.companies, lambda value: value in companies)
+        if active_since:
+            mask &= self.mask_where(self.activity, lambda value: value >= active_since)
+        if user_ids is not None:
+            mask &= self.mask(self.positions[user_id] for user_id in user_ids if user_id in self.positions)
+        return mask
+
+    def facets(self, mask):
+        total = 0
+        companies, countries, cities = Counter(), Counter(), Counter()
+        users_for_map = []
+        for position in self.iter_positions(mask):
+            total += 1
+            if self.companies[position] and self.companies[position] != "-":
+                companies[self.companies[position]] += 1
+            if self.countries[position]:
+                countries[self.countries[position]] += 1
+            if self.cities[position]:
+                cities[self.cities[position]] += 1
+            if self.geos[position] is not None:
+                users_for_map.append((self.slugs[position], self.avatars[position], self.geos[position]))
+
+        return Facets(
+            total=total,
+            map_stat_groups={
+                "💼 Топ компаний": companies.most_common(TOP_LIMIT),
+                "🌍 Страны": countries.most_common(TOP_LIMIT),
+                "🏰 Города": cities.most_common(TOP_LIMIT),
+            },
+            users_for_map=users_for_map,
+        )
+
+    def user_ids(self, mask):
+        return [self.ids[position] for position in self.iter_positions(mask)]
+
+
+def build_member_snapshot(version=0):
+    members = User.registered_members().order_by("-created_at").values_list(
+        "id", "slug", "avatar", "country", "city", "company", "last_activity_at", "geo",
+    )
+    user_tags = UserTag.objects.filter(user__moderation_status=User.MODERATION_STATUS_APPROVED)\
+        .values_list("user_id", "tag_id")
+    return MemberSnapshot(list(members), user_tags.iterator(), version=version)
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def member_snapshot():
+    global _snapshot
+    version = cache.get(VERSION_KEY, 0)
+    snapshot = _snapshot
+    if snapshot is None or _is_stale(snapshot, version):
+        # only the first request waits for the build, others are served by the old snapshot meanwhile
+        if _snapshot_lock.acquire(blocking=snapshot is None):
+            try:
+                if _snapshot is None or _is_stale(_snapshot, version):
+                    _snapshot = build_member_snapshot(version)
+            finally:
+                _snapshot_lock.release()
+    return _snapshot
+
+
+def invalidate_member_snapshot():
+    cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def _is_stale(snapshot, version):
+    age = time.monotonic() - snapshot.built_at
+    if snapshot.version != version:
+        return age > settings.PEOPLE_SNAPSHOT_MIN_AGE
+    return age > settings.PEOPLE_SNAPSHOT_MAX_AGE
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from django.db import models
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+
+from users.models.user import User
+
+
+class UserCounters(models.Model):
+    """
+    Profile stats maintained incrementally by signals, see posts/counters.py
+    """
+    user = models.OneToOneField(User, primary_key=True, related_name="counters", on_delete=models.CASCADE)
+
+    posts = models.IntegerField(default=0)  # visible to everybody, own and coauthored
+    link_only_posts = models.IntegerField(default=0)  # own, only the author sees them on the profile
+    comments = models.IntegerField(default=0)
+    badges = models.JSONField(default=dict)  # badge code -> how many times the user received it
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "user_counters"
+
+    def __str__(self):
+        return f"UserCounters: {self.user_id}"
+
+    def posts_for_viewer(self, viewer):
+        if viewer and viewer.id == self.user_id:
+            return self.posts + self.link_only_posts
+        return self.posts
+
+    @classmethod
+    def increment(cls, user_id, posts=0, link_only_posts=0, comments=0, badge_code=None, badges=0):
+        """
+        Applies deltas in place. Users without a row are skipped, the row is calculated on first read
+        """
+        if not user_id:
+            return 0
+
+        update = {
+            "posts": F("posts") + posts,
+            "link_only_posts": F("link_only_posts") + link_only_posts,
+            "comments": F("comments") + comments,
+            "updated_at": datetime.utcnow(),
+        }
+        if badge_code:
+            update["badges"] = RawSQL(
+                "jsonb_set(badges, %s::text[], to_jsonb(coalesce((badges ->> %s)::int, 0) + %s))",
+                ([badge_code], badge_code, badges)
+            )
+
+        return cls.objects.filter(user_id=user_id).update(**update)
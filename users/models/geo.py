@@ -3,11 +3,13 @@ import random
 from django.db import models
 from django.db.models import Q
 
+from club import features
 
-def geo_coordinates(geo):
+
+def geo_coordinates(geo, rng=random):
     """Extract (latitude, longitude) from a geo dict, applying random offset for non-precise locations.
 
-    Returns None if geo is missing or has no coordinates.
+    Returns None if geo is missing or has no coordinates. Pass a seeded random.Random as rng for a stable offset.
     """
     if not geo:
         return None
@@ -16,8 +18,8 @@ def geo_coordinates(geo):
     if lat is None or lng is None:
         return None
     if not geo.get("precise"):
-        lat += random.uniform(-0.12, 0.12)
-        lng += random.uniform(-0.25, 0.25)
+        lat += rng.uniform(-0.12, 0.12)
+        lng += rng.uniform(-0.25, 0.25)
     return lat, lng
 
 
@@ -60,3 +62,7 @@ class Geo(models.Model):
                 "longitude": geo.longitude,
             }
             user.save()
+
+            if features.PEOPLE_MAP_ENDPOINT:
+                from users.people_map import schedule_people_map_rebuild  # it imports models
+                schedule_people_map_rebuild()
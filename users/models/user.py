@@ -3,9 +3,11 @@ from uuid import uuid4
 
 from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import OpClass
 from django.core.cache import cache
 from django.db import models
 from django.db.models import F
+from django.db.models.functions import Upper
 from django.urls import reverse
 
 from common.models import ModelDiffMixin
@@ -136,6 +138,10 @@ class User(models.Model, ModelDiffMixin):
     class Meta:
         db_table = "users"
         ordering = ["-created_at"]
+        indexes = [
+            # slug__istartswith of mention autocomplete is UPPER(slug) LIKE 'PREFIX%'
+            models.Index(OpClass(Upper("slug"), name="text_pattern_ops"), name="users_slug_upper_prefix"),
+        ]
 
     def __str__(self):
         return f"User: {self.slug}"
@@ -0,0 +1,151 @@
+"""
+Clustered people map (features.PEOPLE_MAP_ENDPOINT).
+
+Instead of inlining every member into the people page, PeopleMap.vue asks /people/map.json for the current zoom.
+Members are bucketed into a grid of ~64px cells of web mercator tiles at every zoom level, a cell with many members
+becomes one cluster marker. GeoJSON of all zoom levels is built at once, cached with its ETag and rebuilt
+in the background when someone's location changes (Geo.update_for_user) or after PEOPLE_MAP_CACHE_TIMEOUT.
+
+Maps for filtered people lists are clustered on request, they are small.
+"""
+import hashlib
+import json
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django_q.tasks import async_task
+
+from users.models.geo import geo_coordinates
+from users.models.user import User
+
+KEY_PREFIX = "people_map"
+REBUILD_LOCK_KEY = f"{KEY_PREFIX}:rebuild"
+REBUILD_DELAY_SECONDS = 10  # locations are updated in bulk by `manage.py update_people_map`
+MAX_ZOOM = 12  # the same as maxZoom in PeopleMap.vue, members are shown one by one there
+GRID_CELLS_PER_TILE = 4  # tiles are 256px
+MAX_LATITUDE = 85.05  # web mercator ends there
+
+
+def map_points(users):
+    """
+    (slug, avatar, geo) tuples → (slug, avatar, lat, lng) of members who have coordinates.
+    Offsets of non-precise locations are seeded by the slug: the map doesn't change between builds
+    """
+    points = []
+    for slug, avatar, geo in users:
+        coordinates = geo_coordinates(geo, rng=random.Random(slug))
+        if coordinates:
+            points.append((slug, avatar, *coordinates))
+    return points
+
+
+def grid_cell(lat, lng, zoom):
+    cells = 2 ** zoom * GRID_CELLS_PER_TILE
+    sin_lat = math.sin(math.radians(max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)))
+    x = (lng + 180) / 360
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return min(int(x * cells), cells - 1), min(int(y * cells), cells - 1)
+
+
+def member_feature(slug, avatar, lat, lng):
+    return {
+        "type": "Feature",
+        "properties": {
+            "id": slug,
+            "url": f"/user/{slug}/",
+            "avatar": avatar,
+        },
+        "geometry": {
+            "type": "Point",
+            "coordinates": [lng, lat],
+        },
+    }
+
+
+def cluster_features(points, zoom):
+    if zoom >= MAX_ZOOM:
+        return [member_feature(*point) for point in points]
+
+    cells = {}
+    for point in points:
+        cells.setdefault(grid_cell(point[2], point[3], zoom), []).append(point)
+
+    features = []
+    for (x, y), members in cells.items():
+        if len(members) == 1:
+            features.append(member_feature(*members[0]))
+            continue
+
+        features.append({
+            "type": "Feature",
+            "properties": {
+                "cluster": True,
+                "cluster_id": f"{zoom}:{x}:{y}",
+                "point_count": len(members),
+                "avatar": next((avatar for _, avatar, _, _ in members if avatar), None),
+            },
+            "geometry": {
+                "type": "Point",
+                "coordinates": [
+                    sum(lng for _, _, _, lng in members) / len(members),
+                    sum(lat for _, _, lat, _ in members) / len(members),
+                ],
+            },
+        })
+    return features
+
+
+def map_layer(points, zoom):
+    """
+    {"content": GeoJSON, "etag": ...} of the map at this zoom level
+    """
+    content = json.dumps({
+        "type": "FeatureCollection",
+        "id": "user-markers",
+        "features": cluster_features(points, zoom),
+    })
+    return {
+        "content": content,
+        "etag": f'"{hashlib.md5(content.encode("utf-8")).hexdigest()}"',
+    }
+
+
+def clamp_zoom(zoom):
+    return max(0, min(int(zoom), MAX_ZOOM))
+
+
+def layer_key(zoom):
+    return f"{KEY_PREFIX}:zoom:{zoom}"
+
+
+def build_people_map():
+    users = User.registered_members().filter(geo__isnull=False).values_list("slug", "avatar", "geo")
+    points = map_points(users)
+    layers = {zoom: map_layer(points, zoom) for zoom in range(MAX_ZOOM + 1)}
+    cache.set_many({layer_key(zoom): layer for zoom, layer in layers.items()}, settings.PEOPLE_MAP_CACHE_TIMEOUT)
+    return layers
+
+
+def people_map_layer(zoom):
+    zoom = clamp_zoom(zoom)
+    layer = cache.get(layer_key(zoom))
+    if not layer:
+        layer = build_people_map()[zoom]
+    return layer
+
+
+def rebuild_people_map(not_before=None):
+    if not_before:
+        time.sleep(min(max(not_before - time.time(), 0), REBUILD_DELAY_SECONDS))
+
+    cache.delete(REBUILD_LOCK_KEY)  # changes made from now on need another rebuild
+    build_people_map()
+
+
+def schedule_people_map_rebuild():
+    # one rebuild for a burst of location updates
+    if cache.add(REBUILD_LOCK_KEY, 1, REBUILD_DELAY_SECONDS * 10):
+        async_task(rebuild_people_map, not_before=time.time() + REBUILD_DELAY_SECONDS)
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from django.test import TestCase
+
+from tags.models import Tag, UserTag
+from users.directory import MemberSnapshot, build_member_snapshot, FAANG_COMPANIES
+from users.models.user import User
+
+NOW = datetime(2026, 1, 1)
+
+
+def _member(country=None, city=None, company=None, activity=NOW, geo=None):
+    user_id = uuid4()
+    return (user_id, f"slug_{user_id.hex[:8]}", None, country, city, company, activity, geo)
+
+
+class TestMemberSnapshot(TestCase):
+
+    def setUp(self):
+        self.members = [
+            _member(country="DE", city="Berlin", company="Google", geo={"lat": 52, "lng": 13}),
+            _member(country="DE", city="Munich", company="-"),
+            _member(country="NL", city="Amsterdam", company="Startup", activity=NOW - timedelta(days=90)),
+            _member(country="", city=None, company="Google"),
+        ]
+        self.ids = [member[0] for member in self.members]
+        self.snapshot = MemberSnapshot(self.members, [
+            (self.ids[0], "can_coffee"),
+            (self.ids[1], "can_coffee"),
+            (self.ids[1], "can_beer"),
+            (uuid4(), "can_coffee"),  # not a member anymore
+        ])
+
+    def test_unfiltered_facets(self):
+        facets = self.snapshot.unfiltered
+
+        self.assertEqual(facets.total, 4)
+        self.assertEqual(facets.map_stat_groups["💼 Топ компаний"], [("Google", 2), ("Startup", 1)])
+        self.assertEqual(facets.map_stat_groups["🌍 Страны"], [("DE", 2), ("NL", 1)])
+        self.assertEqual(len(facets.map_stat_groups["🏰 Города"]), 3)
+        self.assertEqual(facets.users_for_map, [(self.members[0][1], None, {"lat": 52, "lng": 13})])
+        self.assertEqual(self.snapshot.active_countries, [
+            {"country": "DE", "country_count": 2},
+            {"country": "NL", "country_count": 1},
+        ])
+
+    def test_filters_are_combined(self):
+        self.assertEqual(self.snapshot.user_ids(self.snapshot.filter(tags=["can_coffee"])), self.ids[:2])
+        self.assertEqual(self.snapshot.user_ids(self.snapshot.filter(tags=["can_coffee", "can_beer"])), [self.ids[1]])
+        self.assertEqual(self.snapshot.user_ids(self.snapshot.filter(tags=["unknown"])), [])
+        self.assertEqual(self.snapshot.user_ids(self.snapshot.filter(country="DE", cities={"Munich"})), [self.ids[1]])
+        self.assertEqual(self.snapshot.user_ids(self.snapshot.filter(cities={None})), [self.ids[3]])
+        self.assertEqual(
+            self.snapshot.user_ids(self.snapshot.filter(companies=FAANG_COMPANIES)),
+            [self.ids[0], self.ids[3]],
+        )
+        self.assertEqual(
+            self.snapshot.user_ids(self.snapshot.filter(active_since=NOW - timedelta(days=30), user_ids={self.ids[2]})),
+            [],
+        )
+
+    def test_filtered_facets(self):
+        facets = self.snapshot.facets(self.snapshot.filter(country="DE"))
+
+        self.assertEqual(facets.total, 2)
+        self.assertEqual(facets.map_stat_groups["💼 Топ компаний"], [("Google", 1)])
+        self.assertEqual(facets.map_stat_groups["🌍 Страны"], [("DE", 2)])
+
+    def test_keeps_order_of_members_beyond_one_byte(self):
+        members = [_member() for _ in range(20)]
+        snapshot = MemberSnapshot(members, [])
+
+        positions = [1, 7, 8, 15, 19]
+        self.assertEqual(list(snapshot.iter_positions(snapshot.mask(positions))), positions)
+        self.assertEqual(snapshot.user_ids(snapshot.all), [member[0] for member in members])
+
+    def test_empty_directory(self):
+        snapshot = MemberSnapshot([], [])
+
+        self.assertEqual(snapshot.unfiltered.total, 0)
+        self.assertEqual(snapshot.user_ids(snapshot.filter(country="DE")), [])
+
+
+class TestBuildMemberSnapshot(TestCase):
+
+    def test_reads_approved_members_and_their_tags(self):
+        tag = Tag.objects.create(code="tdirectory_tag", name="Test", group=Tag.GROUP_CLUB)
+        users = []
+        for suffix, status in [("a", User.MODERATION_STATUS_APPROVED), ("b", User.MODERATION_STATUS_ON_REVIEW)]:
+            user = User.objects.create(
+                slug=f"tdirectory_{suffix}",
+                email=f"tdirectory_{suffix}@test.com",
+                full_name=f"tdirectory_{suffix}",
+                country="TestLand",
+                membership_started_at=datetime.utcnow() - timedelta(days=5),
+                membership_expires_at=datetime.utcnow() + timedelta(days=5),
+                moderation_status=status,
+            )
+            UserTag.objects.create(user=user, tag=tag, name=tag.name)
+            users.append(user)
+
+        snapshot = build_member_snapshot()
+
+        self.assertEqual(snapshot.user_ids(snapshot.filter(tags=[tag.code])), [users[0].id])
+        self.assertEqual(snapshot.facets(snapshot.filter(country="TestLand")).total, 1)
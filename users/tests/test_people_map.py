@@ -0,0 +1,153 @@
+import json
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from authn.models.session import Session
+from users.models.geo import Geo
+from users.models.user import User
+from users.people_map import MAX_ZOOM, build_people_map, cluster_features, grid_cell, map_layer, map_points, \
+    people_map_layer
+
+BERLIN = {"latitude": 52.52, "longitude": 13.40, "precise": True}
+POTSDAM = {"latitude": 52.39, "longitude": 13.06, "precise": True}
+TOKYO = {"latitude": 35.68, "longitude": 139.69, "precise": True}
+
+
+class TestMapPoints(TestCase):
+
+    def test_skips_members_without_coordinates(self):
+        points = map_points([("alice", None, BERLIN), ("bob", None, {}), ("carol", None, None)])
+        self.assertEqual(points, [("alice", None, 52.52, 13.40)])
+
+    def test_offsets_of_non_precise_locations_are_stable(self):
+        geo = {"latitude": 50.0, "longitude": 10.0}
+        first = map_points([("alice", None, geo), ("bob", None, geo)])
+        second = map_points([("alice", None, geo), ("bob", None, geo)])
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first[0][2:], first[1][2:])
+        self.assertAlmostEqual(first[0][2], 50.0, delta=0.12)
+
+
+class TestClusterFeatures(TestCase):
+
+    def setUp(self):
+        self.points = map_points([
+            ("alice", "https://img/a.jpg", BERLIN),
+            ("bob", None, POTSDAM),
+            ("carol", None, TOKYO),
+        ])
+
+    def test_grid_cells(self):
+        self.assertEqual(grid_cell(0.0, 0.0, 0), (2, 2))
+        self.assertEqual(grid_cell(90.0, 180.0, 1), (7, 0))
+        self.assertEqual(grid_cell(52.52, 13.40, 3), grid_cell(52.39, 13.06, 3))
+        self.assertNotEqual(grid_cell(52.52, 13.40, 10), grid_cell(52.39, 13.06, 10))
+
+    def test_nearby_members_are_clustered_at_low_zoom(self):
+        features = cluster_features(self.points, zoom=3)
+
+        clusters = [feature for feature in features if feature["properties"].get("cluster")]
+        self.assertEqual(len(features), 2)
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual(clusters[0]["properties"]["point_count"], 2)
+        self.assertEqual(clusters[0]["properties"]["avatar"], "https://img/a.jpg")
+        self.assertAlmostEqual(clusters[0]["geometry"]["coordinates"][0], (13.40 + 13.06) / 2)
+
+    def test_members_are_shown_one_by_one_at_max_zoom(self):
+        features = cluster_features(self.points, zoom=MAX_ZOOM)
+
+        self.assertEqual([feature["properties"]["id"] for feature in features], ["alice", "bob", "carol"])
+        self.assertEqual(features[0]["properties"]["url"], "/user/alice/")
+        self.assertEqual(features[0]["geometry"]["coordinates"], [13.40, 52.52])
+
+    def test_layer_etag_depends_on_content(self):
+        self.assertEqual(map_layer(self.points, 3)["etag"], map_layer(self.points, 3)["etag"])
+        self.assertNotEqual(map_layer(self.points, 3)["etag"], map_layer(self.points[:1], 3)["etag"])
+        self.assertEqual(json.loads(map_layer(self.points, 3)["content"])["type"], "FeatureCollection")
+
+
+class TestPeopleMapCache(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(
+            slug="tpeoplemap_alice",
+            email="tpeoplemap_alice@test.com",
+            full_name="Alice",
+            country="Germany",
+            city="Berlin",
+            geo=BERLIN,
+            membership_started_at=datetime.utcnow() - timedelta(days=5),
+            membership_expires_at=datetime.utcnow() + timedelta(days=5),
+            moderation_status=User.MODERATION_STATUS_APPROVED,
+        )
+
+    def test_layers_are_built_once_and_cached(self):
+        layer = people_map_layer(MAX_ZOOM)
+        self.assertIn("tpeoplemap_alice", layer["content"])
+
+        with patch("users.people_map.build_people_map") as build:
+            self.assertEqual(people_map_layer(MAX_ZOOM + 5), layer)
+            self.assertEqual(people_map_layer(0)["etag"], build_people_map()[0]["etag"])
+            build.assert_not_called()
+
+    def _move_to_known_city(self):
+        geo = Geo.objects.order_by("id").first()  # cities are loaded by the migrations
+        self.user.country, self.user.city = geo.country, geo.city
+
+    @patch("club.features.PEOPLE_MAP_ENDPOINT", True)
+    def test_geo_update_schedules_a_single_rebuild(self):
+        self._move_to_known_city()
+
+        with patch("users.people_map.async_task") as async_task:
+            Geo.update_for_user(self.user)
+            Geo.update_for_user(self.user)
+
+        self.assertEqual(async_task.call_count, 1)
+
+    @patch("club.features.PEOPLE_MAP_ENDPOINT", False)
+    def test_no_rebuilds_without_the_endpoint(self):
+        self._move_to_known_city()
+
+        with patch("users.people_map.async_task") as async_task:
+            Geo.update_for_user(self.user)
+
+        async_task.assert_not_called()
+
+
+class TestPeopleMapEndpoint(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(
+            slug="tpeoplemap_viewer",
+            email="tpeoplemap_viewer@test.com",
+            full_name="Viewer",
+            country="Japan",
+            geo=TOKYO,
+            membership_started_at=datetime.utcnow() - timedelta(days=5),
+            membership_expires_at=datetime.utcnow() + timedelta(days=5),
+            moderation_status=User.MODERATION_STATUS_APPROVED,
+        )
+        session = Session.create_for_user(self.user)
+        self.client.cookies["token"] = session.token
+
+    def test_returns_layer_with_etag_and_not_modified(self):
+        response = self.client.get("/people/map.json?zoom=12")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("tpeoplemap_viewer", response.content.decode())
+
+        response = self.client.get("/people/map.json?zoom=12", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_filtered_map(self):
+        response = self.client.get("/people/map.json?zoom=12&country=Nowhere")
+        self.assertEqual(json.loads(response.content)["features"], [])
+
+    def test_bad_zoom(self):
+        response = self.client.get("/people/map.json?zoom=abc")
+        self.assertEqual(response.status_code, 200)
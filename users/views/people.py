@@ -7,9 +7,12 @@ from django.db.models import Count
 from django.shortcuts import render
 
 from authn.decorators.auth import require_auth
+from club import features
 from common.models import group_by
 from common.pagination import paginate
 from tags.models import Tag
+from users.directory import FAANG_COMPANIES, member_snapshot
+from users.models.friends import Friend
 from users.models.user import User
 
 TAGS_CACHE_TIMEOUT_SECONDS = 24 * 60 * 60
@@ -27,18 +30,48 @@ def _top(queryset, field, skip=None, limit=5):
     )
 
 
-@require_auth
-def people(request):
-    users = User.registered_members().order_by("-created_at")
+def _tag_stat_groups():
+    tag_stat_groups = cache.get("people_tag_stat_groups")
+    tags_with_stats = cache.get("people_tags_with_stats")
+    if not tag_stat_groups or not tags_with_stats:
+        tags_with_stats = Tag.tags_with_stats()
+        tag_stat_groups = group_by(tags_with_stats, "group", todict=True)
+        tag_stat_groups.update({
+            "travel": [tag for tag in tag_stat_groups.get(Tag.GROUP_CLUB, []) if tag.code in {
+                "can_coffee", "can_city", "can_beer", "can_office", "can_sleep",
+            }],
+            "grow": [tag for tag in tag_stat_groups.get(Tag.GROUP_CLUB, []) if tag.code in {
+                "can_advice", "can_project", "can_teach", "search_idea",
+                "can_idea", "can_invest", "search_mentor", "can_mentor", "can_hobby"
+            }],
+            "work": [tag for tag in tag_stat_groups.get(Tag.GROUP_CLUB, []) if tag.code in {
+                "can_refer", "search_employees", "search_job", "search_remote", "search_relocate"
+            }],
+            "collectible": [
+                tag for tag in tag_stat_groups.get(Tag.GROUP_COLLECTIBLE, []) if tag.user_count > 1
+            ][:20]
+        })
+        cache.set("people_tag_stat_groups", tag_stat_groups, TAGS_CACHE_TIMEOUT_SECONDS)
+        cache.set("people_tags_with_stats", tags_with_stats, TAGS_CACHE_TIMEOUT_SECONDS)
+    return tag_stat_groups, tags_with_stats
+
+
+def _search_members(users, query):
+    return users.filter(
+        index__index=(
+            SearchQuery(query, config="simple", search_type="websearch") |
+            SearchQuery(query, config="russian", search_type="websearch")
+        )
+    )
 
+
+def filter_people(request, users):
+    """
+    Applies the search, tags, country and other filters of the people page
+    """
     query = request.GET.get("query")
     if query:
-        users = users.filter(
-            index__index=(
-                SearchQuery(query, config="simple", search_type="websearch") |
-                SearchQuery(query, config="russian", search_type="websearch")
-            )
-        )
+        users = _search_members(users, query)
 
     tags = request.GET.getlist("tags")
     if tags:
@@ -51,10 +84,7 @@ def people(request):
     filters = request.GET.getlist("filters")
     if filters:
         if "faang" in filters:
-            users = users.filter(company__in=[
-                "Facebook", "Apple", "Google", "Amazon", "Netflix", "Microsoft",
-                "Фейсбук", "Гугл", "Амазон", "Нетфликс", "Майкрософт", "Микрософт"
-            ])
+            users = users.filter(company__in=FAANG_COMPANIES)
 
         if "same_city" in filters:
             users = users.filter(city=request.me.city)
@@ -65,28 +95,25 @@ def people(request):
         if "friends" in filters:
             users = users.filter(friends_to__user_from=request.me)
 
-    tag_stat_groups = cache.get("people_tag_stat_groups")
-    tags_with_stats = cache.get("people_tags_with_stats")
-    if not tag_stat_groups or not tags_with_stats:
-        tags_with_stats = Tag.tags_with_stats()
-        tag_stat_groups = group_by(tags_with_stats, "group", todict=True)
-        tag_stat_groups.update({
-            "travel": [tag for tag in tag_stat_groups.get(Tag.GROUP_CLUB, []) if tag.code in {
-                "can_coffee", "can_city", "can_beer", "can_office", "can_sleep",
-            }],
-            "grow": [tag for tag in tag_stat_groups.get(Tag.GROUP_CLUB, []) if tag.code in {
-                "can_advice", "can_project", "can_teach", "search_idea",
-                "can_idea", "can_invest", "search_mentor", "can_mentor", "can_hobby"
-            }],
-            "work": [tag for tag in tag_stat_groups.get(Tag.GROUP_CLUB, []) if tag.code in {
-                "can_refer", "search_employees", "search_job", "search_remote", "search_relocate"
-            }],
-            "collectible": [
-                tag for tag in tag_stat_groups.get(Tag.GROUP_COLLECTIBLE, []) if tag.user_count > 1
-            ][:20]
-        })
-        cache.set("people_tag_stat_groups", tag_stat_groups, TAGS_CACHE_TIMEOUT_SECONDS)
-        cache.set("people_tags_with_stats", tags_with_stats, TAGS_CACHE_TIMEOUT_SECONDS)
+    return users
+
+
+def is_filtered(request):
+    return any(request.GET.get(param) for param in ("query", "tags", "country", "filters"))
+
+
+@require_auth
+def people(request):
+    if features.PEOPLE_FACETS:
+        return people_from_snapshot(request)
+
+    users = filter_people(request, User.registered_members().order_by("-created_at"))
+    query = request.GET.get("query")
+    tags = request.GET.getlist("tags")
+    country = request.GET.get("country")
+    filters = request.GET.getlist("filters")
+
+    tag_stat_groups, tags_with_stats = _tag_stat_groups()
 
     active_countries = User.registered_members().filter(country__isnull=False)\
         .exclude(country="")\
@@ -102,7 +129,9 @@ def people(request):
         "🏰 Города": _top(users, "city"),
     }
 
-    users_for_map = users.filter(geo__isnull=False).order_by().values_list("slug", "avatar", "geo")
+    # PeopleMap.vue loads clustered points from /people/map.json then
+    users_for_map = None if features.PEOPLE_MAP_ENDPOINT else \
+        users.filter(geo__isnull=False).order_by().values_list("slug", "avatar", "geo")
 
     return render(request, "users/people.html", {
         "people_query": {
@@ -119,3 +148,59 @@ def people(request):
         "active_countries": active_countries,
         "map_stat_groups": map_stat_groups,
     })
+
+
+def people_from_snapshot(request):
+    """
+    The same page with facets counted over the member snapshot: only the query, friends and the page hit the DB
+    """
+    snapshot = member_snapshot()
+
+    query = request.GET.get("query")
+    tags = request.GET.getlist("tags")
+    country = request.GET.get("country")
+    filters = request.GET.getlist("filters")
+
+    user_ids = None
+    if query:
+        user_ids = set(_search_members(User.registered_members(), query).values_list("id", flat=True))
+
+    if "friends" in filters:
+        friend_ids = set(Friend.objects.filter(user_from=request.me).values_list("user_to_id", flat=True))
+        user_ids = friend_ids if user_ids is None else user_ids & friend_ids
+
+    if is_filtered(request):
+        mask = snapshot.filter(
+            tags=tags,
+            country=country,
+            cities={request.me.city} if "same_city" in filters else None,
+            companies=FAANG_COMPANIES if "faang" in filters else None,
+            active_since=datetime.utcnow() - timedelta(days=30) if "activity" in filters else None,
+            user_ids=user_ids,
+        )
+        facets = snapshot.facets(mask)
+    else:
+        mask = snapshot.all
+        facets = snapshot.unfiltered
+
+    users_paginated = paginate(request, snapshot.user_ids(mask), page_size=settings.PEOPLE_PAGE_SIZE)
+    users = User.objects.in_bulk(users_paginated.object_list)
+    users_paginated.object_list = [users[user_id] for user_id in users_paginated.object_list if user_id in users]
+
+    tag_stat_groups, tags_with_stats = _tag_stat_groups()
+
+    return render(request, "users/people.html", {
+        "people_query": {
+            "query": query,
+            "country": country,
+            "tags": tags,
+            "filters": filters,
+        },
+        "users_total": facets.total,
+        "users_for_map": None if features.PEOPLE_MAP_ENDPOINT else facets.users_for_map,
+        "users_paginated": users_paginated,
+        "tag_stat_groups": tag_stat_groups,
+        "max_tag_user_count": max(tag.user_count for tag in tags_with_stats),
+        "active_countries": snapshot.active_countries,
+        "map_stat_groups": facets.map_stat_groups,
+    })
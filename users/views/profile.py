@@ -6,11 +6,16 @@ from django.shortcuts import redirect, get_object_or_404, render
 from authn.decorators.auth import require_auth
 from authn.helpers import check_user_permissions, is_safe_url
 from badges.models import UserBadge
+from club import features
 from comments.models import Comment
 from common.pagination import paginate
 from authn.decorators.api import api
+from posts.counters import load_user_counters
 from posts.models.post import Post
+from posts.viewer_state import attach_post_viewer_state
+from search.indexing import index_later
 from search.models import SearchIndex
+from users.directory import invalidate_member_snapshot
 from users.models.achievements import UserAchievement
 from users.models.mute import UserMuted
 from tags.models import Tag, UserTag
@@ -52,12 +57,14 @@ def profile(request, user_slug):
     # select other stuff from this user
     intro = Post.get_user_intro(user)
     projects = Post.visible_objects().filter(author=user, type=Post.TYPE_PROJECT).all()
-    badges = UserBadge.user_badges_grouped(user=user)
+    counters = load_user_counters(user) if features.DENORMALIZED_COUNTERS else None
+    badges = UserBadge.user_badges_grouped(user=user, counts=counters.badges if counters else None)
     achievements = UserAchievement.objects.filter(user=user).select_related("achievement")
     posts = Post.objects_for_user(request.me)\
         .filter(Q(author=user) | Q(coauthors__contains=[user.slug]))\
         .exclude(type__in=[Post.TYPE_INTRO, Post.TYPE_WEEKLY_DIGEST])\
         .order_by("-published_at")
+    posts = attach_post_viewer_state(posts[:15], request.me)
 
     if request.me:
         comments = Comment.visible_objects()\
@@ -79,6 +86,13 @@ def profile(request, user_slug):
             .select_related("user_from")\
             .all()
 
+    if counters:
+        comments_total = counters.comments
+        posts_total = counters.posts_for_viewer(request.me)
+    else:
+        comments_total = Comment.count_user_comments(user) if comments is not None else 0
+        posts_total = Post.count_user_posts(user, viewer=request.me)
+
     return render(request, "users/profile.html", {
         "user": user,
         "intro": intro,
@@ -89,9 +103,9 @@ def profile(request, user_slug):
         "collectible_tags": collectible_tags,
         "achievements": [ua.achievement for ua in achievements],
         "comments": comments[:3] if comments else [],
-        "comments_total": Comment.count_user_comments(user) if comments is not None else 0,
-        "posts": posts[:15],
-        "posts_total": Post.count_user_posts(user, viewer=request.me),
+        "comments_total": comments_total if comments is not None else 0,
+        "posts": posts,
+        "posts_total": posts_total,
         "similarity": similarity,
         "muted": muted,
         "note": note,
@@ -132,9 +146,12 @@ def profile_posts(request, user_slug):
         .exclude(type__in=[Post.TYPE_INTRO, Post.TYPE_PROJECT, Post.TYPE_WEEKLY_DIGEST]) \
         .order_by("-published_at")
 
+    posts_page = paginate(request, posts, settings.PROFILE_POSTS_PAGE_SIZE)
+    attach_post_viewer_state(posts_page, request.me)
+
     return render(request, "users/profile/posts.html", {
         "user": user,
-        "posts": paginate(request, posts, settings.PROFILE_POSTS_PAGE_SIZE),
+        "posts": posts_page,
     })
 
 
@@ -169,7 +186,8 @@ def toggle_tag(request, tag_code):
     if not is_created:
         user_tag.delete()
 
-    SearchIndex.update_user_tags(request.me)
+    index_later(SearchIndex.TYPE_USER, request.me.id)
+    invalidate_member_snapshot()
 
     return {
         "status": "created" if is_created else "deleted",
@@ -9,7 +9,9 @@ from django_q.tasks import async_task
 from authn.decorators.auth import require_auth
 from gdpr.archive import generate_data_archive
 from gdpr.models import DataRequests
+from search.indexing import index_later
 from search.models import SearchIndex
+from users.directory import invalidate_member_snapshot
 from users.forms.profile import ProfileEditForm, NotificationsEditForm
 from users.models.user import User
 from utils.strings import random_hash
@@ -42,7 +44,8 @@ def edit_profile(request, user_slug):
             user = form.save(commit=False)
             user.save()
 
-            SearchIndex.update_user_index(user)
+            index_later(SearchIndex.TYPE_USER, user.id)
+            invalidate_member_snapshot()
     else:
         form = ProfileEditForm(instance=user)
 
@@ -1,19 +1,51 @@
-def chunked_queryset(queryset, chunk_size=1000):
-    start_pk = 0
+import json
+
+from django.db import connection
+
+
+def chunked_pk_ranges(queryset, chunk_size=1000):
+    """
+    Yields (start_pk, end_pk) ranges of chunk_size entries: start_pk < pk <= end_pk, start_pk is None for the first one
+    """
+    start_pk = None
     queryset = queryset.order_by("pk")
 
     while True:
+        rest = queryset.filter(pk__gt=start_pk) if start_pk is not None else queryset
+
         # no entries left
-        if not queryset.filter(pk__gt=start_pk).exists():
+        if not rest.exists():
             break
 
         try:
             # fetch chunk_size entries
-            end_pk = queryset.filter(pk__gt=start_pk).values_list("pk", flat=True)[chunk_size - 1]
+            end_pk = rest.values_list("pk", flat=True)[chunk_size - 1]
         except IndexError:
             # fetch rest entries if less than chunk_size left
             end_pk = queryset.values_list("pk", flat=True).last()
 
-        yield queryset.filter(pk__gt=start_pk).filter(pk__lte=end_pk)
+        yield start_pk, end_pk
 
         start_pk = end_pk
+
+
+def chunked_queryset(queryset, chunk_size=1000):
+    queryset = queryset.order_by("pk")
+
+    for start_pk, end_pk in chunked_pk_ranges(queryset, chunk_size):
+        chunk = queryset.filter(pk__lte=end_pk)
+        yield chunk.filter(pk__gt=start_pk) if start_pk is not None else chunk
+
+
+def estimate_count(queryset):
+    """
+    Number of rows the postgres planner expects the queryset to return, instead of the exact COUNT(*)
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"explain (format json) {sql}", params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])